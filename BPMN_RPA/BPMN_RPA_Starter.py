@@ -1,14 +1,30 @@
-from werkzeug.utils import secure_filename
-
-from BPMN_RPA.WorkflowEngine import WorkflowEngine
+from BPMN_RPA.FlowRunner import FlowRunner
 import os
 import sys
-pad = secure_filename(sys.argv[1])
+# Optional arguments --log-level=<quiet|step|loop-item|debug>, --runner-port=<port> and --no-runner
+log_level = "debug"
+runner_port = FlowRunner.default_port
+use_runner = True
+compile_only = False
+arguments = []
+for arg in sys.argv[1:]:
+    if arg.lower().startswith("--log-level="):
+        log_level = arg.split("=", 1)[1]
+    elif arg.lower().startswith("--runner-port="):
+        runner_port = int(arg.split("=", 1)[1])
+    elif arg.lower() == "--no-runner":
+        use_runner = False
+    elif arg.lower() == "--compile":
+        compile_only = True
+    else:
+        arguments.append(arg)
+from werkzeug.utils import secure_filename
+pad = secure_filename(arguments[0])
 print(pad)
 input_parameter = None
-if len(sys.argv) == 3:
+if len(arguments) == 2:
     # make sure that the input parameter is a string
-    input_parameter = str(sys.argv[2])
+    input_parameter = str(arguments[1])
 if pad.lower().__contains__(".vsdx"):
     flow = pad.replace(".vsdx", "") + ".vsdx"
 if not pad.lower().__contains__(".flw"):
@@ -19,8 +35,24 @@ if os.name == 'nt':
     cont = os.path.exists(flow)
 else:
     cont = True
-if cont:
-    engine = WorkflowEngine(input_parameter=input_parameter)
-    doc = engine.open(filepath=flow)
-    steps = engine.get_flow(doc)
-    engine.run_flow(steps)
\ No newline at end of file
+if cont and compile_only:
+    from BPMN_RPA.WorkflowEngine import WorkflowEngine
+    print(WorkflowEngine(log_level=log_level).compile_flow(flow))
+elif cont:
+    # Run the flow in the FlowRunner if it is running, else start a WorkflowEngine in this process
+    response = None
+    if use_runner:
+        response = FlowRunner.send_request(flow, input_parameter=input_parameter, log_level=log_level, port=runner_port)
+    if response is None:
+        from BPMN_RPA.WorkflowEngine import WorkflowEngine
+        engine = WorkflowEngine(input_parameter=input_parameter, log_level=log_level)
+        doc = engine.open(filepath=flow)
+        steps = engine.get_flow(doc)
+        engine.run_flow(steps)
+    else:
+        for line in response.get("runlog", []):
+            print(line)
+        if response["status"] == "error":
+            raise Exception(response["error"])
+        if response["status"] == "exit":
+            sys.exit(response["exitcode"])
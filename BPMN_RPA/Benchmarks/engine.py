@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from BPMN_RPA.Benchmarks import flows
+
+
+# The BPMN-RPA engine benchmark is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The BPMN-RPA engine benchmark is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+class EngineBenchmark:
+    compared = ["parse_time", "steps_per_second", "peak_memory", "db_writes_per_step"]  # Checked against a baseline
+    higher_is_better = ["steps_per_second"]  # For the other measurements lower is better
+
+    def __init__(self, size: int = 200, repeat: int = 3, log_level: str = "step"):
+        """
+        Class for measuring the WorkflowEngine with synthetic flows: a chain of shapes, a chain of Exclusive Gateway
+        diamonds and nested loops, each as .flw and as draw.io file. The flows run against a SQLite orchestrator
+        database in a temporary installation directory, so the settings of the installation aren't changed.
+        :param size: Optional. The size of the flows: the number of shapes in the chain, the number of diamonds and the number of items of both loops is the square root of the size. Default is 200.
+        :param repeat: Optional. The number of times each flow is parsed and run. The best time is reported. Default is 3.
+        :param log_level: Optional. The log level of the flows. Default is 'step'.
+        """
+        self.size = size
+        self.repeat = repeat
+        self.log_level = log_level
+        loop_items = max(int(size ** 0.5), 1)
+        self.flows = {"linear": flows.create_linear_flow(size), "diamond": flows.create_diamond_flow(size),
+                      "loop": flows.create_loop_flow(loop_items, loop_items)}
+
+    def run(self) -> dict:
+        """
+        Run all benchmarks.
+        :return: A dictionary with '<flow>.<format>' -> measurements.
+        """
+        retn = {}
+        with tempfile.TemporaryDirectory() as folder:
+            # The environment variables take precedence over the settings, and aren't saved
+            os.environ["BPMN_RPA_DBPATH"] = folder + os.sep
+            os.environ["BPMN_RPA_PYTHONPATH"] = os.path.dirname(os.path.dirname(flows.scripts_folder))
+            from BPMN_RPA.WorkflowEngine import WorkflowEngine
+            for name, steps in self.flows.items():
+                for extension, save in [(".flw", flows.save_flw), (".xml", flows.save_drawio)]:
+                    filepath = os.path.join(folder, name + extension)
+                    save(steps, filepath)
+                    retn[name + extension] = self.measure(WorkflowEngine, filepath, folder)
+        return retn
+
+    def measure(self, engine_class: any, filepath: str, folder: str) -> dict:
+        """
+        Measure the parsing and running of a flow.
+        :param engine_class: The WorkflowEngine class.
+        :param filepath: The full path of the flow.
+        :param folder: The installation directory with the orchestrator database.
+        :return: A dictionary with the measurements.
+        """
+        parse_times = []
+        run_times = []
+        engine = None
+        for _ in range(self.repeat):
+            engine = engine_class(log_level=self.log_level, flow_cache=False)
+            start = time.perf_counter()
+            steps = engine.get_flow(engine.open(filepath))
+            parse_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            engine.run_flow(steps)
+            run_times.append(time.perf_counter() - start)
+        executed = engine.step_nr
+        # The database writes of the last run: its log records, the run itself and its end result
+        with sqlite3.connect(os.path.join(folder, "orchestrator.db")) as connection:
+            rows = connection.execute("SELECT COUNT(*) FROM Steps WHERE run=?", [engine.id]).fetchone()[0]
+        # The memory is measured in a separate run, because tracing slows down the flow
+        engine = engine_class(log_level=self.log_level, flow_cache=False)
+        tracemalloc.start()
+        try:
+            engine.run_flow(engine.get_flow(engine.open(filepath)))
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {"steps": executed, "parse_time": min(parse_times), "run_time": min(run_times),
+                "steps_per_second": executed / min(run_times), "peak_memory": peak,
+                "db_writes_per_step": (rows + 2) / executed}
+
+    @staticmethod
+    def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list:
+        """
+        Compare the results with a baseline.
+        :param results: The results of the run method.
+        :param baseline: The results of an earlier run.
+        :param tolerance: Optional. The allowed difference, as a fraction of the baseline. Default is 0.2 (20%).
+        :return: A list with a description of each regression.
+        """
+        retn = []
+        for flow, measurements in results.items():
+            for key in EngineBenchmark.compared:
+                value = measurements[key]
+                old = baseline.get(flow, {}).get(key)
+                if not old:
+                    continue
+                change = (value - old) / old
+                if key in EngineBenchmark.higher_is_better:
+                    change = -change
+                if change > tolerance:
+                    retn.append(f"{flow} {key}: {old:.6g} -> {value:.6g} ({change:+.0%} worse)")
+        return retn
+
+    @staticmethod
+    def print_results(results: dict):
+        """
+        Print the results as a table.
+        :param results: The results of the run method.
+        """
+        print(f"{'flow':<14} {'steps':>7} {'parse (ms)':>11} {'steps/s':>9} {'peak (KB)':>10} {'writes/step':>12}")
+        for flow, x in results.items():
+            print(f"{flow:<14} {x['steps']:>7} {x['parse_time'] * 1000:>11.1f} {x['steps_per_second']:>9.0f} "
+                  f"{x['peak_memory'] / 1024:>10.0f} {x['db_writes_per_step']:>12.2f}")
+
+
+if __name__ == "__main__":
+    # Optional arguments: --size=<n>, --repeat=<n>, --log-level=<level>, --save-baseline=<file>, --baseline=<file>
+    # and --tolerance=<fraction>. With --baseline, the exit code is 1 when a measurement is worse than the tolerance.
+    options = {"size": "200", "repeat": "3", "log-level": "step", "tolerance": "0.2"}
+    for arg in sys.argv[1:]:
+        if arg.startswith("--") and "=" in arg:
+            key, value = arg[2:].split("=", 1)
+            options[key.lower()] = value
+    benchmark = EngineBenchmark(int(options["size"]), int(options["repeat"]), options["log-level"])
+    results = benchmark.run()
+    benchmark.print_results(results)
+    if "save-baseline" in options:
+        with open(options["save-baseline"], "w") as f:
+            json.dump({"size": benchmark.size, "results": results}, f, indent=2)
+        print(f"The baseline has been saved in '{options['save-baseline']}'.")
+    if "baseline" in options:
+        with open(options["baseline"], "r") as f:
+            baseline = json.load(f)
+        if baseline.get("size") != benchmark.size:
+            raise Exception(f"The baseline was made with --size={baseline.get('size')}.")
+        regressions = benchmark.compare(results, baseline["results"], float(options["tolerance"]))
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions found.")
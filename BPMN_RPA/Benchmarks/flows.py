@@ -0,0 +1,207 @@
+import base64
+import json
+import os
+from xml.sax.saxutils import quoteattr
+
+
+# The BPMN-RPA flows benchmark module is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The BPMN-RPA flows benchmark module is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+scripts_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Scripts")
+
+
+class FlowBuilder:
+
+    def __init__(self):
+        """
+        Class for building a synthetic flow as a list of steps in the .flw format. The steps call cheap functions of the
+        Set_Value, Compare and Standard_returns modules, so the flow measures the WorkflowEngine itself.
+        """
+        self.steps = []
+        self.connectors = 0
+
+    def add_shape(self, name: str, module: str = "", function: str = "", **values) -> str:
+        """
+        Add a shape to the flow.
+        :param name: The name of the shape.
+        :param module: Optional. The file name of the module in the Scripts folder.
+        :param function: Optional. The function to call.
+        :param values: Optional. The Shape values (input parameters, output_variable, loopcounter).
+        :return: The id of the shape.
+        """
+        step = {"type": "shape", "id": str(len(self.steps) + 1), "name": name, "IsStart": len(self.steps) == 0}
+        if len(function) > 0:
+            step.update({"module": os.path.join(scripts_folder, module) if len(module) > 0 else "", "class": "",
+                         "function": function})
+        step.update({key: str(value) for key, value in values.items()})
+        self.steps.append(step)
+        return step["id"]
+
+    def add_gateway(self) -> str:
+        """
+        Add an Exclusive Gateway to the flow.
+        :return: The id of the gateway.
+        """
+        step = {"type": "exclusive gateway", "id": str(len(self.steps) + 1), "name": "", "IsStart": False}
+        self.steps.append(step)
+        return step["id"]
+
+    def connect(self, source: str, target: str, value: str = ""):
+        """
+        Add a sequence flow arrow to the flow.
+        :param source: The id of the source shape.
+        :param target: The id of the target shape.
+        :param value: Optional. The label of the arrow ('True' or 'False' after an Exclusive Gateway).
+        """
+        self.connectors += 1
+        connector = {"type": "connector", "id": f"c{self.connectors}", "source": source, "target": target}
+        if len(value) > 0:
+            connector["value"] = value
+        self.steps.append(connector)
+
+    def add_value(self, name: str, value: str, output_variable: str, **values) -> str:
+        """
+        Add a Set_Value.value_to_variable shape.
+        :param name: The name of the shape.
+        :param value: The value to set.
+        :param output_variable: The variable to store the value in.
+        :param values: Optional. Other Shape values, like convert_to_list or loopcounter.
+        :return: The id of the shape.
+        """
+        return self.add_shape(name, "Set_Value.py", "value_to_variable", value=value, output_variable=output_variable,
+                              **values)
+
+    def add_loop_check(self, loop_variable: str) -> tuple:
+        """
+        Add a loop_items_check shape, followed by an Exclusive Gateway.
+        :param loop_variable: The loop variable to check.
+        :return: A tuple with the id of the loop_items_check shape and the id of the gateway.
+        """
+        check = self.add_shape(f"check {loop_variable}", "", "loop_items_check", loop_variable=loop_variable,
+                               output_variable="%more%")
+        gateway = self.add_gateway()
+        self.connect(check, gateway)
+        return check, gateway
+
+
+def create_linear_flow(size: int) -> list:
+    """
+    Create a flow with a chain of shapes that alternately set a value and return True.
+    :param size: The number of shapes between the start and the end.
+    :return: The steps of the flow in the .flw format.
+    """
+    flow = FlowBuilder()
+    previous = flow.add_shape("Start")
+    for nr in range(size):
+        if nr % 2 == 0:
+            shape = flow.add_value(f"value {nr}", f"value {nr}", f"%value{nr % 10}%")
+        else:
+            shape = flow.add_shape(f"true {nr}", "Standard_returns.py", "return_true", output_variable="%true%")
+        flow.connect(previous, shape)
+        previous = shape
+    flow.connect(previous, flow.add_shape("End"))
+    return flow.steps
+
+
+def create_diamond_flow(size: int) -> list:
+    """
+    Create a flow with a chain of diamonds: a comparison, an Exclusive Gateway and a shape on both paths that join at
+    the next comparison.
+    :param size: The number of diamonds.
+    :return: The steps of the flow in the .flw format.
+    """
+    flow = FlowBuilder()
+    previous = [flow.add_shape("Start")]
+    for nr in range(size):
+        compare = flow.add_shape(f"compare {nr}", "Compare.py", "is_first_item_equal_to_second_item",
+                                 first_item=nr % 3, second_item=0, output_variable="%equal%")
+        for shape in previous:
+            flow.connect(shape, compare)
+        gateway = flow.add_gateway()
+        flow.connect(compare, gateway)
+        yes = flow.add_shape(f"true {nr}", "Standard_returns.py", "return_true", output_variable="%result%")
+        no = flow.add_shape(f"false {nr}", "Standard_returns.py", "return_false", output_variable="%result%")
+        flow.connect(gateway, yes, "True")
+        flow.connect(gateway, no, "False")
+        previous = [yes, no]
+    end = flow.add_shape("End")
+    for shape in previous:
+        flow.connect(shape, end)
+    return flow.steps
+
+
+def create_loop_flow(outer: int, inner: int) -> list:
+    """
+    Create a flow with a loop over a list of items, with a nested loop over another list for each item.
+    :param outer: The number of items of the outer loop.
+    :param inner: The number of items of the nested loop.
+    :return: The steps of the flow in the .flw format.
+    """
+    flow = FlowBuilder()
+    start = flow.add_shape("Start")
+    outer_list = flow.add_value("outer list", ",".join(f"o{nr}" for nr in range(outer)), "%outer_list%",
+                                convert_to_list=True)
+    inner_list = flow.add_value("inner list", ",".join(f"i{nr}" for nr in range(inner)), "%inner_list%",
+                                convert_to_list=True)
+    outer_loop = flow.add_value("outer loop", "%outer_list%", "%outer%", loopcounter=0)
+    inner_loop = flow.add_value("inner loop", "%inner_list%", "%inner%", loopcounter=0)
+    body = flow.add_shape("compare", "Compare.py", "is_first_item_equal_to_second_item", first_item="%inner%",
+                          second_item="i0", output_variable="%equal%")
+    inner_check, inner_gateway = flow.add_loop_check("%inner%")
+    outer_check, outer_gateway = flow.add_loop_check("%outer%")
+    end = flow.add_shape("End")
+    flow.connect(start, outer_list)
+    flow.connect(outer_list, inner_list)
+    flow.connect(inner_list, outer_loop)
+    flow.connect(outer_loop, inner_loop)
+    flow.connect(inner_loop, body)
+    flow.connect(body, inner_check)
+    flow.connect(inner_gateway, inner_loop, "True")
+    flow.connect(inner_gateway, outer_check, "False")
+    flow.connect(outer_gateway, outer_loop, "True")
+    flow.connect(outer_gateway, end, "False")
+    return flow.steps
+
+
+def save_flw(steps: list, filepath: str):
+    """
+    Save the steps of a flow as .flw file (base64 encoded JSON).
+    :param steps: The steps of the flow.
+    :param filepath: The full path of the file.
+    """
+    with open(filepath, "w") as f:
+        f.write(base64.b64encode(json.dumps(steps).encode("ascii")).decode("ascii"))
+
+
+def save_drawio(steps: list, filepath: str):
+    """
+    Save the steps of a flow as uncompressed draw.io (.xml) file.
+    :param steps: The steps of the flow.
+    :param filepath: The full path of the file.
+    """
+    lines = ['<mxfile><diagram name="flow"><mxGraphModel><root>', '<mxCell id="0"/>', '<mxCell id="1" parent="0"/>']
+    for step in steps:
+        if step["type"] == "connector":
+            value = f' value={quoteattr(step["value"])}' if "value" in step else ""
+            lines.append(f'<mxCell id="{step["id"]}"{value} style="edgeStyle=orthogonalEdgeStyle;" parent="1" '
+                         f'source="{step["source"]}" target="{step["target"]}" edge="1"/>')
+        else:
+            attributes = " ".join(f"{key}={quoteattr(str(value))}" for key, value in step.items() if
+                                  key not in ["id", "type", "name", "IsStart"])
+            if step["type"] == "exclusive gateway":
+                attributes += ' type="Exclusive Gateway"'
+            lines.append(f'<object id="{step["id"]}" label={quoteattr(step["name"])} {attributes}>'
+                         f'<mxCell style="rounded=1;" parent="1" vertex="1"/></object>')
+    lines.append('</root></mxGraphModel></diagram></mxfile>')
+    with open(filepath, "w") as f:
+        f.write("\n".join(lines))
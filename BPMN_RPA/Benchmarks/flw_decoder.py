@@ -0,0 +1,80 @@
+import base64
+import json
+import os
+import sys
+import tempfile
+import time
+
+from BPMN_RPA.WorkflowEngine import WorkflowEngine
+
+
+# The BPMN-RPA flw_decoder benchmark is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The BPMN-RPA flw_decoder benchmark is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+def create_binary_flow(filepath: str, megabytes: float, steps: int = 50):
+    """
+    Create a binary .flw file with an embedded image of the given size, in the format of a serialized .NET string
+    (a header, the length of the text and the base64 encoded flow).
+    :param filepath: The full path of the file to create.
+    :param megabytes: The size of the embedded image in megabytes.
+    :param steps: Optional. The number of steps in the flow.
+    """
+    flow = [{"type": "shape", "id": str(nr), "name": f"Step {nr}", "module": "Set_Value.py", "class": "",
+             "function": "value_to_variable", "value": str(nr), "output_variable": f"%step{nr}%",
+             "IsStart": nr == 0} for nr in range(steps)]
+    flow += [{"type": "connector", "id": f"c{nr}", "source": str(nr), "target": str(nr + 1)} for nr in range(steps - 1)]
+    flow[0]["image"] = base64.b64encode(os.urandom(int(megabytes * 1024 * 1024))).decode("ascii")
+    text = base64.b64encode(json.dumps(flow).encode("ascii"))
+    length = bytearray()
+    value = len(text)
+    while value > 0x7F:
+        length.append((value & 0x7F) | 0x80)
+        value >>= 7
+    length.append(value)
+    header = bytes([0, 1, 0, 0, 0, 255, 255, 255, 255, 1, 0, 0, 0, 0, 0, 0, 0, 6, 1, 0, 0, 0])
+    with open(filepath, "wb") as f:
+        f.write(header + bytes(length) + text + b"\x0b")
+
+
+def run(sizes: list, repeat: int = 5):
+    """
+    Measure the decoding of binary .flw files and print the results.
+    :param sizes: The sizes of the embedded images in megabytes.
+    :param repeat: Optional. The number of times each file is decoded. The fastest time is reported.
+    """
+    print(f"{'size (MB)':>10} {'decode (ms)':>12} {'MB/s':>8} {'json (ms)':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            filepath = os.path.join(folder, f"flow_{size}.flw")
+            create_binary_flow(filepath, size)
+            with open(filepath, "rb") as f:
+                f.seek(24)
+                content = f.read()
+            decode_times = []
+            json_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                text = WorkflowEngine.decode_binary_flow(content)
+                decode_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                json.loads(text)
+                json_times.append(time.perf_counter() - start)
+            megabytes = os.path.getsize(filepath) / 1024 / 1024
+            print(f"{megabytes:>10.1f} {min(decode_times) * 1000:>12.1f} {megabytes / min(decode_times):>8.0f} "
+                  f"{min(json_times) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    # Optional arguments: the sizes of the embedded images in megabytes
+    run([float(x) for x in sys.argv[1:]] or [1, 4, 16, 64])
@@ -2,7 +2,7 @@ import os
 import sys
 
 import dill as pickle
-from BPMN_RPA.WorkflowEngine import WorkflowEngine, SQL
+from BPMN_RPA.WorkflowEngine import WorkflowEngine, SQL, LoopVariables
 
 
 # The BPMN-RPA CheckListEngine is free software: you can redistribute it and/or modify
@@ -60,7 +60,8 @@ class ChecklistEngine:
         if not os.path.exists(self.flow_name) and self.flow_name != "":
             raise FileNotFoundError(f"The flow file does not exist!")
         try:
-            self.engine = WorkflowEngine(input_parameter=input_parameter)
+            # Log synchronously: the state is saved after each step and the engine must be picklable
+            self.engine = WorkflowEngine(input_parameter=input_parameter, asynchronous_logging=False)
             doc = self.engine.open(fr"{self.flow_name}")
             self.engine.doc = doc
             self.steps = self.engine.get_flow(doc)
@@ -86,11 +87,7 @@ class ChecklistEngine:
         :return: True or False
         """
         if self.engine.current_step is None:
-            for stp in self.steps:
-                if hasattr(stp, "IsStart"):
-                    if stp.IsStart:
-                        self.step = stp
-                    break
+            self.step = self.engine.get_flow_graph(self.steps).start
         if self.step is None:
             self.PreviousStep = self.step
             self.step = self.engine.get_next_step(self.engine.current_step, self.steps, self.outputPreviousStep)
@@ -156,6 +153,7 @@ class ChecklistEngine:
         else:
             flw = self.save_as
         self.engine.db = None
+        self.engine.clear_step_caches()  # Loaded modules are not saved with the state
         pickle.settings['recurse'] = True
         with open(f"{flw}", "wb") as f:
             pickle.dump(self.engine, f)
@@ -176,6 +174,10 @@ class ChecklistEngine:
             raise Exception("The path of the flow to load is empty!")
         with open(f"{flw}", "rb") as f:
             self.engine = pickle.load(f)
+        self.engine.clear_step_caches()
+        if isinstance(self.engine.loopvariables, list):
+            # State saved by an older version
+            self.engine.loopvariables = LoopVariables(self.engine.loopvariables)
         db_path = self.engine.get_db_path()
         self.engine.db = SQL(db_path)
         self.flow_name = flw
@@ -241,12 +243,7 @@ class ChecklistEngine:
         """
         steps = self.steps
         # get start step
-        step = None
-        for stp in self.steps:
-            if hasattr(stp, "IsStart"):
-                if stp.IsStart:
-                    step = stp
-                break
+        step = self.engine.get_flow_graph(self.steps).start
         import graphviz
         if os.name == 'nt':
             if not folder.endswith("\\"):
@@ -0,0 +1,215 @@
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# The BPMN-RPA FlowRunner is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# The BPMN-RPA FlowRunner is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+# Copyright 2020-2021 Joost van Gils (J.W.N.M. van Gils)
+
+
+class FlowRunner:
+    default_port = 48740
+
+    def __init__(self, port: int = default_port, max_workers: int = 4, log_level: str = "debug", token_file: str = "",
+                 flow_cache: bool = False):
+        """
+        Class for a long-running process that runs flows on request. Each worker thread keeps its own WorkflowEngine
+        (with its database connection and loaded modules), so a flow doesn't pay the start-up costs of the
+        WorkflowEngine. Requests are received on a socket on the local machine (127.0.0.1) only, and must contain the
+        token that the FlowRunner writes to a token file that only the user who started the FlowRunner can read.
+        :param port: Optional. The port to listen on. Default is 48740.
+        :param max_workers: Optional. The number of flows that can run at the same time. Default is 4.
+        :param log_level: Optional. The default log level of the flows: 'quiet', 'step', 'loop-item' or 'debug'. Default is 'debug'.
+        :param token_file: Optional. The full path of the token file. Default is the file 'flowrunner-<port>.token' in the '.BPMN_RPA' folder of the home directory of the user.
+        :param flow_cache: Optional. Use the flow cache of the WorkflowEngine, so an unchanged flow file isn't parsed again at the next request. Default is False.
+        """
+        self.port = port
+        self.log_level = log_level
+        self.flow_cache = flow_cache
+        self.token_file = token_file or self.get_token_file(port)
+        self.token = None
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.workers = threading.local()  # The WorkflowEngine of each worker thread
+        self.server = None
+
+    @staticmethod
+    def get_token_file(port: int = default_port) -> str:
+        """
+        Get the default full path of the token file of a FlowRunner.
+        :param port: Optional. The port of the FlowRunner. Default is 48740.
+        :return: The full path of the token file.
+        """
+        return os.path.join(os.path.expanduser("~"), ".BPMN_RPA", f"flowrunner-{port}.token")
+
+    def write_token(self):
+        """
+        Create a new token and write it to the token file, which can only be read and written by the current user.
+        """
+        self.token = secrets.token_hex(32)
+        folder = os.path.dirname(self.token_file)
+        if len(folder) > 0:
+            os.makedirs(folder, mode=0o700, exist_ok=True)
+        if os.path.exists(self.token_file):
+            os.remove(self.token_file)
+        # Create the file with the permissions for the owner only, so no other user can read the token
+        handle = os.open(self.token_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(handle, "w") as f:
+            f.write(self.token)
+
+    def serve(self):
+        """
+        Start listening for flow requests. This function blocks until shutdown is called.
+        """
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", self.port), FlowRequestHandler)
+        self.server.daemon_threads = True
+        self.server.runner = self
+        self.write_token()
+        print(f"BPMN-RPA FlowRunner is listening on port {self.port}...")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.executor.shutdown(wait=True)
+            if os.path.exists(self.token_file):
+                os.remove(self.token_file)
+
+    def is_authorized(self, request: dict) -> bool:
+        """
+        Check if a request contains the token of the FlowRunner.
+        :param request: The request as dictionary.
+        :return: True or False
+        """
+        token = request.get("token")
+        if self.token is None or not isinstance(token, str):
+            return False
+        return hmac.compare_digest(token.encode("utf-8"), self.token.encode("utf-8"))
+
+    def shutdown(self):
+        """
+        Stop listening for flow requests. Running flows are finished first.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+
+    def get_engine(self) -> any:
+        """
+        Get the WorkflowEngine of the current worker thread. The WorkflowEngine is created at the first request.
+        :return: The WorkflowEngine object
+        """
+        engine = getattr(self.workers, "engine", None)
+        if engine is None:
+            # The client doesn't need the WorkflowEngine, so it is only imported in the runner
+            from BPMN_RPA.WorkflowEngine import WorkflowEngine
+            engine = WorkflowEngine(log_level=self.log_level, flow_cache=self.flow_cache)
+            self.workers.engine = engine
+        return engine
+
+    def run_flow(self, request: dict) -> dict:
+        """
+        Run a flow in a worker thread.
+        :param request: The request with the full path of the flow ('flow') and optionally the input parameter ('input') and the log level ('log_level').
+        :return: A dictionary with the status ('ended', 'exit' or 'error'), the result, the exitcode and the log of the flow.
+        """
+        engine = self.get_engine()
+        engine.reset(request.get("input"))
+        engine.log_level = engine.log_levels[str(request.get("log_level") or self.log_level).lower()]
+        response = {"status": "ended", "result": None, "exitcode": None, "error": None}
+        try:
+            steps = engine.open_flow(request["flow"])
+            result = engine.run_flow(steps)
+            try:
+                response["result"] = json.loads(json.dumps(result))
+            except (TypeError, ValueError):
+                response["result"] = str(result)
+        except SystemExit as ex:
+            # The flow has called exitcode_ok or exitcode_not_ok
+            response["status"] = "exit"
+            response["exitcode"] = ex.code
+        except Exception as ex:
+            response["status"] = "error"
+            response["error"] = str(ex)
+        response["runlog"] = list(engine.runlog)
+        return response
+
+    @staticmethod
+    def send_request(flow: str, input_parameter: any = None, log_level: str = None, port: int = default_port,
+                     token_file: str = "") -> any:
+        """
+        Run a flow in a running FlowRunner and wait until the flow has ended.
+        :param flow: The full path of the flow.
+        :param input_parameter: Optional. The input parameter of the flow.
+        :param log_level: Optional. The log level of the flow. Default is the log level of the FlowRunner.
+        :param port: Optional. The port of the FlowRunner. Default is 48740.
+        :param token_file: Optional. The full path of the token file of the FlowRunner. Default is the default token file for the port.
+        :return: The response of the FlowRunner as dictionary, or None if there is no FlowRunner running (or its token file can't be read).
+        """
+        try:
+            with open(token_file or FlowRunner.get_token_file(port), "r") as f:
+                token = f.read().strip()
+        except OSError:
+            return None
+        try:
+            connection = socket.create_connection(("127.0.0.1", port), timeout=1)
+        except OSError:
+            return None
+        with connection:
+            connection.settimeout(None)
+            request = {"flow": os.path.abspath(flow), "input": input_parameter, "log_level": log_level, "token": token}
+            connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+            with connection.makefile("r", encoding="utf-8") as reader:
+                line = reader.readline()
+        if len(line) == 0:
+            raise Exception("The FlowRunner closed the connection before the flow has ended.")
+        return json.loads(line)
+
+
+class FlowRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        """
+        Handle a flow request: one line with the request as JSON. The response is sent as one line of JSON when the
+        flow has ended.
+        """
+        line = self.rfile.readline()
+        if len(line) == 0:
+            return
+        try:
+            request = json.loads(line.decode("utf-8"))
+            if not isinstance(request, dict) or not self.server.runner.is_authorized(request):
+                raise Exception("The request doesn't contain the token of the FlowRunner.")
+            response = self.server.runner.executor.submit(self.server.runner.run_flow, request).result()
+        except Exception as ex:
+            response = {"status": "error", "error": str(ex)}
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+if __name__ == "__main__":
+    # Optional arguments --port=<port>, --workers=<number of flows at the same time>, --log-level=<level>,
+    # --token-file=<full path of the token file> and --flow-cache
+    options = {"port": FlowRunner.default_port, "workers": 4, "log-level": "debug", "token-file": "", "flow-cache": False}
+    for arg in sys.argv[1:]:
+        if arg.startswith("--") and "=" in arg:
+            key, value = arg[2:].split("=", 1)
+            options[key.lower()] = value
+        elif arg.lower() == "--flow-cache":
+            options["flow-cache"] = True
+    runner = FlowRunner(port=int(options["port"]), max_workers=int(options["workers"]), log_level=options["log-level"],
+                        token_file=options["token-file"], flow_cache=options["flow-cache"])
+    runner.serve()
@@ -483,7 +483,7 @@ class Code:
         flowname = name + ".py"
         retn = []
         for step in steps:
-            retn.append(json.dumps(step.__dict__))
+            retn.append(json.dumps(step.to_dict()))
         json_txt = json.dumps(retn)
         with open(targetdir + "\\" + flowname, 'w') as f:
             f.write("import json\n")
@@ -498,6 +498,21 @@ class Code:
             f.write("engine.run_flow(steps)\n")
         return targetdir + "\\" + flowname
 
+    @staticmethod
+    def compile_flow(filepath: str, targetfolder: str = "") -> str:
+        """
+        Compile a Flow file (.flw, .xml or .vsdx) into a compiled Flow file (.flwc). The compiled Flow contains the steps with their resolved modules and input parameters, so it starts faster. Missing modules, classes or functions and Exclusive Gateways without a 'True' or 'False' arrow are reported when the Flow is compiled. Run the compiled Flow like any other Flow file.
+        :param filepath: The full path to the Flow File.
+        :param targetfolder: Optional. The folder where the compiled Flow will be created. If no folder is given, then the compiled Flow will be created in the same folder as the Flow file.
+        :return: The full path to the compiled Flow file.
+        """
+        targetpath = ""
+        if len(targetfolder) > 0:
+            name = os.path.splitext(os.path.basename(filepath))[0]
+            targetpath = os.path.join(targetfolder, name + ".flwc")
+        engine = WorkflowEngine()
+        return engine.compile_flow(filepath, targetpath)
+
     def get_properties(self, obj):
         """
         Get all properties from an object as strings in a list.
@@ -2,13 +2,7 @@ import datetime
 import json
 import pickle
 from typing import Any, List
-from dateutil import parser
-import pandas as pd
-import requests
-import urllib3
-from jira import JIRA
 
-urllib3.disable_warnings()
 
 # The BPMN-RPA Jira module is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -67,6 +61,9 @@ class Jira:
         """
         Internal function to connect to Jira.
         """
+        import urllib3
+        from jira import JIRA
+        urllib3.disable_warnings()
         self.jira = JIRA(options=self.options, basic_auth=(self.jira_user, self.jira_pwd))
 
     def __is_picklable__(self, obj: any) -> bool:
@@ -165,6 +162,7 @@ class Jira:
         :param jql: The JQL query to execute.
         :return: A list of Issue objects.
         """
+        import requests
         block_size = 100
         block_num = 0
         ret = []
@@ -228,6 +226,7 @@ class Jira:
         :param storypoints_field: The field name of the Story Points field.
         :return: The JSON result of the request.
         """
+        import requests
         s_data = {"fields": {storypoints_field: storypoints}}
         url = f"{self.rooturl}/rest/api/2/issue/{issuekey}"
         json_result = requests.put(url, verify=True, json=s_data, auth=(self.jira_user, self.jira_pwd))
@@ -547,6 +546,7 @@ class Jira:
         :param projectkey: The ProjectKey of the Project.
         :return: A Pandas DataFrame with report statistics.
         """
+        import pandas as pd
         openinsprint = len(self.get_issues_in_sprint(projectkey))
         inbacklog = len(self.get_issues_in_backlog(projectkey))
         nu = (datetime.datetime.now() - datetime.timedelta(days=7)).strftime("%Y/%m/%d 00:00")
@@ -563,6 +563,7 @@ class Jira:
         :param projectkey: The ProjectKey of the Project.
         :return: A Pandas DataFrame with report statistics per Component.
         """
+        import pandas as pd
         comp = self.get_components(projectkey)
         df = pd.DataFrame(columns=['Component', 'Totaal', 'Open', 'In Sprint', 'Gesloten'])
         for i in range(len(comp)):
@@ -606,6 +607,8 @@ class Jira:
         :param issuekey: The IssueKey of the Issue.
         :return: The original/initial Story Points that were assigned to an Issue
         """
+        import requests
+        from dateutil import parser
         # /jira/rest/api/2/issue/DRW-124?expand=changelog
         url = f"{self.rooturl}/rest/api/2/issue/{issuekey}?expand=changelog"
         json_result = requests.get(url, verify=True, auth=(self.jira_user, self.jira_pwd))
@@ -636,6 +639,7 @@ class Jira:
         Remove the Epic (set to None) for a list of Issues.
         :param keys:List of IssueKeys.
         """
+        import requests
         for key in keys:
             s_data = {"fields": {"customfield_10100": None}}
             url = f"{self.rooturl}/rest/api/2/issue/{key}"
@@ -1,6 +1,3 @@
-import matplotlib.pyplot as plt
-
-
 # The BPMN-RPA System module is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
 # the Free Software Foundation, either version 3 of the License, or
@@ -59,6 +56,7 @@ class RiskMatrix:
 
     def __init__(self, title="Risk Matrix", x_label='probability', y_label='Impact', draw_limit=True,
                  limit_label='Risk tolerance limit'):
+        import matplotlib.pyplot as plt
         self.plt = plt
         self.fig = self.plt.figure()
         self.plt.subplots_adjust(wspace=0, hspace=0)
@@ -3,7 +3,6 @@ import os
 import subprocess
 import time
 from typing import Any
-import pyautogui
 
 
 # The BPMN-RPA System module is free software: you can redistribute it and/or modify
@@ -55,6 +54,7 @@ def screenshot(path: str) -> str:
     :param path: The full path of the location and filename (including the PNG extension) to save the screenshot.
     :returns: The pathname of the screenshot file.
     """
+    import pyautogui
     my_screenshot = pyautogui.screenshot()
     my_screenshot.save(path)
     return path
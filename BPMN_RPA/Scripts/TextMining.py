@@ -5,9 +5,6 @@ import shutil
 import subprocess
 import sys
 
-import BPMN_RPA.Scripts.SQLserver as SQLserver
-import spacy
-import tensorflow
 
 # The BPMN-RPA TextMining module is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -34,13 +31,18 @@ import tensorflow
 # THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
-#check if the attribute is present
-hasattr(tensorflow, '__version__')
-
-#if the attribute is not present
-if not hasattr(tensorflow, '__version__'):
-    #add the attribute
-    tensorflow.__version__ = sys.version
+def import_spacy():
+    """
+    Import Spacy when it is needed, because importing Spacy (and Tensorflow) takes a lot of time.
+    :return: The spacy module
+    """
+    import tensorflow
+    #if the attribute is not present
+    if not hasattr(tensorflow, '__version__'):
+        #add the attribute
+        tensorflow.__version__ = sys.version
+    import spacy
+    return spacy
 
 
 class TextMining:
@@ -58,6 +60,7 @@ class TextMining:
         """
         Internal function to connect to the Spacy model.
         """
+        spacy = import_spacy()
         self.nlp = spacy.load(self.standard_model)
 
     def __is_picklable__(self, obj: any) -> bool:
@@ -1899,6 +1902,7 @@ class TextMining:
         Fill the base_config.cfg file with remaining defaults and save it as config.cfg.
         After you’ve saved the starter config to a file base_config.cfg, you can use the init fill-config command to fill in the remaining defaults. Training configs should always be complete and without hidden defaults, to keep your experiments reproducible.
         """
+        spacy = import_spacy()
         # Check if english model is present
         nlp = None
         try:
@@ -1917,6 +1921,7 @@ class TextMining:
         :param model_name: The name of the model. Default is "model_best".
         :param language: The language of the data. Default is "en".
         """
+        spacy = import_spacy()
         nlp = spacy.blank(language)
         cfglang = ""
         # check if right language is used in config.cfg file
@@ -1985,6 +1990,7 @@ class TextMining:
         Load the model from the given path.
         :param model_path: The path to the model.
         """
+        spacy = import_spacy()
         self.nlp = spacy.load(model_path)
 
     def save_model(self, model_path):
@@ -1999,6 +2005,7 @@ class TextMining:
         Load the data from the given path.
         :param data_path: The path to the data.
         """
+        spacy = import_spacy()
         self.data = spacy.tokens.DocBin().from_disk(data_path)
 
     def predict(self, text):
@@ -2028,6 +2035,7 @@ class TextMining:
         :param table_name: The name of the table in the database. This table must have columns named 'text' and 'label'.
         :return: The data from the database.
         """
+        import BPMN_RPA.Scripts.SQLserver as SQLserver
         sqlserver = SQLserver.SQLserver(host, database)
         results = sqlserver.sqlserver_query_and_get_results("SELECT * FROM " + table_name)
         for result in results:
@@ -2043,6 +2051,7 @@ class TextMining:
         :param model_name: The name of the model. Default is "model_best".
         :param language: The language of the data. Default is "en".
         """
+        spacy = import_spacy()
         nlp = spacy.blank(language)
         cfglang = ""
         # check if right language is used in config.cfg file in the same folder as this module
@@ -1,14 +1,6 @@
+import importlib
 import pickle
 
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
-
 
 # The BPMN-RPA System module is free software: you can redistribute it and/or modify
 # it under the terms of the GNU General Public License as published by
@@ -116,6 +108,47 @@ from webdriver_manager.chrome import ChromeDriverManager
 # END OF TERMS AND CONDITIONS
 
 
+class LazyImport:
+
+    def __init__(self, module: str, name: str = ""):
+        """
+        Placeholder for a module (or a class in a module) that is imported when it is first used, because importing
+        Selenium and BeautifulSoup takes time that a flow that doesn't use this module shouldn't spend.
+        :param module: The name of the module.
+        :param name: Optional. The name of the class in the module. Default is the module itself.
+        """
+        self.module = module
+        self.name = name
+        self.target = None
+
+    def load(self) -> any:
+        """
+        Import the module (or class) at the first use.
+        :return: The module or class object.
+        """
+        if self.target is None:
+            target = importlib.import_module(self.module)
+            if len(self.name) > 0:
+                target = getattr(target, self.name)
+            self.target = target
+        return self.target
+
+    def __getattr__(self, item):
+        if item.startswith("__"):
+            raise AttributeError(item)
+        return getattr(self.load(), item)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+
+BeautifulSoup = LazyImport("bs4", "BeautifulSoup")
+webdriver = LazyImport("selenium.webdriver")
+By = LazyImport("selenium.webdriver.common.by", "By")
+EC = LazyImport("selenium.webdriver.support.expected_conditions")
+WebDriverWait = LazyImport("selenium.webdriver.support.ui", "WebDriverWait")
+
+
 class Web:
 
     def __init__(self, url=""):
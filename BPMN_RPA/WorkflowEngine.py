@@ -1,27 +1,34 @@
 import base64
+import binascii
+import bisect
+import collections
+import collections.abc
 import copy
+import functools
+import hashlib
 import importlib
 import importlib.util as util
 import inspect
 import json
-import math
 import os
+import pickle
+import queue
+import re
 import sys
-
-import psycopg2
-from werkzeug.utils import secure_filename
+import tempfile
+import threading
+import time
+import weakref
 
 if os.name == 'nt':
     import winreg
 else:
     pass
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from inspect import signature
 from sqlite3 import connect
-from pyodbc import connect as connectSQL
-
-import xmltodict
 
 
 # The BPMN-RPA WorkflowEngine is free software: you can redistribute it and/or modify
@@ -39,10 +46,162 @@ import xmltodict
 # Copyright 2020-2021 Joost van Gils (J.W.N.M. van Gils)
 
 
+class Settings:
+    registry_names = {"dbpath": "dbPath", "pythonpath": "PythonPath"}  # setting name -> registry value name
+
+    def __init__(self, path: str = "/etc/BPMN_RPA_settings", registry_path: str = r"SOFTWARE\BPMN_RPA"):
+        """
+        Class holding the BPMN_RPA settings ('dbpath' and 'pythonpath') in memory. On Windows the settings are stored in
+        the registry, on other systems in a JSON file that is only read again when it has been changed. A setting can be
+        overridden with an environment variable BPMN_RPA_<NAME>, like BPMN_RPA_DBPATH.
+        :param path: Optional. The full path of the settings file. Default is '/etc/BPMN_RPA_settings'.
+        :param registry_path: Optional. The registry key (in HKEY_CURRENT_USER) of the settings on Windows.
+        """
+        self.path = path
+        self.registry_path = registry_path
+        self.values = None
+        self.file_state = None  # (modification time, size) of the settings file when it was read
+        self.lock = threading.Lock()
+
+    def get(self, name: str) -> any:
+        """
+        Get the value of a setting.
+        :param name: The name of the setting, like 'dbpath'.
+        :return: The value of the setting, or None if the setting doesn't exist.
+        """
+        override = os.environ.get(f"BPMN_RPA_{name.upper()}")
+        if override is not None:
+            return override
+        with self.lock:
+            return self.load().get(name)
+
+    def set(self, name: str, value: str) -> bool:
+        """
+        Save the value of a setting.
+        :param name: The name of the setting, like 'dbpath'.
+        :param value: The value of the setting.
+        :return: True if the setting was saved, False if not.
+        """
+        return self.update({name: value})
+
+    def update(self, values: dict) -> bool:
+        """
+        Save the values of one or more settings. The settings file is replaced at once, so a reader never sees a partly
+        written file. Settings that are overridden by an environment variable are not saved.
+        :param values: A dictionary with the names and values of the settings.
+        :return: True if the settings were saved, False if not.
+        """
+        values = {k: v for k, v in values.items() if os.environ.get(f"BPMN_RPA_{k.upper()}") is None}
+        with self.lock:
+            current = self.load()
+            if all(current.get(k) == v for k, v in values.items()):
+                return True
+            if os.name == 'nt':
+                try:
+                    winreg.CreateKey(winreg.HKEY_CURRENT_USER, self.registry_path)
+                    registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.registry_path, 0,
+                                                  winreg.KEY_WRITE)
+                    for name, value in values.items():
+                        winreg.SetValueEx(registry_key, self.registry_names.get(name, name), 0, winreg.REG_SZ, value)
+                    winreg.CloseKey(registry_key)
+                except WindowsError:
+                    return False
+                current.update(values)
+                return True
+            data = dict(current)
+            data.update(values)
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "w") as outfile:
+                json.dump(data, outfile)
+            os.replace(temp_path, self.path)
+            self.values = data
+            self.file_state = self.get_file_state()
+            return True
+
+    def load(self) -> dict:
+        """
+        Get the settings from memory. The settings are read from the settings file again when it has been changed. On
+        Windows the registry is read once.
+        :return: A dictionary with the settings.
+        """
+        if os.name == 'nt':
+            if self.values is None:
+                self.values = self.read_registry()
+            return self.values
+        state = self.get_file_state()
+        if self.values is None or state != self.file_state:
+            self.values = {}
+            if state is not None:
+                with open(self.path, "r") as json_file:
+                    self.values = json.load(json_file)
+            self.file_state = state
+        return self.values
+
+    def get_file_state(self) -> any:
+        """
+        Get the modification time and size of the settings file.
+        :return: A tuple with the modification time and the size, or None if the file doesn't exist.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def read_registry(self) -> dict:
+        """
+        Read the settings from the registry.
+        :return: A dictionary with the settings that exist in the registry.
+        """
+        values = {}
+        for name, registry_name in self.registry_names.items():
+            try:
+                registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.registry_path, 0, winreg.KEY_READ)
+                value, regtype = winreg.QueryValueEx(registry_key, registry_name)
+                winreg.CloseKey(registry_key)
+                values[name] = value
+            except WindowsError:
+                pass
+        return values
+
+
 class WorkflowEngine:
+    loaded_modules = {}  # Modules loaded from file in this process: full path -> (modification time, module object)
+    variable_pattern = re.compile(r"%[^%]*%")  # A variable in a Shape value, like '%variable%'
+    base64_pattern = re.compile(rb"[A-Za-z0-9+/]{4,}={0,2}")  # Base64 text in a binary flow file
+    base64_list_pattern = re.compile(rb"W[3wy1]")  # The start of a base64 encoded JSON list, like '[{' or '[ '
+    log_levels = {"quiet": 0, "step": 1, "loop-item": 2, "debug": 3}
+    log_lock = threading.RLock()  # Serializes the logging of steps that run in parallel branches
+    settings = Settings()  # The dbpath and pythonpath settings of this process
+    system_variable_pattern = re.compile(r"%__\w+?__%")  # A system variable in a Shape value, like '%__today__%'
+    # The functions that return the values of the system variables, called when the variable is replaced
+    system_variable_values = {
+        '%__today__%': lambda: datetime.today().date(),
+        '%__today_formatted__%': lambda: datetime.today().date().strftime("%d-%m-%Y"),
+        '%__month__%': lambda: "{:02d}".format(datetime.today().month),
+        '%__year__%': lambda: datetime.today().year,
+        '%__weeknumber__%': lambda: datetime.today().strftime("%V"),
+        '%__tomorrow__%': lambda: datetime.today() + timedelta(days=1),
+        '%__tomorrow_formatted__%': lambda: (datetime.today() + timedelta(days=1)).strftime("%d-%m-%Y"),
+        '%__yesterday__%': lambda: datetime.today() + timedelta(days=-1),
+        '%__yesterday_formatted__%': lambda: (datetime.today() + timedelta(days=-1)).strftime("%d-%m-%Y"),
+        '%__time__%': lambda: datetime.now().time(),
+        '%__time_formatted__%': lambda: datetime.now().time().strftime("%H:%M:%S"),
+        '%__now__%': lambda: datetime.now(),
+        '%__now_formatted__%': lambda: datetime.today().date().strftime("%d-%m-%Y") + "_" + datetime.now().time().strftime(
+            "%H%M%S"),
+        '%__folder_desktop__%': lambda: os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop'),
+        '%__folder_downloads__%': lambda: os.path.join(os.path.join(os.environ['USERPROFILE']), 'Downloads'),
+        '%__folder_system__%': lambda: os.environ['WINDIR'] + "\\System\\",
+        '%__user_name__%': lambda: os.getenv('username'),
+    }
 
     def __init__(self, input_parameter: any = None, pythonpath: str = "", installation_directory: str = "",
-                 delete_records_older_than_days=0, subflow: bool = False, use_sql_server: bool = False, use_postgresql: bool = False, connection_string: str = ""):
+                 delete_records_older_than_days=0, subflow: bool = False, use_sql_server: bool = False, use_postgresql: bool = False, connection_string: str = "",
+                 asynchronous_logging: bool = True, log_level: str = "debug", runlog_size: int = 1000,
+                 max_workers: int = None, flow_cache: bool = False, flow_cache_folder: str = "", profile: bool = False, profile_folder: str = "",
+                 free_variables: bool = True, keep_variables: list = None, spill_threshold: int = 0,
+                 spill_folder: str = "", variable_store: any = None, trace: bool = False, trace_folder: str = ""):
         """
         Class for automating DrawIO diagrams
         :param input_parameter: An object holding arguments to be passed as input to the WorkflowEngine. In a flow, use get_input_parameter to retrieve the value.
@@ -53,8 +212,24 @@ class WorkflowEngine:
         :param use_postgresql: Optional. This parameter is used to indicate that the PostgreSQL database on the localhost will be used with a trusted connection. Default is False.
         :param connection_string: Optional. The connection string for the database. If this is set, it must be set with either the use_sql_server or the use_postgresql parameter. When using PostgreSQL then use the psycopg2 connection string format. When using SQL Server then use the pyodbc connection string format. Default is "". Example MsSql server: "Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=master;Trusted_Connection=yes;". Example PostgreSQL: "dbname='postgres' user='postgres' host='localhost' password='postgres'".
         :param subflow: Optional. This parameter is used to indicate that the flow is a subflow (started from another flow). This is used to make a distinction between the logging of the original flow and the instance of the flow. Default is False.
+        :param asynchronous_logging: Optional. Write the step logging to the orchestrator database in batches from a background thread. The queued logging is written at the end of the flow and when an error occurs. Set to False to write and commit each log record immediately. Default is True.
+        :param log_level: Optional. The amount of logging to print and write to the orchestrator database: 'quiet' (only the end of the flow), 'step' (each executed step), 'loop-item' (steps and loop items) or 'debug' (everything, including the results of the steps). Default is 'debug'.
+        :param runlog_size: Optional. The maximum number of log lines to keep in the runlog attribute. Older lines are removed. Default is 1000.
+        :param max_workers: Optional. The maximum number of threads that run the branches of a Parallel Gateway or the items of a parallel loop at the same time. Default is None, which lets Python choose the number of threads.
+        :param flow_cache: Optional. Save the steps of a flow that is opened with open_flow (or run with run_flow and the path of the flow file) in the flow cache folder, so the flow file doesn't have to be parsed again until it is changed. Default is False.
+        :param flow_cache_folder: Optional. The folder of the flow cache. Default is the 'flow_cache' folder of the installation directory.
+        :param profile: Optional. Measure the time of each step (wall time, CPU time and the time spent on binding the input parameters, the call and logging). At the end of the flow the measurements are saved in the StepMetrics table and in a JSON and CSV report. Default is False.
+        :param profile_folder: Optional. The folder for the JSON and CSV reports of the profile. Default is the 'profiles' folder of the installation directory.
+        :param free_variables: Optional. Remove a variable from the variables of the flow after the last step that reads it, so the memory of large results (like table data, texts of documents or lists of e-mails) is released while the flow runs. Set to False to keep all variables until the end of the flow. Default is True.
+        :param keep_variables: Optional. A list with the names of variables (like '%result%') that are never removed, for example because they are read by your own code through the WorkflowEngine object instead of with a %variable% in a Shape value. Default is None.
+        :param spill_threshold: Optional. The estimated size in bytes above which the value of a variable (a list, tuple, dictionary, text or bytes) is written to a spill file on disk instead of being kept in memory. The value is read back when it is used, and the items of a loop over a spilled list are read page by page. Default is 0, which keeps all values in memory.
+        :param spill_folder: Optional. The folder for the spill files. Default is the 'spill' folder of the installation directory.
+        :param variable_store: Optional. A function (or class) that is called without arguments to create the dictionary-like object that holds the variables of a run, for example a subclass of VariableStore with another spill file. Default is None, which uses a VariableStore when spill_threshold is set and a dictionary otherwise.
+        :param trace: Optional. Record a timeline of each run with a span for the flow, each step, each loop item, each write to the orchestrator database and each subflow (a flow that is started from a step, like with System.run_other_flow or Code.run_flow). At the end of the flow the timeline is saved in the Chrome Trace Event format, which can be opened in a trace viewer like chrome://tracing or https://ui.perfetto.dev. Default is False.
+        :param trace_folder: Optional. The folder for the timelines. Default is the 'traces' folder of the installation directory.
         """
-        settings = {}
+        if str(log_level).lower() not in self.log_levels:
+            raise Exception(f"Unknown log level '{log_level}'. Use one of: {', '.join(self.log_levels)}.")
         self.subflow = subflow
         self.use_sql_server = use_sql_server
         self.use_postgresql = use_postgresql
@@ -64,24 +239,11 @@ class WorkflowEngine:
         if input_parameter is None:
             input_parameter = ""
         if len(pythonpath) != 0:
-            if os.name == 'nt':
-                self.set_python_path(pythonpath)
-            else:
-                settings.update({'pythonpath': pythonpath})
+            self.set_python_path(pythonpath)
         else:
-            if os.name == 'nt':
-                pythonpath = self.get_python_path()
+            pythonpath = self.get_python_path()
+            if os.name == 'nt' and pythonpath is not None:
                 pythonpath = pythonpath.replace("/", "\\")
-            else:
-                sett = '/etc/BPMN_RPA_settings'
-                if not os.path.exists(sett):
-                    file = open(sett, "w")
-                    file.write("{\"pythonpath\": \"\", \"dbpath\":\"\"}")
-                    file.close()
-                json_file = open(sett, "r")
-                data = json.load(json_file)
-                json_file.close()
-                pythonpath = data["pythonpath"]
         if len(installation_directory) != 0:
             self.set_db_path(installation_directory)
             self.db_folder = installation_directory
@@ -121,10 +283,7 @@ class WorkflowEngine:
             else:
                 self.set_python_path(pythonpath)
         if os.name != 'nt':
-            settings.update({'dbpath': self.db_folder})
-            settings.update({'pythonpath': pythonpath})
-            with open('/etc/BPMN_RPA_settings', 'w') as outfile:
-                json.dump(settings, outfile)
+            self.settings.update({'dbpath': self.db_folder, 'pythonpath': pythonpath})
         self.input_parameter = input_parameter
         self.pythonPath = pythonpath
         if os.name == 'nt':
@@ -138,6 +297,10 @@ class WorkflowEngine:
                 else:
                     self.packages_folder = pythonpath
         self.db = SQL(dbfolder=self.db_folder, useSQLserver=self.use_sql_server, usePostgres=self.use_postgresql, connection_string=self.connection_string)
+        self.default_db = (self.db, use_sql_server)  # The database of the WorkflowEngine, for reset after a flow that uses another database
+        self.asynchronous_logging = asynchronous_logging
+        self.log_writer = None
+        self.start_log_writer()
         if delete_records_older_than_days > 0:
             self.db.remove_records_with_timestamp_older_than(delete_records_older_than_days)
         self.db.orchestrator()  # Run the orchestrator database
@@ -146,13 +309,70 @@ class WorkflowEngine:
         self.step_name = None
         self.flowname = None
         self.flowpath = None
-        self.loopvariables = []
+        self.loopvariables = LoopVariables()
+        self.previous_step = None
+        self.step_nr = 0
+        self.step_input = None
+        self.current_step = None
+        self.log_level = self.log_levels[str(log_level).lower()]
+        self.runlog = collections.deque(maxlen=runlog_size)
+        if variable_store is None and spill_threshold > 0:
+            if len(spill_folder) == 0:
+                spill_folder = os.path.join(self.db_folder, "spill")
+            variable_store = functools.partial(VariableStore, spill_folder, spill_threshold)
+        self.variable_store = variable_store or dict  # Creates the dictionary-like object for the variables of a run
+        self.variables = self.variable_store()  # Dictionary to hold WorkflowEngine variables
+        self.flow_graph = None  # Index of the flow steps, built by get_flow
+        self.step_callables = {}  # Resolved (module, class, function) per step id
+        self.binding_plans = {}  # (function, BindingPlan) per step id
+        self.max_workers = max_workers
+        self.join_step = None  # The joining Parallel Gateway where a parallel branch has stopped
+        self.flow_cache = None
+        self.compiled_plans = {}  # step id -> (source file, modification time, BindingPlan) from a compiled flow
+        self.profiler = StepProfiler() if profile else None
+        self.profile_folder = profile_folder
+        self.tracer = FlowTracer() if trace else None
+        self.trace_folder = trace_folder
+        self.run_tracer = None  # The tracer of the run: the own tracer, or the tracer of the flow that started this flow
+        self.trace_start = None
+        self.free_variables = free_variables
+        self.keep_variables = set(keep_variables or [])  # Variables that are not removed by release_variables
+        if flow_cache and len(flow_cache_folder) == 0 and self.db_folder is not None and len(self.db_folder) > 0:
+            flow_cache_folder = os.path.join(self.db_folder, "flow_cache")
+        if flow_cache and len(flow_cache_folder) > 0:
+            self.flow_cache = FlowCache(flow_cache_folder)
+
+    def reset(self, input_parameter: any = None):
+        """
+        Reset the state of the flow, so the WorkflowEngine object (with its database connection and loaded modules) can
+        be used to run another flow.
+        :param input_parameter: Optional. The input parameter for the next flow.
+        """
+        if input_parameter is None:
+            input_parameter = ""
+        if self.db is not self.default_db[0]:
+            # The previous flow has switched to the SQL Server in its information: use the own database again
+            self.db, self.use_sql_server = self.default_db
+            self.start_log_writer()
+        self.information = ""
+        self.input_parameter = input_parameter
+        self.id = -1
+        self.error = None
+        self.step_name = None
+        self.flowname = None
+        self.flowpath = None
+        self.loopvariables = LoopVariables()
         self.previous_step = None
         self.step_nr = 0
         self.step_input = None
         self.current_step = None
-        self.runlog = []
-        self.variables = {}  # Dictionary to hold WorkflowEngine variables
+        self.runlog.clear()
+        self.variables = self.variable_store()
+        self.flow_graph = None
+        self.join_step = None
+        self.compiled_plans = {}
+        self.run_tracer = None
+        self.clear_step_caches()
 
     def get_input_parameter(self, as_dictionary: bool = False) -> any:
         """
@@ -168,7 +388,8 @@ class WorkflowEngine:
                                                                                                                  "Yes").replace(
                         "no", "No")
                 self.input_parameter = eval(self.input_parameter)
-        self.print_log(f"Got input parameter {str(self.input_parameter)}", "Processing Input")
+        if self.is_logged("debug"):
+            self.print_log(f"Got input parameter {str(self.input_parameter)}", "Processing Input", "debug")
         return self.input_parameter
 
     def convert_binary_flow_to_default_file_format(self, flowpath: str) -> str:
@@ -197,6 +418,11 @@ class WorkflowEngine:
         decoded = None
         if filepath is not None:
             self.flowpath = filepath
+        if filepath is not None and filepath.lower().endswith(".flwc"):
+            entry = FlowCache.read(filepath)
+            if entry.get("version") != FlowCache.version:
+                raise Exception(f"The compiled flow '{filepath}' was made by another version of the WorkflowEngine. Compile the flow again.")
+            return self.open_cached_flow(entry)
         if not filepath.__contains__(".vsdx"):
             if filepath.__contains__(".flw"):
                 self.flowname = filepath.split("\\")[-1].replace(".flw", "")
@@ -214,63 +440,20 @@ class WorkflowEngine:
                         if self.use_sql_server:
                             self.db = SQL(dbfolder=self.db_folder, useSQLserver=self.use_sql_server)
                             self.db.orchestrator()  # Run the orchestrator database
+                            self.start_log_writer()
                     return retn
                 except UnicodeDecodeError as e:
                     # Found non-text data in the file
                     print(e)
-                    try:
-                        with open(filepath, "rb") as binary_file:
-                            binary_file.seek(24)
-                            # Read the whole file at once
-                            content = binary_file.read()
-                        str_content = content.decode("ascii", errors='ignore')
-                        decoded = None
-                    except Exception as e:
-                        print(e)
-                        pass
-                    try:
-                        decoded = base64.b64decode(str_content).decode("ascii", errors='ignore')
-                        if decoded.__contains__("}]@"):
-                            decoded = decoded[0:decoded.index("}]@") + 2]
-                        if decoded is not None:
-                            if decoded.__contains__("}]"):
-                                decoded = decoded[0:decoded.rfind("}]") + 2]
-                    except Exception as e:
-                        print(e)
-                        str_content = str_content[:-1]
-                        str_content = "".join([x for x in str_content if x != '' and x != '']).strip().strip(
-                            '\x00').strip('\x01').strip('\x0b')
-                    if decoded is None:
-                        try:
-                            decoded = base64.b64decode(str_content).decode("ascii", errors='ignore')
-                        except (ValueError, Exception):
-                            remain = math.ceil((len(str_content) / 4) - int(len(str_content) / 4))
-                            str_content = str_content[0:len(str_content) - remain]
-                            idx = 0
-                            if str_content.__contains__("fV0") and not str_content.__contains__("In1d"):
-                                str_content = str_content.split("fV0")[0][1:] + "fV0==="
-                            if str_content.__contains__("In1d"):
-                                if str_content.__contains__("In1d") + 4 > idx:
-                                    idx = str_content.index("In1d") + 4
-                            while idx > 0 and str_content.__contains__("In1d") and not str_content.endswith("In1d"):
-                                idx = str_content.index("In1d") + 4
-                                str_content = str_content[0:idx]
-                            try:
-                                decoded = base64.b64decode(str_content).decode("ascii", errors='ignore')
-                            except (ValueError, Exception):
-                                for i in range(0, 4):
-                                    str_content = str_content[0:-1]
-                                    try:
-                                        decoded = base64.b64decode(str_content).decode("ascii", errors='ignore')
-                                        break
-                                    except (ValueError, Exception):
-                                        pass
-                            if decoded.__contains__("}]"):
-                                decoded = decoded[0:decoded.rfind("}]") + 2]
-                    dict_list = json.loads(decoded)
+                    with open(filepath, "rb") as binary_file:
+                        binary_file.seek(24)
+                        # Read the whole file at once
+                        content = binary_file.read()
+                    dict_list = json.loads(self.decode_binary_flow(content))
                     return dict_list
             else:
                 self.flowname = filepath.split("\\")[-1].replace(".xml", "")
+                import xmltodict
                 xml_file = open(filepath, "r").read()
                 retn = xmltodict.parse(xml_file)
                 return retn
@@ -281,31 +464,48 @@ class WorkflowEngine:
             visio.open_vsdx_file(filepath)
             return visio
 
+    @staticmethod
+    def decode_binary_flow(content: bytes) -> str:
+        """
+        Decode the flow in the content of a binary .flw file. The flow is the longest base64 text in the content. Its
+        boundaries are found in one pass and it is decoded from a memoryview, so the content isn't copied.
+        :param content: The content of the binary .flw file.
+        :return: The flow as JSON text.
+        """
+        start, end = 0, 0
+        for match in WorkflowEngine.base64_pattern.finditer(content):
+            if match.end() - match.start() > end - start:
+                start, end = match.span()
+        if end == start:
+            raise Exception("The flow file doesn't contain a flow.")
+        # The length of the text is saved before the text, and its last byte can be a base64 character
+        first = WorkflowEngine.base64_list_pattern.search(content, start, min(start + 6, end))
+        if first is not None:
+            start = first.start()
+        data = memoryview(content)[start:end]
+        length = len(data) - len(data) % 4
+        decoded = binascii.a2b_base64(data[:length])
+        rest = bytes(data[length:])
+        if len(rest) > 1:
+            # The padding of the last characters is missing
+            try:
+                decoded += binascii.a2b_base64(rest + b"=" * (4 - len(rest)))
+            except binascii.Error:
+                pass
+        end = decoded.find(b"}]@")
+        if end < 0:
+            end = decoded.rfind(b"}]")
+        if end < 0:
+            end = len(decoded) - 2
+        return str(memoryview(decoded)[:end + 2], "ascii", "ignore")
+
     @staticmethod
     def set_db_path(value: str):
         """
-        Write the orchestrator database path to the registry.
+        Write the orchestrator database path to the registry (Windows) or the settings file.
         :param value: The path of the orchestrator database that has to be written to the registry
         """
-        if os.name == 'nt':
-            try:
-                reg_path = r"SOFTWARE\BPMN_RPA"
-                winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path)
-                registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0,
-                                              winreg.KEY_WRITE)
-                winreg.SetValueEx(registry_key, "dbPath", 0, winreg.REG_SZ, value)
-                winreg.CloseKey(registry_key)
-                return True
-            except WindowsError:
-                return False
-        else:
-            json_file = open('/etc/BPMN_RPA_settings', 'r')
-            data = json.load(json_file)
-            json_file.close()
-            data["dbpath"] = value
-            json_file = open('/etc/BPMN_RPA_settings', 'w')
-            json.dump(data, json_file)
-            json_file.close()
+        return WorkflowEngine.settings.set("dbpath", value)
 
     @staticmethod
     def get_db_path() -> any:
@@ -313,20 +513,7 @@ class WorkflowEngine:
         Get the path to the orchestrator database
         :return: The path to the orchestrator database
         """
-        if os.name == 'nt':
-            try:
-                reg_path = r"SOFTWARE\BPMN_RPA"
-                registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0, winreg.KEY_READ)
-                value, regtype = winreg.QueryValueEx(registry_key, 'dbPath')
-                winreg.CloseKey(registry_key)
-                return value
-            except WindowsError:
-                return None
-        else:
-            json_file = open('/etc/BPMN_RPA_settings', 'r')
-            data = json.load(json_file)
-            json_file.close()
-            return data["dbpath"]
+        return WorkflowEngine.settings.get("dbpath")
 
     @staticmethod
     def get_python_path() -> any:
@@ -334,46 +521,31 @@ class WorkflowEngine:
         Get the path to the Python.exe file
         :return: The path to the Python.exe file
         """
-        if os.name == 'nt':
-            try:
-                reg_path = r"SOFTWARE\BPMN_RPA"
-                registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0, winreg.KEY_READ)
-                value, regtype = winreg.QueryValueEx(registry_key, 'PythonPath')
-                winreg.CloseKey(registry_key)
-                return value
-            except WindowsError:
-                return None
-        else:
-            json_file = open('/etc/BPMN_RPA_settings', 'r')
-            data = json.load(json_file)
-            json_file.close()
-            return data["pythonpath"]
+        return WorkflowEngine.settings.get("pythonpath")
 
     @staticmethod
     def set_python_path(value: str):
         """
-        Write the oPython path to the registry.
+        Write the oPython path to the registry (Windows) or the settings file.
         :param value: The path of the Python.exe file that has to be written to the registry
         """
-        if os.name == 'nt':
-            try:
-                reg_path = r"SOFTWARE\BPMN_RPA"
-                winreg.CreateKey(winreg.HKEY_CURRENT_USER, reg_path)
-                registry_key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0,
-                                              winreg.KEY_WRITE)
-                winreg.SetValueEx(registry_key, "PythonPath", 0, winreg.REG_SZ, value)
-                winreg.CloseKey(registry_key)
-                return True
-            except WindowsError:
-                return False
-        else:
-            json_file = open('/etc/BPMN_RPA_settings', 'r')
-            data = json.load(json_file)
-            json_file.close()
-            data["pythonpath"] = value
-            json_file = open('/etc/BPMN_RPA_settings', 'w')
-            json.dump(data, json_file)
-            json_file.close()
+        return WorkflowEngine.settings.set("pythonpath", value)
+
+    def open_cached_flow(self, entry: dict) -> any:
+        """
+        Use the cached steps of a flow instead of opening the flow file.
+        :param entry: The cache entry of the flow, as returned by FlowCache.load.
+        :return: A CachedFlow object, to pass to get_flow.
+        """
+        self.flowname = entry["flowname"]
+        if entry["information"] is not None:
+            self.information = entry["information"]
+        if entry["use_sql_server"]:
+            self.use_sql_server = True
+            self.db = SQL(dbfolder=self.db_folder, useSQLserver=self.use_sql_server)
+            self.db.orchestrator()  # Run the orchestrator database
+            self.start_log_writer()
+        return CachedFlow(entry["steps"], entry["graph"], entry.get("binding_plans"))
 
     def get_flow(self, ordered_dict: any) -> any:
         """
@@ -381,22 +553,162 @@ class WorkflowEngine:
         :param ordered_dict: The document object containing the flow elements.
         :returns: A List of flow elements
         """
+        if isinstance(ordered_dict, CachedFlow):
+            self.compiled_plans = ordered_dict.binding_plans
+            self.flow_graph = ordered_dict.graph
+            return ordered_dict.steps
+        self.compiled_plans = {}
+        return self.build_flow(ordered_dict)
+
+    def open_flow(self, filepath: str) -> list:
+        """
+        Open a flow file and get its steps. When the flow cache is used, the steps are taken from the cache if the flow
+        file hasn't been changed, and else they are saved in the cache.
+        :param filepath: The full path (including extension) of the flow file.
+        :return: A List of flow elements
+        """
+        if self.flow_cache is None or filepath.lower().endswith(".flwc"):
+            return self.get_flow(self.open(filepath))
+        entry, state = self.flow_cache.load(filepath)
+        if entry is not None:
+            self.flowpath = filepath
+            return self.get_flow(self.open_cached_flow(entry))
+        steps = self.get_flow(self.open(filepath))
+        if state is not None:
+            self.flow_cache.save((filepath,) + state, self.get_flow_entry(steps))
+        return steps
+
+    def get_flow_entry(self, steps: list) -> dict:
+        """
+        Get the steps of the flow with the information that is needed to run them, for saving in the FlowCache or in a
+        compiled flow.
+        :param steps: The steps of the flow, as returned by get_flow.
+        :return: A dictionary with the flow entry.
+        """
+        return {"flowname": self.flowname, "information": self.information or None,
+                "use_sql_server": self.use_sql_server, "steps": steps, "graph": self.get_flow_graph(steps)}
+
+    def compile_flow(self, filepath: str, targetpath: str = "") -> str:
+        """
+        Compile a flow (.flw, .xml or .vsdx) into a compiled flow file (.flwc). The compiled flow contains the steps with
+        their resolved module paths, the binding plans of the input parameters (with the system variables they use) and
+        the successor graph, so it can be run without parsing and resolving the flow. The modules, classes and
+        functions of the steps and the sequence arrows of the Exclusive Gateways are checked when the flow is compiled.
+        A compiled flow is run like any other flow file, and should be compiled again on another machine or installation directory.
+        :param filepath: The full path of the flow file.
+        :param targetpath: Optional. The full path of the compiled flow. Default is the path of the flow file with the extension '.flwc'.
+        :return: The full path of the compiled flow.
+        """
+        doc = self.open(filepath)
+        steps = self.get_flow(doc)
+        errors = self.validate_flow(steps)
+        if len(errors) > 0:
+            raise Exception(f"The flow '{filepath}' can't be compiled:\n" + "\n".join(errors))
+        entry = self.get_flow_entry(steps)
+        entry.update({"version": FlowCache.version, "source": os.path.abspath(filepath),
+                      "binding_plans": self.get_compiled_plans(steps)})
+        if len(targetpath) == 0:
+            targetpath = os.path.splitext(filepath)[0] + ".flwc"
+        FlowCache.write(targetpath, entry)
+        return targetpath
+
+    def validate_flow(self, steps: list) -> list:
+        """
+        Check if the modules, classes and functions of the steps can be found and if the Exclusive Gateways have a
+        'True' and a 'False' sequence arrow.
+        :param steps: The steps of the flow, as returned by get_flow.
+        :return: A list with the errors that were found.
+        """
+        errors = []
+        graph = self.get_flow_graph(steps)
+        for step in steps:
+            step_type = str(getattr(step, "type", "")).lower()
+            name = getattr(step, "name", "") or step.id
+            if step_type == "exclusive gateway":
+                outgoing = graph.outgoing.get(step.id, [])
+                for conn in outgoing:
+                    value = str(getattr(conn, "value", ""))
+                    if value.lower() not in ["true", "yes", "false", "no"]:
+                        errors.append(f"Exclusive Gateway '{name}': the sequence arrow with label '{value}' must have the label 'True' or 'False'.")
+                for successors, label in [(graph.true_successor, "True"), (graph.false_successor, "False")]:
+                    if len(outgoing) == 0:
+                        break
+                    if step.id not in successors:
+                        errors.append(f"Exclusive Gateway '{name}' doesn't contain a '{label}' sequence arrow output.")
+                    elif successors[step.id] is None:
+                        errors.append(f"The '{label}' sequence arrow of Exclusive Gateway '{name}' isn't connected to a step.")
+            elif step_type not in ["connector", "disabled"] and len(str(getattr(step, "function", ""))) > 0:
+                try:
+                    if hasattr(step, "module"):
+                        self.get_step_callable(step)
+                    elif not str(getattr(step, "classname", "")).startswith("%"):
+                        getattr(self, step.function)
+                except Exception as ex:
+                    errors.append(f"Step '{name}': {ex}")
+        return errors
+
+    def get_compiled_plans(self, steps: list) -> dict:
+        """
+        Get the binding plans of the steps for a compiled flow. A plan is stored with the source file of the function and
+        its modification time, so it isn't used when the function may have been changed.
+        :param steps: The steps of the flow, of which the functions have been resolved with get_step_callable.
+        :return: A dictionary with step id -> (source file, modification time, BindingPlan).
+        """
+        retn = {}
+        for step in steps:
+            resolved = self.step_callables.get(step.id)
+            if resolved is None:
+                continue
+            target = resolved[2] if resolved[2] is not None else resolved[1]
+            state = self.get_source_state(target)
+            if target is None or state is None:
+                continue
+            plan = self.get_binding_plan(step, target)
+            try:
+                pickle.dumps(plan)
+            except Exception:
+                # The default values can't be saved: the plan is made when the flow runs
+                continue
+            retn[step.id] = state + (plan,)
+        return retn
+
+    @staticmethod
+    def get_source_state(target: any) -> any:
+        """
+        Get the source file of a function and its modification time.
+        :param target: The function or method.
+        :return: A tuple with the full path of the source file and its modification time, or None if there is no source file.
+        """
+        try:
+            path = inspect.getfile(getattr(target, "__func__", target))
+            return path, os.path.getmtime(path)
+        except Exception:
+            return None
+
+    def build_flow(self, ordered_dict: any) -> any:
+        """
+        Build the step objects of the flow from the Document.
+        :param ordered_dict: The document object containing the flow elements.
+        :returns: A List of flow elements
+        """
         if str(ordered_dict).__contains__("Visio object"):
             # It is a Visio Object!
             visio = ordered_dict
-            return visio.get_flow()
+            retn = visio.get_flow()
+            self.flow_graph = FlowGraph(retn)
+            return retn
         # route for .flw flows
         if isinstance(ordered_dict, list):
             retn = []
             for rw in ordered_dict:
-                tmp = self.dynamic_object()
+                tmp = Step()
                 for k, v in rw.items():
                     ky = k
                     if ky.lower() == "class":
                         ky = "classname"
                     setattr(tmp, ky, v)
-                self.store_system_variables(tmp)
                 retn.append(tmp)
+            self.flow_graph = FlowGraph(retn)
             # return .flw flow steps
             return retn
         connectors = []
@@ -417,33 +729,23 @@ class WorkflowEngine:
         if not isinstance(objects, list):
             # there is only one shape
             step = self.get_step_from_shape(objects)
-            self.store_system_variables(step)
             shapes.append(step)
         else:
             for shape in objects:
                 step = self.get_step_from_shape(shape)
-                self.store_system_variables(step)
                 shapes.append(step)
-        # Find start shape
-        for shape in shapes:
-            incoming_connector = None
-            outgoing_connector = None
-            for conn in connectors:
-                if hasattr(conn, "target"):
-                    if conn.target == shape.id:
-                        incoming_connector = conn
-                        break
-                    if hasattr(conn, "source"):
-                        if conn.source == shape.id:
-                            outgoing_connector = conn
-                            break
-            if incoming_connector is None and outgoing_connector is not None:
-                shape.IsStart = True
         for conn in connectors:
             val = connectorvalues.get(conn.id)
             if val is not None:
                 conn.value = val
         retn = shapes + connectors
+        self.flow_graph = FlowGraph(retn)
+        # Find start shape: the first shape without incoming sequence flow arrows
+        for shape in self.flow_graph.find_start_shapes():
+            if shape.type == "shape":
+                shape.IsStart = True
+                self.flow_graph.start = shape
+                break
         return retn
 
     def get_step_from_shape(self, shape: any) -> any:
@@ -452,7 +754,7 @@ class WorkflowEngine:
         :param shape: The Shape-object
         :returns: A Step-object
         """
-        retn = self.dynamic_object()
+        retn = Step()
         retn.id = shape.get("@id")
         for key, value in shape.items():
             attr = str(key).lower().replace("@", "")
@@ -484,21 +786,7 @@ class WorkflowEngine:
         """
         if not isinstance(text, str):
             return None
-        retn = []
-        start = -1
-        end = -1
-        t = 0
-        for c in text:
-            if c == "%":
-                if start > -1:
-                    end = t
-                if start == -1:
-                    start = t
-                if start > -1 and end > -1:
-                    retn.append(text[start: end + 1])
-                    start = -1
-                    end = -1
-            t += 1
+        retn = WorkflowEngine.variable_pattern.findall(text)
         if len(retn) == 0:
             retn = None
         return retn
@@ -510,10 +798,17 @@ class WorkflowEngine:
         :param input_signature: The input parameters of the function that needs to be called
         :return: A mapping string
         """
-        mapping = {}
-        return_none = True
-        tmp = None
-        if input_signature is None:
+        return self.bind_parameters(step, BindingPlan(step, input_signature))
+
+    def bind_parameters(self, step: any, plan: any) -> any:
+        """
+        Create the mapping of the input parameters from a binding plan. Only the parameters that contain variables are
+        evaluated, the other values are taken from the plan as they are.
+        :param step: The step the binding plan was created for
+        :param plan: The BindingPlan of the step
+        :return: A mapping string
+        """
+        if plan.input_signature is None:
             if hasattr(self.previous_step, "output_variable"):
                 var = self.variables.get(self.previous_step.output_variable)
                 if var is not None:
@@ -521,224 +816,185 @@ class WorkflowEngine:
                 else:
                     return None
             return None
-        for key, value in input_signature.parameters.items():
-            attr = None
-            if str(key).lower() != "self":
-                try:
-                    val = str(getattr(step, str(key).lower()))
-                except (ValueError, Exception):
-                    if str(value).__contains__("="):
-                        val = value.default
-                    else:
-                        val = None
-                if val is not None:
-                    if len(str(val)) == 0:
-                        if input is not None:
-                            if str(value.default) == "None":
-                                val = None
-                            else:
-                                val = ""
-                        else:
-                            if str(value).__contains__("="):
-                                val = value.default
-                            else:
-                                val = "''"
-                    else:
-                        return_none = False
-                if isinstance(val, str):
-                    if val == "True" or val == "Yes":
-                        val = True
-                    elif val == "False" or val == "No":
-                        val = False
+        if plan.return_none:
+            return None
+        mapping = {}
+        tmp = None
+        for key, val, template in plan.parameters:
+            if template is not None:
+                val, tmp = self.replace_text_variables(step, key, val, template, tmp)
+            mapping[key] = val
+        return mapping
+
+    def replace_text_variables(self, step: any, key: str, val: any, template: any, tmp: any) -> tuple:
+        """
+        Replace the variables in a Shape value with their values
+        :param step: The step the Shape value belongs to
+        :param key: The name of the input parameter
+        :param val: The Shape value
+        :param template: The compiled Shape value (VariableTemplate)
+        :param tmp: The intermediate result of a list replacement of a previous parameter
+        :return: A tuple with the value with the variables replaced and the intermediate list replacement result
+        """
+        attr = None
+        for tv in template.variables:
+            replace_value = self.variables.get(tv.name)
+            if replace_value is None and tv.is_system_variable:
+                replace_value = self.system_variable_values[tv.name]()
+            if replace_value is not None:
+                # variable exists
+                # Check if this is a loop-variable
+                loopvar = self.loopvariables.get_by_name(tv.name)
+                if loopvar is not None:
+                    if tv.is_counter:
+                        val = loopvar.counter
+                    elif tv.is_object:
+                        val = loopvar
                     else:
-                        if val.replace(".", "").isnumeric():
-                            if val.__contains__("."):
-                                val = float(val)
-                            else:
-                                val = int(val)
-                if not str(key).__contains__("variable"):
-                    textvars = self.get_variables_from_text(val)
-                    if textvars is not None:
-                        # replace textvariables with values
-                        for tv in textvars:
-                            lst = tv.replace("%", "").split("[")
-                            clean_textvar = "%" + lst[0].split(".")[0] + "%"
-                            replace_value = self.variables.get(clean_textvar)
-                            if replace_value is not None:
-                                # variable exists
-                                # Check if this is a loop-variable
-                                loopvars = [x for x in self.loopvariables if x.name == clean_textvar]
-                                if len(loopvars) > 0:
-                                    if tv.lower().__contains__(".counter"):
-                                        val = loopvars[0].counter
-                                    elif tv.lower().__contains__(".object"):
-                                        val = loopvars[0]
+                        if isinstance(replace_value, list) and not self.contains_message_objects(replace_value):
+                            if not tv.has_attribute:
+                                if len(replace_value) == 1 and not isinstance(replace_value[0], list) and not isinstance(replace_value[0], tuple):
+                                    try:
+                                        val = str(val).replace(tv.text, replace_value[0])
+                                    except Exception as e:
+                                        val = replace_value[0]
+                                else:
+                                    if len(replace_value) == 0:
+                                        self.print_log(status="Ending loop",
+                                                       result=f"No items to loop...", level="loop-item")
+                                        val = replace_value
+                                        # self.exitcode_ok()
                                     else:
-                                        if isinstance(replace_value, list) and not str(replace_value).__contains__(
-                                                "Message(mime_content="):
-                                            if not tv.__contains__("."):
-                                                if len(replace_value) == 1 and not isinstance(replace_value[0], list) and not isinstance(replace_value[0], tuple):
-                                                    try:
-                                                        val = str(val).replace(tv, replace_value[0])
-                                                    except Exception as e:
-                                                        val = replace_value[0]
-                                                else:
-                                                    if len(replace_value) == 0:
-                                                        self.print_log(status="Ending loop",
-                                                                       result=f"No items to loop...")
-                                                        val = replace_value
-                                                        # self.exitcode_ok()
-                                                    else:
-                                                        if loopvars[0].counter < len(replace_value):
-                                                            if isinstance(replace_value[loopvars[0].counter], str):
-                                                                val = str(val).replace(tv,
-                                                                                       replace_value[
-                                                                                           loopvars[0].counter])
-                                                            else:
-                                                                try:
-                                                                    val = list(replace_value[loopvars[0].counter])
-                                                                except Exception as e:
-                                                                    val = [replace_value[loopvars[0].counter]]
-                                                                if len(lst) > 1:
-                                                                    for lt in lst[1:]:
-                                                                        val = val[int(lt.replace("]", ""))]
-                                                        else:
-                                                            if isinstance(replace_value[0], str):
-                                                                val = str(val).replace(tv, replace_value[0])
-                                                            else:
-                                                                val = replace_value[0]
-                                                                if len(lst) > 1:
-                                                                    for ls in lst[1:]:
-                                                                        val = val[int(ls.replace("]", ""))]
-
-                                                        if str(getattr(step, str(key).lower())) != tv:
-                                                            if loopvars[0].counter < len(replace_value):
-                                                                replace_value = replace_value[loopvars[0].counter]
-                                                            else:
-                                                                replace_value = replace_value[0]
-                                                            if isinstance(replace_value, list):
-                                                                repl_list = tv.split("[")
-                                                                if tmp is None:
-                                                                    tmp = str(getattr(step, str(key).lower()))
-                                                                for repl in repl_list:
-                                                                    if repl.__contains__("]"):
-                                                                        nr = str(repl).replace("]", "").replace("%", "")
-                                                                        if nr.isnumeric():
-                                                                            tmp = tmp.replace(tv, str(
-                                                                                replace_value[int(nr)]))
-                                                                    val = tmp
+                                        if loopvar.counter < len(replace_value):
+                                            if isinstance(replace_value[loopvar.counter], str):
+                                                val = str(val).replace(tv.text,
+                                                                       replace_value[
+                                                                           loopvar.counter])
                                             else:
-                                                if loopvars[0].counter < len(replace_value):
-                                                    replace_value = self.get_attribute_value(lst[0], replace_value[
-                                                        loopvars[0].counter])
-                                                    if str(tv).endswith("]%") and str(tv).__contains__("."):
-                                                        # get last number from val
-                                                        nr = str(tv).split("[")[-1].replace("]%", "")
-                                                        if nr.isnumeric():
-                                                            if len(replace_value) > int(nr):
-                                                                replace_value = replace_value[int(nr)]
-                                                else:
-                                                    replace_value = self.get_attribute_value(lst[0], replace_value[0])
-                                                    if str(tv).endswith("]%") and str(tv).__contains__("."):
-                                                        # get last number from val
-                                                        nr = str(tv).split("[")[-1].replace("]%", "")
-                                                        if nr.isnumeric():
-                                                            if len(replace_value) > int(nr):
-                                                                replace_value = replace_value[int(nr)]
-
-                                                if isinstance(replace_value, str):
-                                                    val = str(val).replace(tv, str(replace_value))
-                                                else:
-                                                    if val is not None:
-                                                        if isinstance(val, str):
-                                                            if val.__contains__(tv):
-                                                                if isinstance(replace_value, list):
-                                                                    if len(replace_value) == 0:
-                                                                        replace_value = ""
-                                                                val = str(val).replace(tv, str(replace_value))
-                                                        else:
-                                                            val = replace_value
-                                                    else:
-                                                        val = replace_value
+                                                try:
+                                                    val = list(replace_value[loopvar.counter])
+                                                except Exception as e:
+                                                    val = [replace_value[loopvar.counter]]
+                                                for index in tv.indexes:
+                                                    val = val[int(index)]
                                         else:
-                                            if str(replace_value).__contains__("Message(mime_content="):
-                                                if attr is None:
-                                                    attr = ""
-                                                if isinstance(replace_value, list):
-                                                    if tv.__contains__("."):
-                                                        attr = str(lst[0].split(".")[1]).replace(".", "")
-                                                    if loopvars[0].counter <= len(replace_value) - 1:
-                                                        val = replace_value[loopvars[0].counter]
-                                                        if attr is not None:
-                                                            if len(attr) > 0:
-                                                                val = getattr(val, attr)
-                                                    else:
-                                                        val = replace_value[0]
-                                                        if len(attr) > 0:
-                                                            val = getattr(val, attr)
-                                                else:
-                                                    val = replace_value
+                                            if isinstance(replace_value[0], str):
+                                                val = str(val).replace(tv.text, replace_value[0])
+                                            else:
+                                                val = replace_value[0]
+                                                for index in tv.indexes:
+                                                    val = val[int(index)]
+
+                                        if template.text != tv.text:
+                                            if loopvar.counter < len(replace_value):
+                                                replace_value = replace_value[loopvar.counter]
                                             else:
-                                                replace_value = self.get_attribute_value(lst[0], replace_value)
-                                                if val is not None and replace_value is not None:
-                                                    val = str(val).replace(tv, str(replace_value))
-                                                else:
-                                                    val = replace_value
+                                                replace_value = replace_value[0]
+                                            if isinstance(replace_value, list):
+                                                if tmp is None:
+                                                    tmp = template.text
+                                                for nr in tv.bracket_numbers:
+                                                    tmp = tmp.replace(tv.text, str(replace_value[nr]))
+                                                val = tmp
+                            else:
+                                if loopvar.counter < len(replace_value):
+                                    replace_value = self.get_attribute_path_value(tv.attribute_path, replace_value[
+                                        loopvar.counter])
                                 else:
-                                    if tv.__contains__("[") and tv.__contains__("]"):
-                                        if isinstance(replace_value, list):
-                                            if tmp is None:
-                                                tmp = str(getattr(step, str(key).lower()))
-                                            repl_list = tv.split("[")
-                                            for repl in repl_list:
-                                                if repl.__contains__("]"):
-                                                    nr = str(repl).replace("]", "").replace("%", "")
-                                                    if nr.isnumeric():
-                                                        if int(nr) < len(replace_value):
-                                                            if isinstance(replace_value[int(nr)], str):
-                                                                tmp = tmp.replace(tv, replace_value[int(nr)])
-                                                            else:
-                                                                if tmp is None:
-                                                                    tmp = replace_value[int(nr)]
-                                                                else:
-                                                                    if len(repl_list) > 1:
-                                                                        tmp2 = replace_value[int(nr)]
-                                                                        for lst in repl_list[2:]:
-                                                                            tmp2 = tmp2[int(
-                                                                                lst.replace("]", "").replace("%", ""))]
-                                                                        if isinstance(tmp, str) and tmp != tv:
-                                                                            tmp = tmp.replace(tv, tmp2)
-                                                                        else:
-                                                                            tmp = tmp2
-                                            val = tmp
-                                    elif tv.__contains__("."):
-                                        replace_value = self.get_attribute_value(lst[0], replace_value)
-                                        if isinstance(replace_value, str):
-                                            val = str(val).replace(tv, str(replace_value))
+                                    replace_value = self.get_attribute_path_value(tv.attribute_path, replace_value[0])
+                                if tv.trailing_index is not None:
+                                    if len(replace_value) > tv.trailing_index:
+                                        replace_value = replace_value[tv.trailing_index]
+
+                                if isinstance(replace_value, str):
+                                    val = str(val).replace(tv.text, str(replace_value))
+                                else:
+                                    if val is not None:
+                                        if isinstance(val, str):
+                                            if val.__contains__(tv.text):
+                                                if isinstance(replace_value, list):
+                                                    if len(replace_value) == 0:
+                                                        replace_value = ""
+                                                val = str(val).replace(tv.text, str(replace_value))
                                         else:
-                                            if val != tv:
-                                                val = str(val).replace(tv, str(replace_value))
-                                            else:
-                                                val = replace_value
-                                    else:
-                                        if isinstance(replace_value, list):
                                             val = replace_value
-                                        elif isinstance(replace_value, str):
-                                            val = str(val).replace(tv, str(replace_value))
+                                    else:
+                                        val = replace_value
+                        else:
+                            if self.contains_message_objects(replace_value):
+                                if attr is None:
+                                    attr = ""
+                                if isinstance(replace_value, list):
+                                    if tv.has_attribute:
+                                        attr = tv.message_attribute
+                                    if loopvar.counter <= len(replace_value) - 1:
+                                        val = replace_value[loopvar.counter]
+                                        if attr is not None:
+                                            if len(attr) > 0:
+                                                val = getattr(val, attr)
+                                    else:
+                                        val = replace_value[0]
+                                        if len(attr) > 0:
+                                            val = getattr(val, attr)
+                                else:
+                                    val = replace_value
+                            else:
+                                replace_value = self.get_attribute_path_value(tv.attribute_path, replace_value)
+                                if val is not None and replace_value is not None:
+                                    val = str(val).replace(tv.text, str(replace_value))
+                                else:
+                                    val = replace_value
+                else:
+                    if tv.has_index:
+                        if isinstance(replace_value, list):
+                            if tmp is None:
+                                tmp = template.text
+                            for nr in tv.bracket_numbers:
+                                if nr < len(replace_value):
+                                    if isinstance(replace_value[nr], str):
+                                        tmp = tmp.replace(tv.text, replace_value[nr])
+                                    else:
+                                        tmp2 = replace_value[nr]
+                                        for index in tv.nested_indexes:
+                                            tmp2 = tmp2[int(index)]
+                                        if isinstance(tmp, str) and tmp != tv.text:
+                                            tmp = tmp.replace(tv.text, tmp2)
                                         else:
-                                            if val != tv:
-                                                val = str(val).replace(tv, str(replace_value))
-                                            else:
-                                                val = replace_value
-                mapping[str(key)] = val
-        if return_none:
-            return None
-        else:
-            # replace all reserved keys
-            for key in mapping:
-                if key in ["id ", "type ", "name ", "description "]:
-                    mapping[key.replace(" ", "")] = mapping.pop(key)
-            return mapping
+                                            tmp = tmp2
+                            val = tmp
+                    elif tv.has_attribute:
+                        replace_value = self.get_attribute_path_value(tv.attribute_path, replace_value)
+                        if isinstance(replace_value, str):
+                            val = str(val).replace(tv.text, str(replace_value))
+                        else:
+                            if val != tv.text:
+                                val = str(val).replace(tv.text, str(replace_value))
+                            else:
+                                val = replace_value
+                    else:
+                        if isinstance(replace_value, list):
+                            val = replace_value
+                        elif isinstance(replace_value, str):
+                            val = str(val).replace(tv.text, str(replace_value))
+                        else:
+                            if val != tv.text:
+                                val = str(val).replace(tv.text, str(replace_value))
+                            else:
+                                val = replace_value
+        return val, tmp
+
+    @staticmethod
+    def contains_message_objects(value: any) -> bool:
+        """
+        Check if a value holds Exchangelib Message objects. For a list, only the first item is checked.
+        :param value: The value to check
+        :return: True or False
+        """
+        if isinstance(value, list):
+            if len(value) == 0:
+                return False
+            value = value[0]
+        return str(value).__contains__("Message(mime_content=")
 
     @staticmethod
     def get_attribute_value(lst: str, replace_value: any) -> any:
@@ -748,23 +1004,29 @@ class WorkflowEngine:
         :param replace_value: The replace value object
         :return: The attribute value or object
         """
+        return WorkflowEngine.get_attribute_path_value(lst.split(".")[1:], replace_value)
+
+    @staticmethod
+    def get_attribute_path_value(attribute_path: list, replace_value: any) -> any:
+        """
+        Get an attribute value from a replace value (object)
+        :param attribute_path: The names of the (nested) attributes
+        :param replace_value: The replace value object
+        :return: The attribute value or object
+        """
+        if len(attribute_path) == 0:
+            return replace_value
         val = None
-        lst_ = lst.split(".")[1:]
-        if len(lst_) == 0:
-            lst_ = lst
-        if isinstance(lst_, list):
-            for attr in lst_:
-                if val is not None:
-                    replace_value = val
-                if isinstance(replace_value, dict):
-                    val = replace_value.get(attr)
-                if isinstance(replace_value, object) and not isinstance(replace_value, dict):
-                    if hasattr(replace_value, attr):
-                        val = getattr(replace_value, attr)
-                    else:
-                        val = replace_value
-        else:
-            val = replace_value
+        for attr in attribute_path:
+            if val is not None:
+                replace_value = val
+            if isinstance(replace_value, dict):
+                val = replace_value.get(attr)
+            else:
+                if hasattr(replace_value, attr):
+                    val = getattr(replace_value, attr)
+                else:
+                    val = replace_value
         return val
 
     @staticmethod
@@ -774,6 +1036,8 @@ class WorkflowEngine:
         :param step: The step to check
         :return: True or False
        """
+        if isinstance(step, Step):
+            return step.has_direct_variables
         attrs = vars(step)
         col = [key for key, val in attrs.items() if
                str(val).startswith("%") and str(val).endswith("%") and str(key) != "output_variable"]
@@ -785,11 +1049,33 @@ class WorkflowEngine:
     def run_flow(self, steps: any, step_by_step: bool = False):
         """
         Execute a Flow.
-        :param steps: The steps that must be executed in the flow
+        :param steps: The steps that must be executed in the flow, or the full path of a flow file (like a compiled .flwc flow).
         :param step_by_step: Optional. Indicator if this function only performes one step and the looping of steps is done outside this function.
         """
+        step, steps = self.start_flow(steps, step_by_step)
+        return self.run_steps(self.execute_steps(step, steps, step_by_step=step_by_step))
+
+    async def run_flow_async(self, steps: any):
+        """
+        Execute a Flow in an asyncio event loop. Step functions that are coroutines are awaited, the other step functions
+        run in the default executor of the event loop, so they don't block the event loop. Use this to run many flows in
+        one process, for example with asyncio.gather.
+        :param steps: The steps that must be executed in the flow
+        :return: The output of the last step
+        """
+        step, steps = self.start_flow(steps, False)
+        return await self.run_steps_async(self.execute_steps(step, steps), self.profiler)
+
+    def start_flow(self, steps: any, step_by_step: bool = False) -> tuple:
+        """
+        Register the flow and the run in the orchestrator database and find the step to start with.
+        :param steps: The steps that must be executed in the flow, or the full path of a flow file (like a compiled .flwc flow).
+        :param step_by_step: Optional. Indicator if only one step is performed.
+        :return: A tuple with the step to start with and the list of steps.
+        """
         step = None
-        output_previous_step = None
+        if isinstance(steps, str):
+            steps = self.open_flow(steps)
         if not isinstance(steps, list):
             steps = [steps]
             step = steps[0]
@@ -805,6 +1091,7 @@ class WorkflowEngine:
                 self.error = True
                 raise Exception('Your installation directory is unknown.')
             if not str(self.flowpath).__contains__("/"):
+                from werkzeug.utils import secure_filename
                 self.flowpath = secure_filename(os.getcwd() + "/" + self.flowpath)
         sql = "SELECT id FROM Flows WHERE name =? AND location=?"
         flow_id = self.db.run_sql(sql=sql, params=[self.flowname, self.flowpath], tablename="Flows")
@@ -813,16 +1100,118 @@ class WorkflowEngine:
             flow_id = self.db.run_sql(sql=sql, params=[self.flowname, self.flowpath], tablename="Flows")
         if step_by_step is False or self.step_nr == 0:
             self.previous_step = None
-            shape_steps = [x for x in steps if x.type == "shape"]
-            step = [x for x in shape_steps if x.IsStart][0]
+            self.clear_step_caches()
+            if self.profiler is not None:
+                self.profiler.clear()
+            self.start_trace()
+            step = self.get_flow_graph(steps).start
+            if step is None:
+                raise Exception("The flow doesn't contain a start shape.")
             # Log the start in the orchestrator database
             sql = "INSERT INTO Runs (name, flow_id, result) VALUES (?,?,'The flow was aborted.');"
             self.id = self.db.run_sql(sql=sql, params=[self.flowname, flow_id], tablename="Runs")
-            print("\n")
+            if self.is_logged("step"):
+                print("\n")
             self.print_log(status="Starting",
                            result=f"{datetime.today().strftime('%d-%m-%Y')} Starting flow '{self.flowname}'...")
             self.step_nr = 0
+        return step, steps
+
+    @staticmethod
+    def run_steps(steps_generator: any) -> any:
+        """
+        Run the steps of a flow by calling the step functions that are yielded by execute_steps. A step function that
+        returns a coroutine is run to completion in a new event loop.
+        :param steps_generator: The generator returned by execute_steps.
+        :return: The output of the last executed step.
+        """
+        try:
+            call = next(steps_generator)
+            while True:
+                try:
+                    result = call()
+                    if inspect.iscoroutine(result):
+                        import asyncio
+                        result = asyncio.run(result)
+                except Exception as ex:
+                    call = steps_generator.throw(ex)
+                    continue
+                call = steps_generator.send(result)
+        except StopIteration as stop:
+            return stop.value
+
+    @staticmethod
+    async def run_steps_async(steps_generator: any, profiler: any = None) -> any:
+        """
+        Run the steps of a flow in an asyncio event loop. Coroutine step functions are awaited, the other step functions
+        run in the default executor of the event loop.
+        :param steps_generator: The generator returned by execute_steps.
+        :param profiler: Optional. The StepProfiler of the run, to which the CPU time of the step functions that run in the executor is added.
+        :return: The output of the last executed step.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        try:
+            call = next(steps_generator)
+            while True:
+                try:
+                    if inspect.iscoroutinefunction(getattr(call, "func", call)):
+                        result = await call()
+                    else:
+                        result, cpu_time = await loop.run_in_executor(None, WorkflowEngine.call_in_thread, call,
+                                                                      FlowTracer.get_active())
+                        if profiler is not None:
+                            profiler.add_cpu_time(cpu_time)
+                        if inspect.isawaitable(result):
+                            result = await result
+                except Exception as ex:
+                    call = steps_generator.throw(ex)
+                    continue
+                call = steps_generator.send(result)
+        except StopIteration as stop:
+            return stop.value
+
+    @staticmethod
+    def call_in_thread(call: any, tracer: any) -> tuple:
+        """
+        Call a step function in another thread than the thread that executes the steps, like an executor thread of
+        run_steps_async. The step function gets the tracer of the flow, and its CPU time is measured in the thread.
+        :param call: The step function to call.
+        :param tracer: The FlowTracer object of the flow, or None.
+        :return: A tuple with the result of the call and the CPU time of the call. An error of the call is raised.
+        """
+        previous = FlowTracer.get_active()
+        FlowTracer.set_active(tracer)
+        started = time.thread_time()
+        try:
+            return call(), time.thread_time() - started
+        finally:
+            FlowTracer.set_active(previous)
+
+    def execute_steps(self, step: any, steps: list, output_previous_step: any = None, step_by_step: bool = False,
+                      in_branch: bool = False, stop_at: any = None) -> any:
+        """
+        Execute the steps of a flow, starting with the given step. This is a generator that yields each function call
+        of a step and receives its result, so the calls can be made with run_steps or run_steps_async.
+        :param step: The step to start with.
+        :param steps: The steps of the flow.
+        :param output_previous_step: Optional. The output of the step before the first step.
+        :param step_by_step: Optional. Indicator if this function only performes one step.
+        :param in_branch: Optional. Indicator if the steps are a branch of a Parallel Gateway. A branch stops at the joining Parallel Gateway instead of ending the flow.
+        :param stop_at: Optional. The step where a branch stops, like the loop_items_check step of a parallel loop.
+        :return: A generator that returns the output of the last executed step.
+        """
         while True:
+            if in_branch and (step is None or step is stop_at or self.get_flow_graph(steps).is_join(step)):
+                self.join_step = step
+                return output_previous_step
+            # The times of the step: start (wall and CPU), binding started, binding ended, call ended
+            profile = self.profiler.start() if self.profiler is not None else None
+            trace_start = None
+            if self.run_tracer is not None:
+                trace_start = time.perf_counter()
+                # A subflow that is started by this step adds its spans to the timeline of this flow
+                FlowTracer.set_active(self.run_tracer)
             try:
                 # to fetch module
                 class_object = None
@@ -837,15 +1226,18 @@ class WorkflowEngine:
                     self.current_step = step
                     if len(step.name) == 0:
                         if hasattr(step, "type"):
-                            if not hasattr(step, "function"):
+                            if not hasattr(step, "function") and self.is_logged("debug"):
                                 self.print_log(status="Running",
-                                               result=f"Passing an {step.type} with value {output_previous_step}...")
+                                               result=f"Passing an {step.type} with value {output_previous_step}...",
+                                               level="debug")
                     else:
                         if hasattr(step, "type"):
                             if step.type == "disabled":
                                 self.print_log(status="Running",
                                                result=f"Ignoring disabled step '{step.name}'.")
-                                step = self.get_next_step(step, steps, output_previous_step)
+                                next_step = self.get_next_step(step, steps, output_previous_step)
+                                self.release_variables(step, next_step, steps)
+                                step = next_step
                                 continue
 
                         if hasattr(step, "function"):
@@ -854,10 +1246,12 @@ class WorkflowEngine:
                         else:
                             self.print_log(status="Running", result=f"Executing step '{step.name}'...")
                 if step is not None:
-                    loopkvp = [kvp for kvp in self.loopvariables if kvp.id == step.id]
-                    if loopkvp:
-                        if loopkvp[0].counter > 0 and loopkvp[0].counter > loopkvp[0].start:
+                    loopkvp = self.loopvariables.get_by_id(step.id)
+                    if loopkvp is not None:
+                        if loopkvp.counter > 0 and loopkvp.counter > loopkvp.start:
                             is_in_loop = True
+                if profile is not None:
+                    profile.append(time.perf_counter())
                 if hasattr(step, "module"):
                     # region get function call
                     method_to_call = None
@@ -869,60 +1263,7 @@ class WorkflowEngine:
                                 method_to_call = getattr(var, step.function)
                     if method_to_call is None:
                         step_input = None
-                        if hasattr(step, "module"):
-                            if os.name == 'nt':
-                                if not str(step.module).__contains__("\\") and str(step.module).lower().__contains__(
-                                        ".py"):
-                                    step.module = f"{self.packages_folder}\\BPMN_RPA\\Scripts\\{step.module}"
-                                if not str(step.module).__contains__(":") and str(step.module).__contains__(
-                                        "\\") and str(
-                                    step.module).__contains__(".py"):
-                                    step.module = f"{self.packages_folder}\\{step.module}"
-                            if os.name != 'nt':
-                                step.module = str(step.module).replace("\\", "/")
-                                module_ = step.module
-                                if not str(step.module).__contains__("/") and str(step.module).lower().__contains__(
-                                        ".py") and not str(step.module).__contains__(self.packages_folder):
-                                    module_ = f"{self.packages_folder}/BPMN_RPA/Scripts/{step.module}"
-                                if not str(step.module).__contains__("/") and not str(step.module).lower().__contains__(
-                                        ".py") and not str(step.module).__contains__(self.packages_folder):
-                                    modue_ = f"{self.packages_folder}/{step.module}"
-                                step.module = module_
-                            if str(step.module).lower().__contains__(".py"):
-                                spec = util.spec_from_file_location(step.module, step.module)
-                                module_object = util.module_from_spec(spec)
-                                if module_object is None:
-                                    step_time = datetime.now().strftime("%H:%M:%S")
-                                    raise Exception(
-                                        f"{step_time}: The module '{step.module}' could not be loaded. Check the path...")
-                                getattr(spec.loader, "exec_module")(module_object)
-                            else:
-                                if len(step.module) == 0:
-                                    module_object = self
-                                else:
-                                    module_object = importlib.import_module(step.module)
-                        if hasattr(step, "classname"):
-                            if hasattr(module_object, str(step.classname).lower()) or hasattr(module_object,
-                                                                                              str(step.classname)):
-                                if hasattr(module_object, str(step.classname).lower()):
-                                    class_object = getattr(module_object, str(step.classname).lower())
-                                else:
-                                    class_object = getattr(module_object, str(step.classname))
-                                if hasattr(step, "function"):
-                                    if len(step.function) > 0:
-                                        method_to_call = getattr(class_object, step.function)
-                            else:
-                                if str(step.classname).startswith("%") and str(step.classname).endswith("%"):
-                                    class_object = self.variables.get(step.classname)
-                                    if len(step.function) > 0 and class_object is not None:
-                                        method_to_call = getattr(class_object, step.function)
-
-                                else:
-                                    if hasattr(step, "function"):
-                                        method_to_call = getattr(module_object, step.function)
-
-                        else:
-                            method_to_call = getattr(module_object, step.function)
+                        module_object, class_object, method_to_call = self.get_step_callable(step)
                 else:
                     if module_object is None and hasattr(step, "classname"):
                         if str(step.classname).startswith("%") and str(step.classname).endswith("%"):
@@ -935,30 +1276,34 @@ class WorkflowEngine:
                         if hasattr(step, "function"):
                             method_to_call = getattr(module_object, step.function)
 
-                if method_to_call is not None:
+                # The input of a loop step is only used for the first item, the next items are taken from the loop
+                # variable, so a (spilled) list isn't read again for each item
+                if method_to_call is not None and not is_in_loop:
                     step_input = self.get_input_from_signature(step, method_to_call)
-                if method_to_call is None and class_object is not None:
+                if method_to_call is None and class_object is not None and not is_in_loop:
                     step_input = self.get_input_from_signature(step, class_object)
                 self.step_input = step_input
+                if profile is not None:
+                    profile.append(time.perf_counter())
 
                 # execute function call and get returned values
                 if step_input is not None and not is_in_loop:
                     if hasattr(step, "function"):
                         if len(step.function) > 0:
                             if isinstance(class_object, type):
-                                class_object = class_object()
+                                class_object = yield class_object
                                 method_to_call = getattr(class_object, step.function)
                             if isinstance(step_input, dict):
-                                output_previous_step = method_to_call(**step_input)
+                                output_previous_step = yield functools.partial(method_to_call, **step_input)
                             else:
                                 try:
-                                    output_previous_step = method_to_call(step_input)
+                                    output_previous_step = yield functools.partial(method_to_call, step_input)
                                 except (ValueError, Exception):
                                     pass
                         else:
-                            output_previous_step = class_object(**step_input)
+                            output_previous_step = yield functools.partial(class_object, **step_input)
                     else:
-                        output_previous_step = class_object(**step_input)
+                        output_previous_step = yield functools.partial(class_object, **step_input)
                 else:
                     if is_in_loop:
                         output_previous_step = [x for x in self.loopvariables if id == step.id]
@@ -968,38 +1313,43 @@ class WorkflowEngine:
                             if len(step.function) > 0:
                                 if method_to_call is not None:
                                     if isinstance(class_object, type):
-                                        class_object = class_object()
+                                        class_object = yield class_object
                                         method_to_call = getattr(class_object, step.function)
-                                    output_previous_step = method_to_call()
+                                    output_previous_step = yield method_to_call
                                     called = True
                                 else:
-                                    output_previous_step = class_object()
+                                    output_previous_step = yield class_object
                                     called = True
                             if output_previous_step is None and not called:
-                                output_previous_step = class_object()
+                                output_previous_step = yield class_object
                         else:
                             if class_object is not None:
                                 if inspect.isclass(class_object):
-                                    output_previous_step = class_object()
+                                    output_previous_step = yield class_object
 
+                if profile is not None:
+                    profile.append(time.perf_counter())
                 # set loop variable
                 if output_previous_step is not None:
                     this_step = self.loopcounter(step, output_previous_step)
                 if is_in_loop:
                     output_previous_step = [this_step]
                 # Update the result
-                if hasattr(step, "classname"):
+                if not self.is_logged("loop-item"):
+                    pass  # All messages below are loop-item or debug messages
+                elif hasattr(step, "classname"):
                     if len(step.classname) == 0:
                         if hasattr(step, "function"):
-                            self.print_log(status="Running", result=f"{method_to_call.__name__} executed.")
+                            self.print_log(status="Running", result=f"{method_to_call.__name__} executed.", level="debug")
                     else:
                         if hasattr(step, "function") and class_object is not None:
                             self.print_log(status="Running",
-                                           result=f"{class_object.__class__.__name__}.{method_to_call.__name__} executed.")
+                                           result=f"{class_object.__class__.__name__}.{method_to_call.__name__} executed.",
+                                           level="debug")
                         else:
                             if step.name is not None:
                                 if len(step.name) > 0:
-                                    self.print_log(status="Running", result=f"{step.name} executed.")
+                                    self.print_log(status="Running", result=f"{step.name} executed.", level="debug")
                 else:
                     if hasattr(step, "function") and method_to_call is not None:
                         if step.function.lower() in ["loop_items_check", "is_first_item_equal_to_second_item",
@@ -1014,51 +1364,354 @@ class WorkflowEngine:
                                     output_previous_step).lower() == "true":
                                 try:
                                     self.print_log(status="Running",
-                                                   result=f"{method_to_call.__name__} executed with value {str(output_previous_step)} (loop item: {int(self.get_loop_variable_number(step_input['loop_variable']) + 1)}).")
+                                                   result=f"{method_to_call.__name__} executed with value {str(output_previous_step)} (loop item: {int(self.get_loop_variable_number(step_input['loop_variable']) + 1)}).",
+                                                   level="loop-item")
                                 except Exception as e:
                                     pass
-                            else:
+                            elif self.is_logged("debug"):
                                 self.print_log(status="Running",
-                                               result=f"{method_to_call.__name__} executed with value {str(output_previous_step)}.")
+                                               result=f"{method_to_call.__name__} executed with value {str(output_previous_step)}.",
+                                               level="debug")
                         else:
                             if step.function != "print_log":
-                                self.print_log(status="Running", result=f"{method_to_call.__name__} executed.")
+                                self.print_log(status="Running", result=f"{method_to_call.__name__} executed.", level="debug")
                     else:
                         if hasattr(step, "name"):
                             if len(step.name) > 0:
                                 if step.name.lower() == "exclusive gateway":
                                     self.print_log(status="Running",
-                                                   result=f"{step.name} executed with value {str(output_previous_step)}.")
+                                                   result=f"{step.name} executed with value {str(output_previous_step)}.",
+                                                   level="debug")
                                 else:
-                                    self.print_log(status="Running", result=f"{step.name} executed.")
+                                    self.print_log(status="Running", result=f"{step.name} executed.", level="debug")
             except Exception as ex:
                 self.set_error(ex)
+                self.flush_log()
+                if self.run_tracer is not None and not in_branch:
+                    self.end_trace(ex)
                 raise Exception(f"Error: {ex}\n{self.error}")
             if step is None:
                 self.end_flow()
                 break
             if output_previous_step is not None:
-                if str(output_previous_step).startswith("QuerySet"):
+                loopvar = self.loopvariables.get_by_id(step.id)
+                items = getattr(loopvar, "items", None)
+                if isinstance(items, (LoopItems, SpilledItems)) or (
+                        output_previous_step is items and isinstance(self.variables, VariableStore) and
+                        self.variables.estimate_size(items) > self.variables.threshold):
+                    # The items of a streamed, spilled or large loop are read by the loop variable (a large list isn't
+                    # written to the spill file for the output variable), only keep the current item
+                    output_previous_step = [this_step] if len(items) > 0 else []
+                elif type(output_previous_step).__name__ == "QuerySet":
                     # If this is Exchangelib output then turn it into list
                     output_previous_step = list(output_previous_step)
                 if this_step is not None:
                     self.save_output_variable(step, this_step, output_previous_step)
-            self.previous_step = copy.deepcopy(step)
+            # Only the output_variable of the previous step is read, so keep a reference instead of a copy
+            self.previous_step = step
+            if profile is not None:
+                self.profiler.record(step, profile)
+            if trace_start is not None:
+                self.trace_step(step, trace_start)
             if step_by_step:
                 return output_previous_step
-            step = self.get_next_step(step, steps, output_previous_step)
+            if self.get_flow_graph(steps).is_fork(step):
+                step, output_previous_step = yield functools.partial(self.run_parallel_branches, step, steps,
+                                                                     output_previous_step)
+                self.release_variables(None, step, steps)
+            elif self.is_parallel_loop(step) and not is_in_loop and hasattr(self.loopvariables.get_by_id(step.id), "items"):
+                step, output_previous_step = yield functools.partial(self.run_multi_instance, step, steps)
+                self.release_variables(None, step, steps)
+            else:
+                next_step = self.get_next_step(step, steps, output_previous_step)
+                self.release_variables(step, next_step, steps)
+                step = next_step
         if output_previous_step is not None:
             return output_previous_step
 
-    def get_loop_variable_number(self, var_name):
+    def run_parallel_branches(self, step: any, steps: list, output_previous_step: any) -> tuple:
         """
-        Get the loop variable number.
-        :param var_name: The name of the loop variable.
+        Run the outgoing branches of a forking Parallel Gateway at the same time, each with its own copy of the
+        variables. The branches are joined at the joining Parallel Gateway, where the variables that were set in the
+        branches are merged. When branches set the same variable, the value of the last branch (in the order of the
+        sequence flow arrows) is used.
+        :param step: The forking Parallel Gateway.
+        :param steps: The steps of the flow.
+        :param output_previous_step: The output of the step before the gateway.
+        :return: A tuple with the step after the joining gateway and a list with the output of each branch.
         """
-        for lv in self.loopvariables:
-            if lv.name == var_name:
-                return lv.counter
-        return 0
+        started = time.perf_counter()
+        graph = self.get_flow_graph(steps)
+        starts = graph.get_branch_starts(step)
+        branches = [self.create_branch() for _ in starts]
+        self.print_log(status="Running", result=f"Starting {len(starts)} parallel branches...", level="debug")
+        outputs = []
+        error = None
+        with ThreadPoolExecutor(max_workers=getattr(self, "max_workers", None)) as executor:
+            futures = [executor.submit(branch.run_branch, start, steps, output_previous_step) for branch, start in
+                       zip(branches, starts)]
+            for future in futures:
+                try:
+                    outputs.append(future.result())
+                except Exception as ex:
+                    outputs.append(None)
+                    if error is None:
+                        error = ex
+        merged = self.variables.copy()
+        step_nr = self.step_nr
+        for branch in branches:
+            self.merge_branch(branch, merged, step_nr)
+        self.variables = merged
+        if self.run_tracer is not None:
+            self.run_tracer.add_span(f"{len(starts)} parallel branches", "parallel", started, time.perf_counter(),
+                                     {"id": step.id})
+        if error is not None:
+            raise error
+        join = next((branch.join_step for branch in branches if branch.join_step is not None), None)
+        if join is None:
+            return None, outputs
+        self.print_log(status="Running", result=f"Joined {len(starts)} parallel branches.", level="debug")
+        self.previous_step = join
+        if graph.is_fork(join):
+            return self.run_parallel_branches(join, steps, outputs)
+        return self.get_next_step(join, steps, outputs), outputs
+
+    def merge_branch(self, branch: any, merged: dict, step_nr: int):
+        """
+        Add the variables that were set in a branch to the merged variables, and count the steps of the branch.
+        :param branch: The WorkflowEngine object of the branch.
+        :param merged: The dictionary with the merged variables.
+        :param step_nr: The step number when the branch was started.
+        """
+        # Compare the stored values, so the values of a VariableStore aren't read from its spill file
+        variables = getattr(self.variables, "entries", self.variables)
+        for key, value in getattr(branch.variables, "entries", branch.variables).items():
+            if key not in variables or variables[key] is not value:
+                getattr(merged, "entries", merged)[key] = value
+        self.step_nr += branch.step_nr - step_nr
+        if branch.error is not None and self.error is None:
+            self.error = branch.error
+
+    @staticmethod
+    def is_parallel_loop(step: any) -> bool:
+        """
+        Check if a step is a loop step of which the items must be processed at the same time.
+        :param step: The step object
+        :return: True or False
+        """
+        return hasattr(step, "loopcounter") and str(getattr(step, "multi_instance", "")).lower() == "parallel"
+
+    def run_multi_instance(self, step: any, steps: list) -> tuple:
+        """
+        Run the steps of a loop for all items at the same time. The loop step must have the property
+        multi_instance="parallel". The steps between the loop step and the loop_items_check step of the loop variable
+        run for each item in a separate branch, with at most the number of the max_instances property of the loop step
+        (or max_workers) items at the same time. The output of the last step of each item is stored in the order of the
+        items in the output variable of the loop step. An error in one item doesn't stop the other items: the output of
+        the item is None and the error is logged and added to the variable in the error_variable property of the loop
+        step (if set).
+        :param step: The loop step.
+        :param steps: The steps of the flow.
+        :return: A tuple with the loop_items_check step and the list with the output of each item.
+        """
+        started = time.perf_counter()
+        graph = self.get_flow_graph(steps)
+        check = graph.find_loop_check(step)
+        if check is None:
+            raise Exception(f"The parallel loop of step '{step.name}' has no loop_items_check step for loop variable '{step.output_variable}'.")
+        loopvar = self.loopvariables.get_by_id(step.id)
+        first = graph.get_next_step(step, None)
+        max_instances = int(getattr(step, "max_instances", 0) or 0) or getattr(self, "max_workers", None)
+        # Submit a limited number of items ahead, so a streamed loop isn't read into memory at once
+        limit = 2 * (max_instances or min(32, (os.cpu_count() or 1) + 4))
+        pending = collections.deque()
+        results = []
+        errors = []
+        merged = self.variables.copy()
+        step_nr = self.step_nr
+        with ThreadPoolExecutor(max_workers=max_instances) as executor:
+            index = loopvar.counter
+            while True:
+                if isinstance(loopvar.items, LoopItems):
+                    loopvar.total_listitems = loopvar.items.read_until(index)
+                if index >= loopvar.total_listitems:
+                    break
+                item = loopvar.items[index]
+                branch = self.create_branch()
+                instance = copy.copy(loopvar)
+                instance.items = [item]
+                instance.counter = index
+                instance.total_listitems = 1
+                branch.loopvariables.remove(loopvar)
+                branch.loopvariables.append(instance)
+                branch.variables[step.output_variable] = [item]
+                branch.register_loop_variable(first)
+                future = executor.submit(branch.run_steps,
+                                         branch.execute_steps(first, steps, [item], in_branch=True, stop_at=check))
+                pending.append((index, item, branch, future))
+                if len(pending) >= limit:
+                    self.collect_instance(pending.popleft(), results, errors, merged, step_nr)
+                index += 1
+            while len(pending) > 0:
+                self.collect_instance(pending.popleft(), results, errors, merged, step_nr)
+        self.variables = merged
+        self.variables[step.output_variable] = results
+        if len(getattr(step, "error_variable", "")) > 0:
+            self.variables[step.error_variable] = errors
+        if self.run_tracer is not None:
+            self.run_tracer.add_span(f"Parallel loop of {step.output_variable}", "loop", started, time.perf_counter(),
+                                     {"id": step.id, "items": len(results), "errors": len(errors)})
+        self.print_log(status="Running",
+                       result=f"Parallel loop '{step.name}' processed {len(results)} items with {len(errors)} errors.",
+                       level="loop-item")
+        # Let the loop_items_check step end the loop
+        loopvar.counter = max(loopvar.total_listitems - 1, loopvar.start)
+        return check, results
+
+    def collect_instance(self, instance: tuple, results: list, errors: list, merged: dict, step_nr: int):
+        """
+        Wait for an item of a parallel loop to finish and collect its output or error.
+        :param instance: A tuple with the index, the item, the WorkflowEngine object and the future of the item.
+        :param results: The list with the output of the items.
+        :param errors: The list with the errors of the items.
+        :param merged: The dictionary with the merged variables.
+        :param step_nr: The step number when the loop was started.
+        """
+        index, item, branch, future = instance
+        try:
+            results.append(future.result())
+        except Exception as ex:
+            results.append(None)
+            errors.append({"index": index, "item": item, "error": str(ex)})
+            self.print_log(status="Running", result=f"Error in loop item {index}: {ex}", level="step")
+            branch.error = None
+        self.merge_branch(branch, merged, step_nr)
+
+    def create_branch(self) -> any:
+        """
+        Create a copy of the WorkflowEngine for running a branch of a Parallel Gateway. The copy has its own variables
+        and loop variables, and shares the database connection and the logging.
+        :return: The WorkflowEngine object for the branch.
+        """
+        branch = copy.copy(self)
+        branch.variables = self.variables.copy()
+        branch.loopvariables = LoopVariables(list(self.loopvariables))
+        # The functions of the WorkflowEngine itself (like loop_items_check) are bound to the engine that resolved them,
+        # so the branch resolves them again for itself
+        branch.step_callables = {key: value for key, value in self.step_callables.items() if value[0] is not self}
+        branch.binding_plans = dict(self.binding_plans)
+        branch.join_step = None
+        branch.error = None
+        return branch
+
+    def run_branch(self, step: any, steps: list, output_previous_step: any) -> any:
+        """
+        Run a branch of a Parallel Gateway until the joining Parallel Gateway or the end of the flow is reached.
+        :param step: The first step of the branch.
+        :param steps: The steps of the flow.
+        :param output_previous_step: The output of the step before the forking gateway.
+        :return: The output of the last step of the branch.
+        """
+        self.register_loop_variable(step)
+        return self.run_steps(self.execute_steps(step, steps, output_previous_step, in_branch=True))
+
+    def get_step_callable(self, step: any) -> tuple:
+        """
+        Resolve the module, class and function of a step. The resolution is cached per step, so a step that is executed
+        repeatedly (for example in a loop) does not load its module again.
+        :param step: The step to resolve the function call of.
+        :return: A tuple with the module object, the class object and the method to call.
+        """
+        resolved = self.step_callables.get(step.id)
+        if resolved is not None:
+            return resolved
+        class_object = None
+        method_to_call = None
+        cacheable = True
+        if os.name == 'nt':
+            if not str(step.module).__contains__("\\") and str(step.module).lower().__contains__(
+                    ".py"):
+                step.module = f"{self.packages_folder}\\BPMN_RPA\\Scripts\\{step.module}"
+            if not str(step.module).__contains__(":") and str(step.module).__contains__(
+                    "\\") and str(
+                step.module).__contains__(".py"):
+                step.module = f"{self.packages_folder}\\{step.module}"
+        if os.name != 'nt':
+            step.module = str(step.module).replace("\\", "/")
+            module_ = step.module
+            if not str(step.module).__contains__("/") and str(step.module).lower().__contains__(
+                    ".py") and not str(step.module).__contains__(self.packages_folder):
+                module_ = f"{self.packages_folder}/BPMN_RPA/Scripts/{step.module}"
+            step.module = module_
+        if str(step.module).lower().__contains__(".py"):
+            module_object = self.load_module(step.module)
+        else:
+            if len(step.module) == 0:
+                module_object = self
+            else:
+                module_object = importlib.import_module(step.module)
+        if hasattr(step, "classname"):
+            if hasattr(module_object, str(step.classname).lower()) or hasattr(module_object,
+                                                                              str(step.classname)):
+                if hasattr(module_object, str(step.classname).lower()):
+                    class_object = getattr(module_object, str(step.classname).lower())
+                else:
+                    class_object = getattr(module_object, str(step.classname))
+                if hasattr(step, "function"):
+                    if len(step.function) > 0:
+                        method_to_call = getattr(class_object, step.function)
+            else:
+                if str(step.classname).startswith("%") and str(step.classname).endswith("%"):
+                    # The class object is taken from the variables, so it can change between executions
+                    cacheable = False
+                    class_object = self.variables.get(step.classname)
+                    if len(step.function) > 0 and class_object is not None:
+                        method_to_call = getattr(class_object, step.function)
+
+                else:
+                    if hasattr(step, "function"):
+                        method_to_call = getattr(module_object, step.function)
+
+        else:
+            method_to_call = getattr(module_object, step.function)
+        resolved = (module_object, class_object, method_to_call)
+        if cacheable:
+            self.step_callables[step.id] = resolved
+        return resolved
+
+    def load_module(self, path: str) -> any:
+        """
+        Load a Python module from a file. Loaded modules are kept for the lifetime of the process and are only loaded
+        again when the file has been modified.
+        :param path: The full path to the Python file.
+        :return: The module object.
+        """
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        cached = WorkflowEngine.loaded_modules.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        spec = util.spec_from_file_location(path, path)
+        if spec is None:
+            step_time = datetime.now().strftime("%H:%M:%S")
+            raise Exception(
+                f"{step_time}: The module '{path}' could not be loaded. Check the path...")
+        module_object = util.module_from_spec(spec)
+        getattr(spec.loader, "exec_module")(module_object)
+        WorkflowEngine.loaded_modules[path] = (mtime, module_object)
+        return module_object
+
+    def get_loop_variable_number(self, var_name):
+        """
+        Get the loop variable number.
+        :param var_name: The name of the loop variable.
+        """
+        loopvar = self.loopvariables.get_by_name(var_name)
+        if loopvar is not None:
+            return loopvar.counter
+        return 0
 
     def set_error(self, ex: any):
         """
@@ -1082,11 +1735,34 @@ class WorkflowEngine:
             })
         self.error = err_
 
-    def print_log(self, result: str, status: str = ""):
+    def is_logged(self, level: str) -> bool:
+        """
+        Check if messages of a log level are logged. Use this to skip building a message that will not be logged.
+        :param level: The log level of the message: 'step', 'loop-item' or 'debug'.
+        :return: True or False
+        """
+        return getattr(self, "log_level", 3) >= self.log_levels[level]
+
+    def print_log(self, result: str, status: str = "", level: str = "step"):
         """
         Log progress to the Orchestrator database and print progress on screen
         :param status: Optional. The status of the step
         :param result: The result of the step
+        :param level: Optional. The log level of the message: 'step', 'loop-item' or 'debug'. Default is 'step'.
+        """
+        if not self.is_logged(level):
+            return
+        start = time.perf_counter() if self.profiler is not None else None
+        with self.log_lock:
+            self.write_log(result, status)
+        if start is not None:
+            self.profiler.add_logging(time.perf_counter() - start)
+
+    def write_log(self, result: str, status: str):
+        """
+        Print the log message on screen and write it to the Orchestrator database
+        :param status: The status of the step
+        :param result: The result of the step
         """
         try:
             result = str(result).replace("<br>", " ")
@@ -1112,316 +1788,1615 @@ class WorkflowEngine:
             else:
                 result = "Starting"
                 step_name = "Start"
-            sql = "INSERT INTO Steps (run, name, step, status, result) VALUES (?,?,?,?,?);"
-            self.db.run_sql(sql=sql,
-                            params=[self.id, self.flowname, step_name, status, str(self.step_nr) + " " + result])
+            self.write_step_log([self.id, self.flowname, step_name, status, str(self.step_nr) + " " + result])
         except Exception as ex:
             self.set_error(ex)
             raise Exception(self.error)
 
-    def exitcode_not_ok(self):
+    def write_step_log(self, params: list):
+        """
+        Write a record to the Steps table of the orchestrator database. With asynchronous logging, the record is queued
+        and written in a batch by the log writer.
+        :param params: The values for the run, name, step, status and result columns.
+        """
+        log_writer = getattr(self, "log_writer", None)
+        if log_writer is not None:
+            log_writer.write(params)
+        else:
+            started = time.perf_counter()
+            sql = "INSERT INTO Steps (run, name, step, status, result) VALUES (?,?,?,?,?);"
+            self.db.run_sql(sql=sql, params=params)
+            if getattr(self, "run_tracer", None) is not None:
+                self.run_tracer.add_span("Log write", "db", started, time.perf_counter(), {"records": 1})
+
+    def start_log_writer(self):
+        """
+        Start the background writer for the asynchronous logging. A running log writer is closed first.
+        """
+        if getattr(self, "log_writer", None) is not None:
+            self.log_writer_finalizer.detach()
+            self.log_writer.close()
+            self.log_writer = None
+        if self.asynchronous_logging and hasattr(self.db, "connection"):
+            self.log_writer = LogWriter(dbfolder=self.db_folder, useSQLserver=self.db.useSQLserver,
+                                        usePostgres=self.db.usePostgreSQL, connection_string=self.connection_string)
+            # Write the remaining records when the engine is removed or the program exits
+            self.log_writer_finalizer = weakref.finalize(self, self.log_writer.close)
+
+    def flush_log(self):
+        """
+        Wait until all queued log records are written to the orchestrator database.
+        """
+        if getattr(self, "log_writer", None) is not None:
+            started = time.perf_counter()
+            self.log_writer.flush()
+            if getattr(self, "run_tracer", None) is not None:
+                self.run_tracer.add_span("Wait for log writer", "db", started, time.perf_counter())
+
+    def exitcode_not_ok(self):
+        """
+        Exit the flow with exitcode not OK -1
+        """
+        self.end_flow()
+        sys.exit(-1)
+
+    def exitcode_ok(self):
+        """
+        Exit the flow with exitcode OK 0
+        """
+        self.end_flow()
+        sys.exit(0)
+
+    def end_flow(self):
+        """
+        Log the end of the flow in the orchestrator database
+        """
+        # Flow has ended. Log the end in the orchestrator database.
+        ok = "The flow has ended."
+        try:
+            if self.error:
+                ok = "The flow has ended with ERRORS."
+            sql = "INSERT INTO Steps (run, name, step, status, result) VALUES (?,?,?,?,?);"
+            step_time = datetime.now().strftime("%H:%M:%S")
+            finished = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            if self.subflow:
+                end_result = step_time + ": Subflow Flow '" + self.flowname + "': " + ok
+            else:
+                end_result = step_time + ": Flow '" + self.flowname + "': " + ok
+            print(end_result)
+            if getattr(self, "log_writer", None) is not None:
+                self.write_step_log([self.id, self.flowname, 'End', 'Ended', ok])
+                self.flush_log()
+            else:
+                self.db.run_sql(sql=sql, params=[self.id, self.flowname, 'End', 'Ended', ok], tablename="Steps")
+            # Update the result of the flow
+            sql = "UPDATE Runs SET result=?, finished=? where id =?;"
+            self.db.run_sql(sql=sql, params=[ok, finished, self.id], tablename="Runs")
+            if self.profiler is not None:
+                self.save_step_metrics()
+            if self.run_tracer is not None:
+                self.end_trace()
+        except Exception as ex:
+            self.set_error(ex)
+            raise Exception(f"Error: {ex}\n{self.error}")
+
+    def save_step_metrics(self) -> str:
+        """
+        Save the measurements of the profiler in the StepMetrics table and in a JSON and CSV report.
+        :return: The full path of the JSON report.
+        """
+        metrics = self.profiler.get_metrics()
+        sql = "INSERT INTO StepMetrics (run, step_id, step_name, module_name, function_name, calls, wall_time, cpu_time, binding_time, call_time, logging_time) VALUES (?,?,?,?,?,?,?,?,?,?,?);"
+        self.db.run_many_sql(sql, [[self.id] + x.to_list() for x in metrics])
+        folder = self.profile_folder
+        if len(folder) == 0:
+            folder = os.path.join(self.db_folder, "profiles")
+        os.makedirs(folder, exist_ok=True)
+        name = re.sub(r"[^\w.-]", "_", os.path.basename(str(self.flowname).replace("\\", "/")))
+        path = os.path.join(folder, f"{name}_{self.id}")
+        report = {"flow": self.flowname, "run": self.id, "steps": [x.to_dict() for x in metrics],
+                  "functions": [dict(list(x.to_dict().items())[2:]) for x in self.profiler.get_function_metrics()]}
+        with open(path + ".json", "w") as f:
+            json.dump(report, f, indent=2)
+        import csv
+        with open(path + ".csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(StepMetrics.fields)
+            for x in metrics:
+                writer.writerow(x.to_list())
+        if self.is_logged("step"):
+            print(f"The step metrics have been saved in '{path}.json'.")
+        return path + ".json"
+
+    def start_trace(self):
+        """
+        Start the timeline of a run. A flow without a tracer of its own that is started from a step of a traced flow
+        (a subflow, like with System.run_other_flow or Code.run_flow) adds its spans to the timeline of that flow.
+        """
+        if self.tracer is not None:
+            self.tracer.clear()
+        self.run_tracer = self.tracer if self.tracer is not None else FlowTracer.get_active()
+        self.trace_start = time.perf_counter()
+        FlowTracer.set_active(self.run_tracer)
+        if getattr(self, "log_writer", None) is not None:
+            self.log_writer.tracer = self.run_tracer
+
+    def trace_step(self, step: any, start: float):
+        """
+        Add the span of an executed step to the timeline of the run. The span of a loop item starts at the loop step and
+        ends at the loop_items_check step of the loop variable.
+        :param step: The executed step.
+        :param start: The time (time.perf_counter) the step was started.
+        """
+        end = time.perf_counter()
+        args = {"id": step.id, "step": self.step_nr}
+        for key in ["module", "classname", "function"]:
+            if len(str(getattr(step, key, ""))) > 0:
+                args[key] = str(getattr(step, key))
+        name = str(getattr(step, "name", ""))
+        if len(name) == 0:
+            name = str(getattr(step, "type", "step"))
+        self.run_tracer.add_span(name, "step", start, end, args)
+        if hasattr(step, "loopcounter") and not self.is_parallel_loop(step):
+            loopvar = self.loopvariables.get_by_id(step.id)
+            self.run_tracer.start_loop_item(str(step.output_variable), loopvar.counter if loopvar is not None else 0,
+                                            start)
+        elif str(getattr(step, "function", "")).lower() == "loop_items_check":
+            self.run_tracer.end_loop_item(str(getattr(step, "loop_variable", "")), end)
+
+    def end_trace(self, error: any = None) -> str:
+        """
+        End the timeline of a run: add the span of the flow and save the timeline if it is the timeline of this flow
+        (and not of the flow that started this flow).
+        :param error: Optional. The error that ended the flow.
+        :return: The full path of the saved timeline, or an empty string if the timeline isn't saved.
+        """
+        tracer = self.run_tracer
+        self.run_tracer = None
+        FlowTracer.set_active(None)
+        args = {"run": self.id, "path": str(self.flowpath)}
+        if error is not None:
+            args["error"] = str(error)
+        category = "flow" if tracer is self.tracer else "subflow"
+        tracer.add_span(f"Flow '{self.flowname}'", category, self.trace_start, time.perf_counter(), args)
+        if tracer is not self.tracer:
+            return ""
+        folder = self.trace_folder
+        if len(folder) == 0:
+            folder = os.path.join(self.db_folder, "traces")
+        os.makedirs(folder, exist_ok=True)
+        name = re.sub(r"[^\w.-]", "_", os.path.basename(str(self.flowname).replace("\\", "/")))
+        path = os.path.join(folder, f"{name}_{self.id}.trace.json")
+        tracer.save(path)
+        if self.is_logged("step"):
+            print(f"The timeline has been saved in '{path}'.")
+        return path
+
+    def get_input_from_signature(self, step: any, method_to_call: any) -> any:
+        plan = self.get_binding_plan(step, method_to_call)
+        if plan is None:
+            return None
+        return self.bind_parameters(step, plan)
+
+    def get_binding_plan(self, step: any, method_to_call: any) -> any:
+        """
+        Get the binding plan for the input parameters of a step. The plan is created once per step and function.
+        :param step: The step to get the binding plan for
+        :param method_to_call: The function or class that will be called
+        :return: A BindingPlan object, or None if the function has no input parameters
+        """
+        target = getattr(method_to_call, "__func__", method_to_call)
+        cached = self.binding_plans.get(step.id)
+        if cached is not None and cached[0] is target:
+            return cached[1]
+        compiled = self.compiled_plans.get(step.id)
+        if compiled is not None and compiled[:2] == self.get_source_state(target):
+            self.binding_plans[step.id] = (target, compiled[2])
+            return compiled[2]
+        sig = None
+        try:
+            sig = signature(method_to_call)
+        except Exception as ex:
+            self.set_error(ex)
+            print(f"Error in getting input from input_signature: {self.error}")
+        plan = None
+        if str(sig) != "()":
+            plan = BindingPlan(step, sig)
+        self.binding_plans[step.id] = (target, plan)
+        return plan
+
+    def clear_step_caches(self):
+        """
+        Clear the resolved functions and binding plans of the steps.
+        """
+        self.step_callables = {}
+        self.binding_plans = {}
+
+    def reset_loopcounter(self, reset_for_loop_variable, directcall=True):
+        """
+        Reset the loopcounter for a loop variable
+        :param directcall: Optional. Indication whether a direct call should be made.
+        :param reset_for_loop_variable: The name of the loop variable.
+        """
+        loopvar = self.loopvariables.get_by_name(reset_for_loop_variable)
+        if loopvar is None:
+            if directcall:
+                self.print_log(
+                    f"Loopcounter '{reset_for_loop_variable}' has not yet been initiated. No reset needed.", "Running",
+                    "loop-item")
+        if loopvar is not None:
+            if loopvar.total_listitems <= loopvar.counter:
+                self.loopvariables.remove(loopvar)
+                if directcall:
+                    self.print_log(f"Loopcounter reset for loopvariable '{reset_for_loop_variable}'",
+                                   "Running", "loop-item")
+
+    def loopcounter(self, step: any, output_previous_step: any) -> any:
+        """
+        Process steps with a loopcounter
+        :param step: The current step object
+        :param output_previous_step: The output of the previous step as object
+        :return: An item from the list that is looped
+        """
+        if hasattr(step, "loopcounter"):
+            # Update the total list count
+            try:
+                loopvar = self.loopvariables.get_by_id(step.id)
+                if loopvar is None:
+                    raise Exception(f"The loop variable of step '{step.name}' has not been initiated.")
+                if not hasattr(loopvar, "items"):
+                    if self.is_streamed(output_previous_step):
+                        # Read the items one by one instead of reading them all into memory
+                        loopvar.items = LoopItems(output_previous_step)
+                        loopvar.total_listitems = len(loopvar.items)
+                    else:
+                        if isinstance(output_previous_step, list):
+                            loopvar.total_listitems = len(output_previous_step)
+                        else:
+                            loopvar.total_listitems = 1
+                        if loopvar.total_listitems > 0 and type(output_previous_step[0]).__name__ == "Row":
+                            for t in range(0, loopvar.total_listitems):
+                                output_previous_step[t] = list(output_previous_step[t])
+                        if isinstance(output_previous_step, str) and not str(output_previous_step).__contains__(
+                                "%") and not isinstance(output_previous_step, list):
+                            loopvar.items = [output_previous_step]
+                        elif isinstance(self.variables, VariableStore) and isinstance(output_previous_step, list):
+                            # The items of a spilled variable are read page by page, a list in memory is used as it is
+                            loopvar.items = self.variables.get_spilled_items(VariableLiveness.get_read_variables(step),
+                                                                             output_previous_step)
+                        else:
+                            loopvar.items = output_previous_step
+                    if loopvar.total_listitems == 0:
+                        self.print_log("There are no more items to loop", "Ending loop", "loop-item")
+                        # self.exitcode_ok()
+                    loopvar.start = int(step.loopcounter)  # set start of counter
+                if int(loopvar.counter) <= loopvar.start:
+                    loopvar.counter = int(loopvar.start)
+                    self.loopvariables.set_name(loopvar, step.output_variable)
+                # It's a loop! Overwrite the output_previous_step with the right element
+                if len(loopvar.items) > 0 and not self.is_logged("loop-item"):
+                    return loopvar.items[loopvar.counter]
+                if len(loopvar.items) > 0:
+                    name = loopvar.items[loopvar.counter]
+                    if not isinstance(name, str):
+                        if hasattr(name, 'name'):
+                            name = name.name
+                        elif hasattr(name, 'title'):
+                            name = name.title
+                        elif hasattr(name, 'titel'):
+                            name = name.titel
+                        elif hasattr(name, 'naam'):
+                            name = name.naam
+                        elif hasattr(name, 'subject'):
+                            name = name.subject
+                        elif hasattr(name, 'onderwerp'):
+                            name = name.onderwerp
+                        else:
+                            name = name.__str__()
+                    end_result = f"loopitem '{name}' returned."
+                    self.print_log(end_result, "Looping", "loop-item")
+                    return loopvar.items[loopvar.counter]
+                else:
+                    return output_previous_step
+            except Exception as ex:
+                self.set_error(ex)
+                sql = f"INSERT INTO Steps (run, name, step, status, result) VALUES ('{self.id}', '{self.flowname}', '{step.name}', 'Running', '', 'Error: {self.error}');"
+                self.db.run_sql(sql=sql, tablename="Steps")
+                self.error = True
+                print(f"Error: {self.error}")
+                return output_previous_step
+        else:
+            return output_previous_step
+
+    @staticmethod
+    def is_streamed(value: any) -> bool:
+        """
+        Check if a loop source must be read item by item, like a generator, a database cursor or an Exchangelib QuerySet.
+        :param value: The loop source
+        :return: True or False
+        """
+        if type(value).__name__ == "QuerySet":
+            return True
+        return hasattr(value, "__next__") and not isinstance(value, (str, bytes, list, tuple, dict))
+
+    def get_system_variable_names(self, step: any) -> set:
+        """
+        Get the names of the system variables (like '%__today__%') that are used in the attributes of a step.
+        :param step: The step object.
+        :return: A set with the names of the system variables.
+        """
+        retn = set()
+        attrs = step.to_dict() if isinstance(step, Step) else vars(step)
+        for value in attrs.values():
+            retn.update(x for x in self.system_variable_pattern.findall(str(value)) if x in self.system_variable_values)
+        return retn
+
+    def store_system_variables(self, step):
+        """
+        Store the current values of the system variables that are used in a step in the variables dictionary. This is
+        not needed to run a flow: the values of system variables are taken at the moment they are replaced.
+        :param step: The step object.
+        """
+        for name in self.get_system_variable_names(step):
+            self.variables.update({name: self.system_variable_values[name]()})
+
+    def save_output_variable(self, step, this_step, output_previous_step):
+        """
+        Save output variable to list
+        :param step: The current step object
+        :param this_step: The current output variable
+        :param output_previous_step: The output of the previous step
+        """
+        if hasattr(step, "output_variable"):
+            if len(step.output_variable) > 0 and str(step.output_variable).startswith("%") and str(
+                    step.output_variable).endswith("%"):
+                if hasattr(step, "loopcounter"):
+                    this_step = output_previous_step
+                self.variables.update(
+                    {f"{step.output_variable}": this_step})  # Update the variables list
+
+    def loop_items_check(self, loop_variable: str) -> bool:
+        """
+        Check if there are more items to loop, or it has reached the end
+        :param loop_variable: The name of the loopvariable to check.
+        :return: True: the variable has more items to loop, False: the loop must end
+        """
+        retn = False
+        try:
+            loop = self.loopvariables.get_by_name(loop_variable)
+            loop.counter += 1
+            if isinstance(getattr(loop, "items", None), LoopItems):
+                # Only the items up to the lookahead are known
+                loop.total_listitems = loop.items.read_until(loop.counter)
+        except (ValueError, Exception):
+            print(
+                f"Error: probably isn't the variable name '{loop_variable}' the right variable to check for more loop-items...")
+            return retn
+        if loop is not None:
+            if loop.counter < loop.total_listitems:
+                retn = True
+            else:
+                self.reset_loopcounter(loop_variable, False)
+                retn = False
+        else:
+            self.reset_loopcounter(loop_variable, False)
+            retn = False
+        return retn
+
+    def get_next_step(self, current_step, steps, output_previous_step: any) -> any:
+        """
+        Get the next step in the flow
+        :param output_previous_step: The output of the previous step.
+        :param current_step: The step object of the current step
+        :param steps: The steps collection
+        :return: The next step object
+        """
+        if current_step is None:
+            return None
+        retn = self.get_flow_graph(steps).get_next_step(current_step, output_previous_step)
+        self.register_loop_variable(retn)
+        return retn
+
+    def register_loop_variable(self, step: any):
+        """
+        Create the loop variable of a step with a loopcounter, if it doesn't exist yet.
+        :param step: The step object
+        """
+        if hasattr(step, "loopcounter"):
+            if self.loopvariables.get_by_id(step.id) is None:
+                try:
+                    loopvar = self.dynamic_object()
+                    if hasattr(step, "output_variable"):
+                        loopvar.name = str(step.output_variable)
+                    loopvar.id = step.id
+                    loopvar.start = int(step.loopcounter)
+                    loopvar.counter = loopvar.start
+                    loopvar.total_listitems = 0
+                    self.loopvariables.append(loopvar)
+                except Exception as ex:
+                    self.set_error(ex)
+                    print(f"Error: {self.error}")
+
+    def get_flow_graph(self, steps: list) -> any:
+        """
+        Get the index of the flow steps. The index is built once per list of steps and reused for every step transition.
+        :param steps: The steps collection
+        :return: A FlowGraph object
+        """
+        if not isinstance(steps, list):
+            steps = [steps]
+        graph = getattr(self, "flow_graph", None)
+        if graph is None or graph.steps is not steps:
+            graph = FlowGraph(steps)
+            self.flow_graph = graph
+        return graph
+
+    def get_variable_liveness(self, steps: list) -> any:
+        """
+        Get the variables that are not read anymore after each sequence flow arrow of the flow. The analysis is done
+        once per flow and kept with the index of the flow.
+        :param steps: The steps collection
+        :return: A VariableLiveness object
+        """
+        graph = self.get_flow_graph(steps)
+        liveness = getattr(graph, "liveness", None)
+        if liveness is None:
+            liveness = VariableLiveness(graph)
+            graph.liveness = liveness
+        return liveness
+
+    def release_variables(self, step: any, next_step: any, steps: list):
+        """
+        Remove the variables that are not read by the next step or any step after it from the variables dictionary, so
+        their values can be freed. Variables in keep_variables are never removed.
+        :param step: The step that was executed, or None after joined parallel branches or a parallel loop (all variables are checked).
+        :param next_step: The step that will be executed next.
+        :param steps: The steps collection
+        """
+        if not self.free_variables or next_step is None:
+            return
+        liveness = self.get_variable_liveness(steps)
+        if step is None:
+            names = liveness.get_dead_variables(next_step, self.variables)
+        else:
+            names = liveness.dead_after.get((step.id, next_step.id), ())
+        for name in names:
+            if name not in self.keep_variables:
+                self.variables.pop(name, None)
+
+    class dynamic_object(object):
+        pass
+
+    def set_breakpoint(self):
+        """
+        Set a breakpoint to debug the code.
+        """
+        print("---------- Debug ----------")
+        self.flush_log()
+        finished = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        sql = f"UPDATE Runs SET result= 'Encounters a breakpoint.', finished='{finished}' where id = {self.id};"
+        self.db.run_sql(sql=sql, tablename="Runs")
+        breakpoint()
+
+
+class Step:
+    # The attributes that most steps have are stored in slots, all other Shape values in the __dict__ of the step
+    __slots__ = ("id", "type", "name", "module", "classname", "function", "output_variable", "loopcounter", "source",
+                 "target", "value", "IsStart", "_has_direct_variables", "__dict__")
+
+    def __init__(self, **attributes):
+        """
+        Class holding a step (shape or sequence flow arrow) of a flow. Attributes that are not set don't exist, so
+        hasattr can be used to check if a Shape value is present.
+        :param attributes: Optional. The attributes of the step.
+        """
+        for key, value in attributes.items():
+            setattr(self, key, value)
+
+    @property
+    def has_direct_variables(self) -> bool:
+        """
+        Indicator if one of the Shape values (except the output variable) is a variable, like '%variable%'. The value
+        is determined once, when it is first used.
+        """
+        try:
+            return self._has_direct_variables
+        except AttributeError:
+            self._has_direct_variables = any(
+                str(val).startswith("%") and str(val).endswith("%") for key, val in self.to_dict().items() if
+                key != "output_variable")
+            return self._has_direct_variables
+
+    def to_dict(self) -> dict:
+        """
+        Get the attributes of the step.
+        :return: A dictionary with the attribute names and values.
+        """
+        retn = {}
+        for key in Step.__slots__[:-2]:
+            try:
+                retn[key] = object.__getattribute__(self, key)
+            except AttributeError:
+                pass
+        retn.update(self.__dict__)
+        return retn
+
+
+class StepMetrics:
+    fields = ["step_id", "step_name", "module_name", "function_name", "calls", "wall_time", "cpu_time", "binding_time",
+              "call_time", "logging_time"]
+
+    def __init__(self, step_id: str, step_name: str, module_name: str, function_name: str):
+        """
+        Class holding the measurements of a step (or of all steps that call the same function) in a run. The times are
+        in seconds and are the totals of all calls.
+        :param step_id: The id of the step.
+        :param step_name: The name of the step.
+        :param module_name: The file name of the module of the step.
+        :param function_name: The function of the step.
+        """
+        self.step_id = step_id
+        self.step_name = step_name
+        self.module_name = module_name
+        self.function_name = function_name
+        self.calls = 0
+        self.wall_time = 0.0  # The time from the start of the step until the output is saved
+        self.cpu_time = 0.0  # The CPU time of the thread that runs the step
+        self.binding_time = 0.0  # Finding the function and binding the input parameters
+        self.call_time = 0.0  # The call of the function
+        self.logging_time = 0.0  # Printing and writing the log of the step
+
+    def add(self, other: any):
+        """
+        Add the measurements of another StepMetrics object.
+        :param other: The StepMetrics object to add.
+        """
+        self.calls += other.calls
+        self.wall_time += other.wall_time
+        self.cpu_time += other.cpu_time
+        self.binding_time += other.binding_time
+        self.call_time += other.call_time
+        self.logging_time += other.logging_time
+
+    def to_list(self) -> list:
+        """
+        Get the measurements in the order of the fields attribute.
+        :return: A list with the values.
+        """
+        return [getattr(self, x) for x in self.fields]
+
+    def to_dict(self) -> dict:
+        """
+        Get the measurements as dictionary.
+        :return: A dictionary with the field names and values.
+        """
+        return dict(zip(self.fields, self.to_list()))
+
+
+class StepProfiler:
+
+    def __init__(self):
+        """
+        Class for measuring the time spent in the steps of a run. The steps of parallel branches are measured in their
+        own thread.
+        """
+        self.metrics = {}  # step id -> StepMetrics
+        self.lock = threading.Lock()
+        self.local = threading.local()  # The logging time of the step that runs in the current thread
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"], state["local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def clear(self):
+        """
+        Remove the measurements of the previous run.
+        """
+        with self.lock:
+            self.metrics = {}
+
+    def start(self) -> list:
+        """
+        Start measuring a step.
+        :return: A list with the wall time and CPU time of the start, to which execute_steps adds the times of the phases of the step.
+        """
+        self.local.logging_time = 0.0
+        self.local.cpu_time = 0.0
+        return [time.perf_counter(), time.thread_time()]
+
+    def add_logging(self, seconds: float):
+        """
+        Add logging time to the step that runs in the current thread.
+        :param seconds: The time spent on logging.
+        """
+        self.local.logging_time = getattr(self.local, "logging_time", 0.0) + seconds
+
+    def add_cpu_time(self, seconds: float):
+        """
+        Add the CPU time of a step function that ran in another thread (like an executor thread of run_steps_async) to
+        the step that runs in the current thread.
+        :param seconds: The CPU time of the step function.
+        """
+        self.local.cpu_time = getattr(self.local, "cpu_time", 0.0) + seconds
+
+    def record(self, step: any, profile: list):
+        """
+        Add the measurements of an executed step.
+        :param step: The step object.
+        :param profile: The list returned by start, with the times when the binding started, the binding ended and the call ended.
+        """
+        end = time.perf_counter()
+        cpu_time = time.thread_time() - profile[1] + getattr(self.local, "cpu_time", 0.0)
+        with self.lock:
+            metrics = self.metrics.get(step.id)
+            if metrics is None:
+                module = str(getattr(step, "module", "")).replace("\\", "/").split("/")[-1]
+                metrics = StepMetrics(step.id, getattr(step, "name", ""), module, getattr(step, "function", ""))
+                self.metrics[step.id] = metrics
+            metrics.calls += 1
+            metrics.wall_time += end - profile[0]
+            metrics.cpu_time += cpu_time
+            if len(profile) == 5:
+                metrics.binding_time += profile[3] - profile[2]
+                metrics.call_time += profile[4] - profile[3]
+            metrics.logging_time += getattr(self.local, "logging_time", 0.0)
+
+    def get_metrics(self) -> list:
+        """
+        Get the measurements of the steps.
+        :return: A list of StepMetrics objects, in the order the steps were first executed.
+        """
+        with self.lock:
+            return list(self.metrics.values())
+
+    def get_function_metrics(self) -> list:
+        """
+        Get the measurements per module and function.
+        :return: A list of StepMetrics objects, sorted by wall time (highest first).
+        """
+        retn = {}
+        for metrics in self.get_metrics():
+            key = (metrics.module_name, metrics.function_name)
+            if key not in retn:
+                retn[key] = StepMetrics("", "", metrics.module_name, metrics.function_name)
+            retn[key].add(metrics)
+        return sorted(retn.values(), key=lambda x: x.wall_time, reverse=True)
+
+
+class FlowTracer:
+    active = threading.local()  # The tracer of the flow that runs a step in the current thread
+
+    def __init__(self):
+        """
+        Class for recording the timeline of a run as spans in the Chrome Trace Event format. Each span is shown in the
+        thread it ran in, so the steps of parallel branches and the log writer have their own row in a trace viewer.
+        """
+        self.events = []
+        self.threads = {}  # thread id -> thread name
+        self.loop_items = {}  # (thread id, loop variable) -> (start time, item number) of the current loop item
+        self.lock = threading.Lock()
+        self.epoch = time.perf_counter()
+        self.pid = os.getpid()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_active() -> any:
+        """
+        Get the tracer of the flow that runs a step in the current thread.
+        :return: The FlowTracer object, or None if the flow isn't traced.
+        """
+        return getattr(FlowTracer.active, "tracer", None)
+
+    @staticmethod
+    def set_active(tracer: any):
+        """
+        Set the tracer of the flow that runs a step in the current thread.
+        :param tracer: The FlowTracer object, or None.
+        """
+        FlowTracer.active.tracer = tracer
+
+    def clear(self):
+        """
+        Remove the spans of the previous run.
+        """
+        with self.lock:
+            self.events = []
+            self.threads = {}
+            self.loop_items = {}
+            self.epoch = time.perf_counter()
+
+    def add_span(self, name: str, category: str, start: float, end: float, args: dict = None):
+        """
+        Add a span to the timeline, in the current thread.
+        :param name: The name of the span.
+        :param category: The category of the span, like 'step' or 'db'.
+        :param start: The start time (time.perf_counter).
+        :param end: The end time (time.perf_counter).
+        :param args: Optional. A dictionary with extra information, shown when the span is selected.
+        """
+        thread = threading.current_thread()
+        event = {"name": name, "cat": category, "ph": "X", "ts": round((start - self.epoch) * 1000000, 1),
+                 "dur": round((end - start) * 1000000, 1), "pid": self.pid, "tid": thread.ident}
+        if args is not None:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+            self.threads[thread.ident] = thread.name
+
+    def start_loop_item(self, loop_variable: str, number: int, start: float):
+        """
+        Start the span of a loop item.
+        :param loop_variable: The name of the loop variable.
+        :param number: The index of the loop item.
+        :param start: The start time (time.perf_counter).
+        """
+        with self.lock:
+            self.loop_items[(threading.get_ident(), loop_variable)] = (start, number)
+
+    def end_loop_item(self, loop_variable: str, end: float):
+        """
+        End the span of the current item of a loop.
+        :param loop_variable: The name of the loop variable.
+        :param end: The end time (time.perf_counter).
+        """
+        with self.lock:
+            item = self.loop_items.pop((threading.get_ident(), loop_variable), None)
+        if item is not None:
+            self.add_span(f"Loop item {item[1] + 1} of {loop_variable}", "loop", item[0], end, {"item": item[1]})
+
+    def get_trace(self) -> dict:
+        """
+        Get the timeline in the Chrome Trace Event format.
+        :return: A dictionary with the events, ready to be saved as JSON.
+        """
+        with self.lock:
+            events = sorted(self.events, key=lambda x: x["ts"])
+            threads = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}} for
+                       tid, name in self.threads.items()]
+        return {"traceEvents": threads + events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str):
+        """
+        Save the timeline as JSON file.
+        :param path: The full path of the file.
+        """
+        with open(path, "w") as f:
+            json.dump(self.get_trace(), f, default=str)
+
+
+class CachedFlow:
+
+    def __init__(self, steps: list, graph: any, binding_plans: dict = None):
+        """
+        Class holding the steps of a flow that were loaded from the FlowCache or from a compiled flow.
+        :param steps: The steps of the flow.
+        :param graph: The FlowGraph of the steps.
+        :param binding_plans: Optional. The binding plans of a compiled flow: step id -> (source file, modification time, BindingPlan).
+        """
+        self.steps = steps
+        self.graph = graph
+        self.binding_plans = binding_plans or {}
+
+
+class FlowCache:
+    version = 4  # Change when the step objects change, to ignore the entries of older versions
+
+    def __init__(self, folder: str):
+        """
+        Class for saving the steps of flows on disk, so a flow file is only parsed again when it has been changed. An
+        entry is valid when the modification time and size of the flow file are unchanged, or else when the content hash
+        is unchanged.
+        :param folder: The folder for the cache files.
+        """
+        self.folder = folder
+
+    def get_cache_path(self, filepath: str) -> str:
+        """
+        Get the path of the cache file for a flow file.
+        :param filepath: The full path of the flow file.
+        :return: The full path of the cache file.
+        """
+        name = hashlib.sha1(os.path.abspath(filepath).encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, f"{name}.pickle")
+
+    @staticmethod
+    def get_content_hash(filepath: str) -> str:
+        """
+        Get the hash of the content of a file.
+        :param filepath: The full path of the file.
+        :return: The SHA-256 hash as hexadecimal string.
+        """
+        with open(filepath, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def load(self, filepath: str) -> tuple:
+        """
+        Get the cache entry of a flow file.
+        :param filepath: The full path of the flow file.
+        :return: A tuple with the cache entry (or None if there is no valid entry) and the (modification time, size) of the flow file (or None if the file doesn't exist).
+        """
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None, None
+        state = (stat.st_mtime_ns, stat.st_size)
+        try:
+            entry = self.read(self.get_cache_path(filepath))
+        except Exception:
+            return None, state
+        if entry.get("version") != self.version:
+            return None, state
+        if (entry["mtime"], entry["size"]) != state:
+            if entry["size"] != stat.st_size or entry["hash"] != self.get_content_hash(filepath):
+                return None, state
+            # The file was touched without changes: store the new modification time for the next run
+            self.save((filepath,) + state, entry)
+        return entry, state
+
+    def save(self, source: tuple, entry: dict):
+        """
+        Save the cache entry of a flow file. The entry is not saved if the file has been changed since it was opened.
+        :param source: A tuple with the full path, the modification time and the size of the flow file when it was opened.
+        :param entry: The cache entry with the steps of the flow.
+        """
+        filepath, mtime, size = source
+        try:
+            content_hash = self.get_content_hash(filepath)
+            stat = os.stat(filepath)
+            if (stat.st_mtime_ns, stat.st_size) != (mtime, size):
+                return
+            entry = dict(entry, version=self.version, mtime=mtime, size=size, hash=content_hash)
+            os.makedirs(self.folder, exist_ok=True)
+            self.write(self.get_cache_path(filepath), entry)
+        except Exception as ex:
+            # The flow can run without cache
+            print(f"The flow could not be saved in the flow cache: {ex}")
+
+    @staticmethod
+    def read(path: str) -> dict:
+        """
+        Read a cache entry or a compiled flow from a file.
+        :param path: The full path of the file.
+        :return: The flow entry as dictionary.
+        """
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    @staticmethod
+    def write(path: str, entry: dict):
+        """
+        Write a cache entry or a compiled flow to a file. The file is replaced at once, so a flow that is started at the
+        same time never reads a half-written file.
+        :param path: The full path of the file.
+        :param entry: The flow entry.
+        """
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+
+class LoopVariables:
+
+    def __init__(self, loopvariables: list = None):
+        """
+        Class holding the loop variables of a flow, indexed by the id of the loop step and by the variable name.
+        :param loopvariables: Optional. A list of loop variable objects to add, for example from a saved flow state.
+        """
+        self.by_id = {}  # step id -> loop variable
+        self.by_name = {}  # variable name -> list of loop variables with that name, in the order they were added
+        if loopvariables is not None:
+            for loopvar in loopvariables:
+                self.append(loopvar)
+
+    def __iter__(self):
+        return iter(list(self.by_id.values()))
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def append(self, loopvar: any):
+        """
+        Add a loop variable.
+        :param loopvar: The loop variable object. It must have an id attribute.
+        """
+        self.by_id[loopvar.id] = loopvar
+        if hasattr(loopvar, "name"):
+            self.by_name.setdefault(loopvar.name, []).append(loopvar)
+
+    def remove(self, loopvar: any):
+        """
+        Remove a loop variable.
+        :param loopvar: The loop variable object.
+        """
+        self.by_id.pop(loopvar.id, None)
+        if hasattr(loopvar, "name"):
+            named = self.by_name.get(loopvar.name, [])
+            if loopvar in named:
+                named.remove(loopvar)
+            if len(named) == 0:
+                self.by_name.pop(loopvar.name, None)
+
+    def set_name(self, loopvar: any, name: str):
+        """
+        Change the variable name of a loop variable.
+        :param loopvar: The loop variable object.
+        :param name: The new variable name.
+        """
+        if getattr(loopvar, "name", None) == name and loopvar.id in self.by_id:
+            return
+        self.remove(loopvar)
+        loopvar.name = name
+        self.append(loopvar)
+
+    def get_by_id(self, step_id: str) -> any:
+        """
+        Get the loop variable of a loop step.
+        :param step_id: The id of the loop step.
+        :return: The loop variable object, or None if there is no loop variable for the step.
+        """
+        return self.by_id.get(step_id)
+
+    def get_by_name(self, name: str) -> any:
+        """
+        Get a loop variable by its variable name.
+        :param name: The variable name (like '%variable%').
+        :return: The loop variable object, or None if there is no loop variable with this name.
+        """
+        named = self.by_name.get(name)
+        if named:
+            return named[0]
+        return None
+
+
+class LoopItems:
+
+    def __init__(self, source: any, lookahead: int = 1):
+        """
+        Class for looping over an iterable (like a generator or a database cursor) without reading all items into
+        memory. Items are read when they are needed, plus a lookahead to know if there is a next item. Items before the
+        requested item are released.
+        :param source: The iterable to loop over.
+        :param lookahead: Optional. The number of items to read ahead. Default is 1.
+        """
+        self.iterator = iter(source)
+        self.lookahead = lookahead
+        self.offset = 0  # The index of the first item in the buffer
+        self.buffer = collections.deque()
+        self.exhausted = False
+        self.read_until(lookahead)
+
+    def __len__(self):
+        return self.offset + len(self.buffer)
+
+    def __getitem__(self, index: int) -> any:
+        if index < self.offset:
+            raise IndexError(f"Loop item {index} has already been released.")
+        self.read_until(index + self.lookahead)
+        while self.offset < index and len(self.buffer) > 0:
+            self.buffer.popleft()
+            self.offset += 1
+        if index - self.offset >= len(self.buffer):
+            raise IndexError("Loop item index out of range.")
+        return self.buffer[index - self.offset]
+
+    def __getstate__(self):
+        # An iterator can't be saved (ChecklistEngine), so read the remaining items into the buffer
+        self.buffer.extend(self.iterator)
+        self.iterator = iter([])
+        self.exhausted = True
+        return self.__dict__.copy()
+
+    def read_until(self, index: int) -> int:
+        """
+        Read items from the source until the item with the given index has been read, or the source has no more items.
+        :param index: The index of the item to read.
+        :return: The number of items that have been read so far.
+        """
+        while not self.exhausted and self.offset + len(self.buffer) <= index:
+            try:
+                item = next(self.iterator)
+            except StopIteration:
+                self.exhausted = True
+                break
+            if type(item).__name__ == "Row":
+                item = list(item)
+            self.buffer.append(item)
+        return len(self)
+
+
+class SpillFile:
+
+    def __init__(self, folder: str):
+        """
+        Class holding a temporary SQLite database for the values that are moved out of memory by a VariableStore. The
+        file is removed when the object is no longer used, or when Python exits.
+        :param folder: The folder to create the file in.
+        """
+        os.makedirs(folder, exist_ok=True)
+        handle, self.path = tempfile.mkstemp(suffix=".spill", dir=folder)
+        os.close(handle)
+        self.lock = threading.Lock()  # The file is shared by the branches of a Parallel Gateway
+        self.connection = connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE Spill (id INTEGER PRIMARY KEY, data BLOB)")
+        weakref.finalize(self, SpillFile.remove, self.connection, self.path)
+
+    def write(self, data: bytes) -> int:
+        """
+        Write data to the spill file.
+        :param data: The data to write.
+        :return: The id of the data in the spill file.
+        """
+        with self.lock:
+            return self.connection.execute("INSERT INTO Spill (data) VALUES (?)", [data]).lastrowid
+
+    def read(self, row_id: int) -> bytes:
+        """
+        Read data from the spill file.
+        :param row_id: The id of the data.
+        :return: The data.
+        """
+        with self.lock:
+            return self.connection.execute("SELECT data FROM Spill WHERE id=?", [row_id]).fetchone()[0]
+
+    def delete(self, row_ids: list):
+        """
+        Remove data from the spill file. The space is reused for new data.
+        :param row_ids: The ids of the data to remove.
+        """
+        try:
+            with self.lock:
+                self.connection.executemany("DELETE FROM Spill WHERE id=?", [[x] for x in row_ids])
+        except Exception:
+            pass  # The file has already been removed (when Python exits)
+
+    @staticmethod
+    def remove(connection: any, path: str):
+        """
+        Close and remove a spill file.
+        :param connection: The connection to the spill file.
+        :param path: The full path of the spill file.
+        """
+        try:
+            connection.close()
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class SpilledValue:
+
+    def __init__(self, spill_file: any, value: any, page_size: int):
+        """
+        Class holding a value that has been written to a spill file. A list or tuple is written in pages, so its items
+        can be read without reading the whole value. The data is removed from the spill file when the object is no
+        longer used.
+        :param spill_file: The SpillFile to write to.
+        :param value: The value to write.
+        :param page_size: The number of items in a page of a list or tuple.
+        """
+        self.spill_file = spill_file
+        self.kind = type(value).__name__ if isinstance(value, (list, tuple)) else "value"
+        self.length = len(value)
+        self.offsets = []  # The index of the first item of each page
+        self.row_ids = []  # The id of each page in the spill file
+        if self.kind == "value":
+            self.row_ids.append(spill_file.write(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+        else:
+            for offset in range(0, len(value), page_size):
+                page = pickle.dumps(value[offset:offset + page_size], protocol=pickle.HIGHEST_PROTOCOL)
+                self.offsets.append(offset)
+                self.row_ids.append(spill_file.write(page))
+        weakref.finalize(self, spill_file.delete, self.row_ids)
+
+    def __repr__(self):
+        if self.kind == "value":
+            return f"<spilled value of {self.length} characters or items>"
+        return f"<spilled {self.kind} of {self.length} items>"
+
+    def load(self) -> any:
+        """
+        Read the value from the spill file.
+        :return: A new copy of the value.
+        """
+        if self.kind == "value":
+            return pickle.loads(self.spill_file.read(self.row_ids[0]))
+        retn = []
+        for row_id in self.row_ids:
+            retn.extend(pickle.loads(self.spill_file.read(row_id)))
+        return tuple(retn) if self.kind == "tuple" else retn
+
+    def load_page(self, index: int) -> tuple:
+        """
+        Read the page with a list item from the spill file.
+        :param index: The index of the item.
+        :return: A tuple with the index of the first item of the page and the items of the page.
+        """
+        page = bisect.bisect_right(self.offsets, index) - 1
+        return self.offsets[page], pickle.loads(self.spill_file.read(self.row_ids[page]))
+
+
+class SpilledItems(collections.abc.Sequence):
+
+    def __init__(self, value: any):
+        """
+        Class for looping over a list that has been written to a spill file. Only the page with the requested item is
+        kept in memory.
+        :param value: The SpilledValue of the list.
+        """
+        self.value = value
+        self.offset = 0  # The index of the first item in the page
+        self.page = []
+
+    def __len__(self):
+        return self.value.length
+
+    def __getitem__(self, index: any) -> any:
+        if isinstance(index, slice):
+            return [self[x] for x in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("Loop item index out of range.")
+        if not self.offset <= index < self.offset + len(self.page):
+            self.offset, self.page = self.value.load_page(index)
+        return self.page[index - self.offset]
+
+    def __reduce__(self):
+        # The spill file is temporary, so the items are saved as a list (ChecklistEngine)
+        return list, (self.value.load(),)
+
+
+class VariableStore(collections.abc.MutableMapping):
+    spill_file_class = SpillFile  # The class of the file that values are moved to, called with the folder
+    page_bytes = 256 * 1024  # The estimated size of a page of list items in the spill file
+
+    def __init__(self, folder: str, threshold: int):
+        """
+        Class holding the variables of a flow. Values with an estimated size above the threshold (lists, tuples,
+        dictionaries, texts and bytes) are moved to a spill file and read back each time they are used. Values that
+        can't be pickled stay in memory.
+        :param folder: The folder for the spill file. The file is created when the first value is moved.
+        :param threshold: The estimated size in bytes above which a value is moved to the spill file.
+        """
+        self.folder = folder
+        self.threshold = threshold
+        self.spill_file = None
+        self.entries = {}  # variable name -> value or SpilledValue
+
+    def __getitem__(self, key: str) -> any:
+        value = self.entries[key]
+        if isinstance(value, SpilledValue):
+            return value.load()
+        return value
+
+    def __setitem__(self, key: str, value: any):
+        self.entries[key] = self.spill(value)
+
+    def __delitem__(self, key: str):
+        del self.entries[key]
+
+    def __contains__(self, key: any) -> bool:
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __repr__(self):
+        return repr(self.entries)
+
+    def __getstate__(self):
+        # The spill file is temporary, so the values are saved themselves (ChecklistEngine)
+        state = self.__dict__.copy()
+        state["entries"] = dict(self.items())
+        state["spill_file"] = None
+        return state
+
+    def copy(self) -> any:
+        """
+        Create a copy of the variables for a branch. The copy shares the values in the spill file.
+        :return: The VariableStore object
+        """
+        retn = copy.copy(self)
+        retn.entries = dict(self.entries)
+        return retn
+
+    @staticmethod
+    def estimate_size(value: any) -> int:
+        """
+        Estimate the size of a value when it is pickled, from the size of (at most) its first 10 items.
+        :param value: The value
+        :return: The estimated size in bytes, or 0 if the value can't be moved to a spill file.
+        """
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        if not isinstance(value, (list, tuple, dict)) or len(value) == 0:
+            return 0
+        sample = list(value.items())[:10] if isinstance(value, dict) else value[:10]
+        try:
+            # The items are pickled one by one, so an object that is shared by the items is counted for each item
+            size = sum(len(pickle.dumps(x, protocol=pickle.HIGHEST_PROTOCOL)) for x in sample)
+            return size * len(value) // len(sample)
+        except Exception:
+            return 0
+
+    def spill(self, value: any) -> any:
+        """
+        Move a value to the spill file if its estimated size is above the threshold.
+        :param value: The value
+        :return: A SpilledValue object, or the value itself if it stays in memory.
+        """
+        size = self.estimate_size(value)
+        if size <= self.threshold:
+            return value
+        page_size = max(1, self.page_bytes * len(value) // size)
+        try:
+            if self.spill_file is None:
+                self.spill_file = self.spill_file_class(self.folder)
+            return SpilledValue(self.spill_file, value, page_size)
+        except Exception:
+            return value  # Values that can't be pickled stay in memory
+
+    def get_spilled_items(self, names: set, items: list) -> any:
+        """
+        Get the items of a loop from the spill file, when the list to loop over is the value of a spilled variable. The
+        list isn't written to the spill file again: a list that isn't spilled is looped over in memory.
+        :param names: The names of the variables that are read by the loop step.
+        :param items: The list to loop over, as read from the variable.
+        :return: A SpilledItems object, or the list itself.
+        """
+        for name in names:
+            value = self.entries.get(name)
+            if not isinstance(value, SpilledValue) or value.kind != "list" or value.length != len(items):
+                continue
+            try:
+                # Check the first item, in case the loop step reads more than one list of this length
+                if bool(value.load_page(0)[1][0] == items[0]):
+                    return SpilledItems(value)
+            except Exception:
+                pass
+        return items
+
+
+class BindingPlan:
+
+    def __init__(self, step: any, input_signature: any):
+        """
+        Class holding the input parameters of a step function with their Shape values. The Shape values are looked up,
+        defaulted and converted once, so only the values with variables have to be evaluated on each execution.
+        :param step: The step to create the plan for
+        :param input_signature: The input parameters of the function that needs to be called
+        """
+        self.input_signature = input_signature
+        self.parameters = []  # (parameter name, Shape value, VariableTemplate of the Shape value or None)
+        self.return_none = True
+        if input_signature is None:
+            return
+        for key, value in input_signature.parameters.items():
+            if str(key).lower() == "self":
+                continue
+            try:
+                val = str(getattr(step, str(key).lower()))
+            except (ValueError, Exception):
+                if str(value).__contains__("="):
+                    val = value.default
+                else:
+                    val = None
+            if val is not None:
+                if len(str(val)) == 0:
+                    if str(value.default) == "None":
+                        val = None
+                    else:
+                        val = ""
+                else:
+                    self.return_none = False
+            if isinstance(val, str):
+                if val == "True" or val == "Yes":
+                    val = True
+                elif val == "False" or val == "No":
+                    val = False
+                else:
+                    if val.replace(".", "").isnumeric():
+                        if val.__contains__("."):
+                            val = float(val)
+                        else:
+                            val = int(val)
+            template = None
+            if not str(key).__contains__("variable") and isinstance(val, str):
+                template = VariableTemplate(val)
+                if len(template.variables) == 0:
+                    template = None
+            self.parameters.append((str(key), val, template))
+
+    def __getstate__(self):
+        # The input signature is only checked for None, so it is saved as text in a compiled flow
+        state = self.__dict__.copy()
+        if self.input_signature is not None:
+            state["input_signature"] = str(self.input_signature)
+        return state
+
+
+class VariableTemplate:
+
+    def __init__(self, text: str):
+        """
+        Class holding a Shape value with its variables parsed, so the value can be rendered without parsing it again.
+        :param text: The Shape value
+        """
+        self.text = text
+        self.variables = [TextVariable(x) for x in WorkflowEngine.get_variables_from_text(text) or []]
+
+
+class TextVariable:
+
+    def __init__(self, text: str):
+        """
+        Class holding the parts of a variable (like '%rows[2].name%') in a Shape value.
+        :param text: The variable, including the percent signs
+        """
+        self.text = text
+        parts = text.replace("%", "").split("[")
+        names = parts[0].split(".")
+        self.name = "%" + names[0] + "%"  # The name of the variable in the variables dictionary
+        self.is_system_variable = self.name in WorkflowEngine.system_variable_values
+        self.attribute_path = names[1:]  # The (nested) attributes to get from the variable value
+        self.message_attribute = str(names[1]) if len(names) > 1 else ""
+        self.is_counter = text.lower().__contains__(".counter")
+        self.is_object = text.lower().__contains__(".object")
+        self.has_attribute = text.__contains__(".")
+        self.has_index = text.__contains__("[") and text.__contains__("]")
+        # List indexes as written between the brackets; converted with int() when they are used
+        self.indexes = [x.replace("]", "") for x in parts[1:]]
+        brackets = text.split("[")
+        self.bracket_numbers = []
+        for bracket in brackets:
+            if bracket.__contains__("]"):
+                nr = bracket.replace("]", "").replace("%", "")
+                if nr.isnumeric():
+                    self.bracket_numbers.append(int(nr))
+        self.nested_indexes = [x.replace("]", "").replace("%", "") for x in brackets[2:]]
+        self.trailing_index = None  # The last list index of a variable like '%rows.names[2]%'
+        if text.endswith("]%") and text.__contains__("."):
+            nr = brackets[-1].replace("]%", "")
+            if nr.isnumeric():
+                self.trailing_index = int(nr)
+
+
+class FlowGraph:
+
+    def __init__(self, steps: list):
+        """
+        Class holding an index of the flow, so the next step can be found without scanning all steps.
+        :param steps: The steps of the flow, as returned by get_flow.
+        """
+        self.steps = steps
+        self.step_by_id = {}  # step id -> step object (shapes take precedence over connectors)
+        self.outgoing = {}  # source id -> list of outgoing connectors
+        self.incoming = {}  # target id -> list of incoming connectors
+        self.true_successor = {}  # exclusive gateway id -> step after the 'True' or 'Yes' arrow
+        self.false_successor = {}  # exclusive gateway id -> step after the 'False' or 'No' arrow
+        self.start = None
+        self.liveness = None  # VariableLiveness of the flow, created by WorkflowEngine.get_variable_liveness
+        connectors = []
+        for step in steps:
+            if getattr(step, "type", None) == "connector":
+                connectors.append(step)
+            elif step.id not in self.step_by_id:
+                self.step_by_id[step.id] = step
+        for conn in connectors:
+            self.step_by_id.setdefault(conn.id, conn)
+            if hasattr(conn, "source"):
+                self.outgoing.setdefault(conn.source, []).append(conn)
+            if hasattr(conn, "target"):
+                self.incoming.setdefault(conn.target, []).append(conn)
+        for step in steps:
+            step_type = str(getattr(step, "type", "")).lower()
+            if step_type == "shape" and self.start is None and getattr(step, "IsStart", False):
+                self.start = step
+            if step_type == "exclusive gateway":
+                for conn in self.outgoing.get(step.id, []):
+                    value = str(getattr(conn, "value", "")).lower()
+                    if value in ["true", "yes"] and step.id not in self.true_successor:
+                        self.true_successor[step.id] = self.step_by_id.get(getattr(conn, "target", None))
+                    if value in ["false", "no"] and step.id not in self.false_successor:
+                        self.false_successor[step.id] = self.step_by_id.get(getattr(conn, "target", None))
+
+    def find_start_shapes(self) -> list:
+        """
+        Get the shapes that have outgoing, but no incoming sequence flow arrows.
+        :return: A list of start shape candidates.
+        """
+        return [x for x in self.steps if getattr(x, "type", None) != "connector" and x.id not in self.incoming and
+                x.id in self.outgoing]
+
+    def get_next_step(self, current_step: any, output_previous_step: any) -> any:
+        """
+        Get the next step in the flow
+        :param current_step: The step object of the current step
+        :param output_previous_step: The output of the previous step. Used to choose the path of an Exclusive Gateway.
+        :return: The next step object
+        """
+        outgoing_connectors = self.outgoing.get(current_step.id)
+        if not outgoing_connectors:
+            return None
+        if str(current_step.type).lower() != "exclusive gateway":
+            return self.step_by_id.get(getattr(outgoing_connectors[0], "target", None))
+        successors = self.true_successor if output_previous_step else self.false_successor
+        if current_step.id not in successors:
+            raise Exception("Your Exclusive Gateway doesn't contain a 'True' or 'False' sequence arrow output.")
+        retn = successors[current_step.id]
+        if retn is None:
+            print(
+                "Error: probably one of the Exclusive Gateways has some Sequence Flow Arrows that aren't connected properly...")
+        return retn
+
+    @staticmethod
+    def is_parallel_gateway(step: any) -> bool:
         """
-        Exit the flow with exitcode not OK -1
+        Check if a step is a Parallel Gateway.
+        :param step: The step object
+        :return: True or False
         """
-        self.end_flow()
-        sys.exit(-1)
+        return str(getattr(step, "type", "")).lower() == "parallel gateway"
 
-    def exitcode_ok(self):
+    def is_fork(self, step: any) -> bool:
         """
-        Exit the flow with exitcode OK 0
+        Check if a step is a Parallel Gateway that splits the flow into parallel branches.
+        :param step: The step object
+        :return: True or False
         """
-        self.end_flow()
-        sys.exit(0)
+        return self.is_parallel_gateway(step) and len(self.outgoing.get(step.id, [])) > 1
 
-    def end_flow(self):
+    def is_join(self, step: any) -> bool:
         """
-        Log the end of the flow in the orchestrator database
+        Check if a step is a Parallel Gateway that joins parallel branches.
+        :param step: The step object
+        :return: True or False
         """
-        # Flow has ended. Log the end in the orchestrator database.
-        ok = "The flow has ended."
-        try:
-            if self.error:
-                ok = "The flow has ended with ERRORS."
-            sql = "INSERT INTO Steps (run, name, step, status, result) VALUES (?,?,?,?,?);"
-            step_time = datetime.now().strftime("%H:%M:%S")
-            finished = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            if self.subflow:
-                end_result = step_time + ": Subflow Flow '" + self.flowname + "': " + ok
-            else:
-                end_result = step_time + ": Flow '" + self.flowname + "': " + ok
-            print(end_result)
-            self.db.run_sql(sql=sql, params=[self.id, self.flowname, 'End', 'Ended', ok], tablename="Steps")
-            # Update the result of the flow
-            sql = "UPDATE Runs SET result=?, finished=? where id =?;"
-            self.db.run_sql(sql=sql, params=[ok, finished, self.id], tablename="Runs")
-        except Exception as ex:
-            self.set_error(ex)
-            raise Exception(f"Error: {ex}\n{self.error}")
-
-    def get_input_from_signature(self, step: any, method_to_call: any) -> any:
-        sig = None
-        try:
-            sig = signature(method_to_call)
-        except Exception as ex:
-            self.set_error(ex)
-            print(f"Error in getting input from input_signature: {self.error}")
-        if str(sig) != "()":
-            step_input = self.get_parameters_from_shapevalues(step=step, input_signature=sig)
-            return step_input
-        return None
+        return self.is_parallel_gateway(step) and len(self.incoming.get(step.id, [])) > 1
 
-    def reset_loopcounter(self, reset_for_loop_variable, directcall=True):
+    def find_loop_check(self, step: any) -> any:
         """
-        Reset the loopcounter for a loop variable
-        :param directcall: Optional. Indication whether a direct call should be made.
-        :param reset_for_loop_variable: The name of the loop variable.
+        Find the loop_items_check step for the loop variable of a loop step.
+        :param step: The loop step
+        :return: The loop_items_check step, or None if it can't be found.
         """
-        loopvars = [x for x in self.loopvariables if x.name == reset_for_loop_variable]
-        if loopvars is not None and len(loopvars) > 0:
-            loopvar = loopvars[0]
-        else:
-            loopvar = None
-            if directcall:
-                self.print_log(
-                    f"Loopcounter '{reset_for_loop_variable}' has not yet been initiated. No reset needed.", "Running")
-        if loopvar is not None:
-            if loopvar.total_listitems <= loopvar.counter:
-                self.loopvariables.remove(loopvar)
-                if directcall:
-                    self.print_log(f"Loopcounter reset for loopvariable '{reset_for_loop_variable}'",
-                                   "Running")
+        visited = {step.id}
+        todo = collections.deque([step.id])
+        while len(todo) > 0:
+            for conn in self.outgoing.get(todo.popleft(), []):
+                target = self.step_by_id.get(getattr(conn, "target", None))
+                if target is None or target.id in visited:
+                    continue
+                if str(getattr(target, "function", "")).lower() == "loop_items_check" and getattr(
+                        target, "loop_variable", None) == getattr(step, "output_variable", None):
+                    return target
+                visited.add(target.id)
+                todo.append(target.id)
+        return None
 
-    def loopcounter(self, step: any, output_previous_step: any) -> any:
+    def get_branch_starts(self, step: any) -> list:
         """
-        Process steps with a loopcounter
-        :param step: The current step object
-        :param output_previous_step: The output of the previous step as object
-        :return: An item from the list that is looped
+        Get the first step of each outgoing branch of a Parallel Gateway.
+        :param step: The Parallel Gateway
+        :return: A list of step objects, in the order of the sequence flow arrows.
         """
-        if hasattr(step, "loopcounter"):
-            # Update the total list count
-            try:
-                loopvar = [x for x in self.loopvariables if x.id == step.id][0]
-                if not hasattr(loopvar, "items"):
-                    if str(output_previous_step).startswith("QuerySet"):
-                        loopvar.items = list(output_previous_step)
-                        loopvar.total_listitems = len(list(output_previous_step))
-                    else:
-                        if isinstance(output_previous_step, list):
-                            loopvar.total_listitems = len(output_previous_step)
-                        else:
-                            loopvar.total_listitems = 1
-                        if loopvar.total_listitems > 0 and type(output_previous_step[0]).__name__ == "Row":
-                            for t in range(0, loopvar.total_listitems):
-                                output_previous_step[t] = list(output_previous_step[t])
-                        if isinstance(output_previous_step, str) and not str(output_previous_step).__contains__(
-                                "%") and not isinstance(output_previous_step, list):
-                            loopvar.items = [output_previous_step]
-                        else:
-                            loopvar.items = output_previous_step
-                    if loopvar.total_listitems == 0:
-                        self.print_log("There are no more items to loop", "Ending loop")
-                        # self.exitcode_ok()
-                    loopvar.start = int(step.loopcounter)  # set start of counter
-                if int(loopvar.counter) <= loopvar.start:
-                    loopvar.counter = int(loopvar.start)
-                    loopvar.name = step.output_variable
-                # It's a loop! Overwrite the output_previous_step with the right element
-                if len(loopvar.items) > 0:
-                    name = loopvar.items[loopvar.counter]
-                    if not isinstance(name, str):
-                        if hasattr(name, 'name'):
-                            name = name.name
-                        elif hasattr(name, 'title'):
-                            name = name.title
-                        elif hasattr(name, 'titel'):
-                            name = name.titel
-                        elif hasattr(name, 'naam'):
-                            name = name.naam
-                        elif hasattr(name, 'subject'):
-                            name = name.subject
-                        elif hasattr(name, 'onderwerp'):
-                            name = name.onderwerp
-                        else:
-                            name = name.__str__()
-                    end_result = f"loopitem '{name}' returned."
-                    self.print_log(end_result, "Looping")
-                    return loopvar.items[loopvar.counter]
-                else:
-                    return output_previous_step
-            except Exception as ex:
-                self.set_error(ex)
-                sql = f"INSERT INTO Steps (run, name, step, status, result) VALUES ('{self.id}', '{self.flowname}', '{step.name}', 'Running', '', 'Error: {self.error}');"
-                self.db.run_sql(sql=sql, tablename="Steps")
-                self.error = True
-                print(f"Error: {self.error}")
-                return output_previous_step
-        else:
-            return output_previous_step
+        return [self.step_by_id.get(getattr(conn, "target", None)) for conn in self.outgoing.get(step.id, [])]
 
-    def store_system_variables(self, step):
-        for value in vars(step):
-            if str(getattr(step, value)).__contains__("%__today__%"):
-                self.variables.update({'%__today__%': datetime.today().date()})
-            if str(getattr(step, value)).__contains__("%__today_formatted__%"):
-                self.variables.update({'%__today_formatted__%': datetime.today().date().strftime("%d-%m-%Y")})
-            if str(getattr(step, value)).__contains__("%__month__%"):
-                self.variables.update({'%__month__%': "{:02d}".format(datetime.today().month)})
-            if str(getattr(step, value)).__contains__("%__year__%"):
-                self.variables.update({'%__year__%': datetime.today().year})
-            if str(getattr(step, value)).__contains__("%__weeknumber__%"):
-                self.variables.update({'%__weeknumber__%': datetime.today().strftime("%V")})
-            if str(getattr(step, value)).__contains__("%__tomorrow__%"):
-                self.variables.update({'%__tomorrow__%': datetime.today() + timedelta(days=1)})
-            if str(getattr(step, value)).__contains__("%__tomorrow_formatted__%"):
-                self.variables.update(
-                    {'%__tomorrow_formatted__%': (datetime.today() + timedelta(days=1)).strftime("%d-%m-%Y")})
-            if str(getattr(step, value)).__contains__("%__yesterday__%"):
-                self.variables.update({'%__yesterday__%': datetime.today() + timedelta(days=-1)})
-            if str(getattr(step, value)).__contains__("%__yesterday_formatted__%"):
-                self.variables.update(
-                    {'%__yesterday_formatted__%': (datetime.today() + timedelta(days=-1)).strftime("%d-%m-%Y")})
-            if str(getattr(step, value)).__contains__("%__time__%"):
-                self.variables.update({'%__time__%': datetime.now().time()})
-            if str(getattr(step, value)).__contains__("%__time_formatted__%"):
-                self.variables.update({'%__time_formatted__%': datetime.now().time().strftime("%H:%M:%S")})
-            if str(getattr(step, value)).__contains__("%__now__%"):
-                self.variables.update({'%__now__%': datetime.now()})
-            if str(getattr(step, value)).__contains__("%__now_formatted__%"):
-                self.variables.update({'%__now_formatted__%': datetime.today().date().strftime(
-                    "%d-%m-%Y") + "_" + datetime.now().time().strftime("%H%M%S")})
-            if str(getattr(step, value)).__contains__("%__folder_desktop__%"):
-                self.variables.update(
-                    {'%__folder_desktop__%': os.path.join(os.path.join(os.environ['USERPROFILE']), 'Desktop')})
-            if str(getattr(step, value)).__contains__("%__folder_downloads__%"):
-                self.variables.update(
-                    {'%__folder_downloads__%': os.path.join(os.path.join(os.environ['USERPROFILE']), 'Downloads')})
-            if str(getattr(step, value)).__contains__("%__folder_system__%"):
-                self.variables.update({'%__folder_system__%': os.environ['WINDIR'] + "\\System\\"})
-            if str(getattr(step, value)).__contains__("%__user_name__%"):
-                self.variables.update({'%__user_name__%': os.getenv('username')})
 
-    def save_output_variable(self, step, this_step, output_previous_step):
+class VariableLiveness:
+
+    def __init__(self, graph: any):
         """
-        Save output variable to list
-        :param step: The current step object
-        :param this_step: The current output variable
-        :param output_previous_step: The output of the previous step
+        Class holding the variables that are not read anymore after each sequence flow arrow of a flow. A step reads a
+        variable when the variable is used in one of its Shape values, when the step is a loop step or uses its own
+        output variable, or when the step follows the step that set the variable (the output of the previous step can
+        be the input of a step). The analysis follows all paths of the flow, including loops and the branches of
+        gateways.
+        :param graph: The FlowGraph of the flow.
         """
-        if hasattr(step, "output_variable"):
-            if len(step.output_variable) > 0 and str(step.output_variable).startswith("%") and str(
-                    step.output_variable).endswith("%"):
-                if hasattr(step, "loopcounter"):
-                    this_step = output_previous_step
-                self.variables.update(
-                    {f"{step.output_variable}": this_step})  # Update the variables list
+        self.variables = set()  # The variables that are set by the steps of the flow
+        self.live = {}  # step id -> the variables that are read by the step or a step after it
+        self.dead_after = {}  # (step id, next step id) -> the variables that are not read anymore after the arrow
+        steps = [x for x in graph.step_by_id.values() if getattr(x, "type", None) != "connector"]
+        successors = {}
+        reads = {}
+        writes = {}
+        for step in steps:
+            successors[step.id] = [x for x in graph.get_branch_starts(step) if
+                                   x is not None and getattr(x, "type", None) != "connector"]
+            reads[step.id] = self.get_read_variables(step)
+            writes[step.id] = self.get_written_variables(step)
+            self.variables.update(writes[step.id])
+        for step in steps:
+            for successor in successors[step.id]:
+                reads[successor.id].update(writes[step.id])
+        live_out = {step.id: frozenset() for step in steps}
+        self.live = {step.id: frozenset(reads[step.id]) for step in steps}
+        changed = True
+        while changed:
+            changed = False
+            for step in reversed(steps):
+                out = frozenset().union(*(self.live[x.id] for x in successors[step.id]))
+                live = frozenset(reads[step.id] | (out - writes[step.id]))
+                live_out[step.id] = out
+                if live != self.live[step.id]:
+                    self.live[step.id] = live
+                    changed = True
+        for step in steps:
+            used = (reads[step.id] | writes[step.id] | live_out[step.id]) & self.variables
+            for successor in successors[step.id]:
+                dead = tuple(used - self.live[successor.id])
+                if len(dead) > 0:
+                    self.dead_after[(step.id, successor.id)] = dead
 
-    def loop_items_check(self, loop_variable: str) -> bool:
+    @staticmethod
+    def get_read_variables(step: any) -> set:
         """
-        Check if there are more items to loop, or it has reached the end
-        :param loop_variable: The name of the loopvariable to check.
-        :return: True: the variable has more items to loop, False: the loop must end
+        Get the names of the variables that are read by a step.
+        :param step: The step object
+        :return: A set with variable names, like '%variable%'.
         """
-        retn = False
-        try:
-            loop = [x for x in self.loopvariables if x.name == loop_variable][0]
-            loop.counter += 1
-        except (ValueError, Exception):
-            print(
-                f"Error: probably isn't the variable name '{loop_variable}' the right variable to check for more loop-items...")
-            return retn
-        if loop is not None:
-            if loop.counter < loop.total_listitems:
-                retn = True
-            else:
-                self.reset_loopcounter(loop_variable, False)
-                retn = False
-        else:
-            self.reset_loopcounter(loop_variable, False)
-            retn = False
+        retn = set()
+        attrs = step.to_dict() if isinstance(step, Step) else vars(step)
+        for key, value in attrs.items():
+            if key in ["output_variable", "error_variable"]:
+                continue
+            for text in WorkflowEngine.get_variables_from_text(value) or []:
+                retn.add(TextVariable(text).name)
+        output_variable = str(getattr(step, "output_variable", ""))
+        if output_variable.startswith("%") and output_variable.endswith("%") and (
+                hasattr(step, "loopcounter") or WorkflowEngine.step_has_direct_variables(step)):
+            # A loop step reads its list again for each item, other steps can call a function of their output variable
+            retn.add(output_variable)
         return retn
 
-    def get_next_step(self, current_step, steps, output_previous_step: any) -> any:
+    @staticmethod
+    def get_written_variables(step: any) -> set:
         """
-        Get the next step in the flow
-        :param output_previous_step: The output of the previous step.
-        :param current_step: The step object of the current step
-        :param steps: The steps collection
-        :return: The next step object
+        Get the names of the variables that are set by a step.
+        :param step: The step object
+        :return: A set with variable names, like '%variable%'.
         """
-        retn = None
-        col_conn = []
-        connectors = [x for x in steps if x.type == "connector"]
-        try:
-            if str(current_step.type).lower() == "exclusive gateway":
-                outgoing_connector = [x for x in connectors if x.source == current_step.id]
-            else:
-                outgoing_connector = [x for x in connectors if x.source == current_step.id][0]
-        except (ValueError, Exception):
-            return None
-        if outgoing_connector is None:
-            return None
-        if not isinstance(outgoing_connector, list):
-            shapes = [x for x in steps if x.type == "shape"]
-            col_conn = [x for x in shapes if x.id == outgoing_connector.target]
-        if len(col_conn) > 0:
-            retn = col_conn[0]
-        if retn is None and str(current_step.type).lower() != "exclusive gateway":
-            # Next step is a Gateway
-            # incoming_connector = [x for x in connectors if x.source == current_step.id][0]
-            retn = [x for x in steps if x.id == outgoing_connector.target][0]
-        if str(current_step.type).lower() == "exclusive gateway":
-            if output_previous_step:
-                try:
-                    conn = \
-                        [x for x in outgoing_connector if
-                         ((str(x.value).lower() == "true" or str(
-                             x.value).lower() == "yes") and x.source == current_step.id)][0]
-                except (ValueError, Exception):
-                    raise Exception("Your Exclusive Gateway doesn't contain a 'True' or 'False' sequence arrow output.")
-            else:
-                try:
-                    conn = \
-                        [x for x in outgoing_connector if
-                         ((str(x.value).lower() == "false" or str(
-                             x.value).lower() == "no") and x.source == current_step.id)][0]
-                except (ValueError, Exception):
-                    raise Exception("Your Exclusive Gateway doesn't contain a 'True' or 'False' sequence arrow output.")
-            try:
-                retn = [x for x in steps if x.id == conn.target][0]
-            except (ValueError, Exception):
-                print(
-                    "Error: probably one of the Exclusive Gateways has some Sequence Flow Arrows that aren't connected properly...")
-                return None
-        if hasattr(retn, "loopcounter"):
-            check_loopvar = [x for x in self.loopvariables if x.id == retn.id]
-            if len(check_loopvar) == 0:
-                try:
-                    loopvar = self.dynamic_object()
-                    if hasattr(retn, "output_variable"):
-                        loopvar.name = str(retn.output_variable)
-                    loopvar.id = retn.id
-                    loopvar.start = int(retn.loopcounter)
-                    loopvar.counter = loopvar.start
-                    loopvar.total_listitems = 0
-                    self.loopvariables.append(loopvar)
-                except Exception as ex:
-                    self.set_error(ex)
-                    print(f"Error: {self.error}")
+        retn = set()
+        output_variable = str(getattr(step, "output_variable", ""))
+        if len(output_variable) > 0 and output_variable.startswith("%") and output_variable.endswith("%"):
+            retn.add(output_variable)
+        error_variable = str(getattr(step, "error_variable", ""))
+        if len(error_variable) > 0:
+            retn.add(error_variable)
         return retn
 
-    class dynamic_object(object):
-        pass
-
-    def set_breakpoint(self):
+    def get_dead_variables(self, step: any, variables: dict) -> list:
         """
-        Set a breakpoint to debug the code.
+        Get the variables in a variables dictionary that are not read by a step or any step after it.
+        :param step: The step object
+        :param variables: The variables dictionary
+        :return: A list with variable names.
         """
-        print("---------- Debug ----------")
-        finished = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sql = f"UPDATE Runs SET result= 'Encounters a breakpoint.', finished='{finished}' where id = {self.id};"
-        self.db.run_sql(sql=sql, tablename="Runs")
-        breakpoint()
+        live = self.live.get(getattr(step, "id", None))
+        if live is None:
+            return []
+        return [x for x in variables if x in self.variables and x not in live]
 
 
 class SQL:
@@ -1446,17 +3421,20 @@ class SQL:
             else:
                 if not dbfolder.endswith("/"):
                     dbfolder += "/"
-            self.connection = connect(f'{dbfolder}orchestrator.db')
+            # Steps in parallel branches log from other threads, the WorkflowEngine serializes the access
+            self.connection = connect(f'{dbfolder}orchestrator.db', check_same_thread=False)
             self.connection.execute("PRAGMA foreign_keys = 1")
             self.connection.execute("PRAGMA JOURNAL_MODE = 'WAL'")
         elif self.useSQLserver:
             # SQL Server
+            from pyodbc import connect as connectSQL
             if len(connection_string) == 0:
                 self.connection = connectSQL("Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=orchestrator;Trusted_Connection=yes;")
             else:
                 self.connection = connectSQL(connection_string)
         elif self.usePostgreSQL:
             # PostgreSQL
+            import psycopg2
             try:
                 if len(connection_string) == 0:
                     self.connection = psycopg2.connect("dbname=orchestrator host=localhost user=postgres password=postgres")
@@ -1515,6 +3493,26 @@ class SQL:
             else:
                 return None
 
+    def run_many_sql(self, sql: str, params_list: list):
+        """
+        Run an SQL command for each set of parameters and commit once.
+        :param sql: The SQL command to execute.
+        :param params_list: A list with an array of parameters for each execution of the sql command.
+        """
+        if self.usePostgreSQL:
+            sql = sql.replace("?", "%s")
+        if not self.useSQLserver:
+            if not hasattr(self, "connection"):
+                return
+        if not self.useSQLserver and not self.usePostgreSQL:
+            self.connection.executemany(sql, params_list)
+        else:
+            if self.usePostgreSQL:
+                self.connection.rollback()
+            cursor = self.connection.cursor()
+            cursor.executemany(sql, params_list)
+        self.connection.commit()
+
     def set_error(self, ex: any):
         """
         Set the internal error comming from the try-except
@@ -1635,6 +3633,8 @@ class SQL:
                 self.run_sql(sql)
                 sql = "CREATE TABLE IF NOT EXISTS Survey (id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, question_id STRING NOT NULL, question STRING NOT NULL, answer_id string NOT NULL, answer STRING NOT NULL, recipient STRING NOT NULL, received INTEGER DEFAULT 0, timestamp DATE DEFAULT (datetime('now','localtime')));"
                 self.run_sql(sql)
+                sql = "CREATE TABLE IF NOT EXISTS StepMetrics (id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, run INTEGER NOT NULL, step_id TEXT, step_name TEXT, module_name TEXT, function_name TEXT, calls INTEGER, wall_time REAL, cpu_time REAL, binding_time REAL, call_time REAL, logging_time REAL, timestamp DATE DEFAULT (datetime('now','localtime')), CONSTRAINT fk_runs FOREIGN KEY (run) REFERENCES Runs (id) ON DELETE CASCADE);"
+                self.run_sql(sql)
             except Exception as ex:
                 self.set_error(ex)
                 print(ex)
@@ -1651,6 +3651,8 @@ class SQL:
                     self.run_sql(sql=sql)
                     sql = "IF NOT EXISTS (select * from sysobjects where name='Survey') CREATE TABLE Survey (id INTEGER NOT NULL PRIMARY KEY IDENTITY(1,1), question_id NVARCHAR(255) NOT NULL, question NVARCHAR(MAX) NOT NULL, answer_id NVARCHAR(MAX) NOT NULL, answer NVARCHAR(MAX) NOT NULL, recipient NVARCHAR(255) NOT NULL, received INTEGER DEFAULT 0, timestamp DATETIME DEFAULT GETDATE());"
                     self.run_sql(sql=sql)
+                    sql = "IF NOT EXISTS (select * from sysobjects where name='StepMetrics') CREATE TABLE StepMetrics (id INTEGER NOT NULL PRIMARY KEY IDENTITY(1,1), run INTEGER NOT NULL, step_id nvarchar(255), step_name nvarchar(255), module_name nvarchar(255), function_name nvarchar(255), calls INTEGER, wall_time FLOAT, cpu_time FLOAT, binding_time FLOAT, call_time FLOAT, logging_time FLOAT, timestamp DATETIME DEFAULT GETDATE(), CONSTRAINT fk_runs_metrics FOREIGN KEY (run) REFERENCES Runs (id) ON DELETE CASCADE);"
+                    self.run_sql(sql=sql)
                 except Exception as ex:
                     self.set_error(ex)
                     print(ex)
@@ -1665,6 +3667,8 @@ class SQL:
                     self.run_sql(sql)
                     sql = "CREATE TABLE IF NOT EXISTS Survey (id SERIAL PRIMARY KEY, question_id TEXT NOT NULL, question TEXT NOT NULL, answer_id TEXT NOT NULL, answer TEXT NOT NULL, recipient TEXT NOT NULL, received INTEGER DEFAULT 0, timestamp timestamp DEFAULT (now()));"
                     self.run_sql(sql)
+                    sql = "CREATE TABLE IF NOT EXISTS StepMetrics (id SERIAL PRIMARY KEY, run INTEGER NOT NULL, step_id TEXT, step_name TEXT, module_name TEXT, function_name TEXT, calls INTEGER, wall_time DOUBLE PRECISION, cpu_time DOUBLE PRECISION, binding_time DOUBLE PRECISION, call_time DOUBLE PRECISION, logging_time DOUBLE PRECISION, timestamp timestamp DEFAULT (now()), CONSTRAINT fk_runs_metrics FOREIGN KEY (run) REFERENCES Runs (id) ON DELETE CASCADE);"
+                    self.run_sql(sql)
                 except Exception as ex:
                     self.set_error(ex)
                     print(ex)
@@ -1680,6 +3684,155 @@ class SQL:
         self.run_sql(sql)
 
 
+class LogWriter:
+
+    def __init__(self, dbfolder: str = "", useSQLserver: bool = False, usePostgres: bool = False,
+                 connection_string: str = "", batch_size: int = 100, flush_interval: float = 1.0,
+                 max_queue_size: int = 10000):
+        """
+        Class for writing the step logging to the orchestrator database from a background thread. Records are committed
+        in batches of batch_size records, or after flush_interval seconds. The writer uses its own database connection,
+        which is opened here so a connection error is raised to the caller. When the background thread has stopped,
+        the records are written directly.
+        :param dbfolder: Optional. The folder for the database.
+        :param useSQLserver: Use a MsSQL Server. Default is False.
+        :param usePostgres: Use a PostgreSQL Server. Default is False.
+        :param connection_string: Optional. The connection string for the database.
+        :param batch_size: Optional. The maximum number of records to commit at once. Default is 100.
+        :param flush_interval: Optional. The maximum number of seconds a record waits before it is committed. Default is 1.
+        :param max_queue_size: Optional. The maximum number of queued records. When the queue is full, logging waits for the writer. Default is 10000.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.error = None
+        self.tracer = None  # The FlowTracer of the run that is logged, set by WorkflowEngine.start_trace
+        self.sql = "INSERT INTO Steps (run, name, step, status, result, timestamp) VALUES (?,?,?,?,?,?);"
+        self.unwritten = []  # The batch of the background thread when it stopped on an error
+        self.db = SQL(dbfolder=dbfolder, useSQLserver=useSQLserver, usePostgres=usePostgres,
+                      connection_string=connection_string)
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.thread = threading.Thread(target=self.run, name="BPMN_RPA log writer", daemon=True)
+        self.thread.start()
+
+    def write(self, params: list):
+        """
+        Queue a record for the Steps table.
+        :param params: The values for the run, name, step, status and result columns.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        record = list(params) + [timestamp]
+        if not self.put(record):
+            self.write_remaining([record])
+
+    def flush(self):
+        """
+        Wait until all queued records are committed.
+        """
+        done = threading.Event()
+        if self.put(done):
+            while not done.wait(0.1) and self.thread.is_alive():
+                pass
+        if not self.thread.is_alive():
+            self.write_remaining()
+
+    def close(self):
+        """
+        Commit all queued records, stop the background thread and close the database connection.
+        """
+        if self.put(None):
+            self.thread.join()
+        self.write_remaining()
+        if hasattr(self.db, "connection"):
+            self.db.connection.close()
+            del self.db.connection
+
+    def put(self, item: any) -> bool:
+        """
+        Put an item in the queue. When the queue is full, wait as long as the background thread is running.
+        :param item: The record, Event or None to queue.
+        :return: True if the item is queued, False if the background thread has stopped.
+        """
+        while self.thread.is_alive():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def write_remaining(self, records: list = None):
+        """
+        Commit the records that are left in the queue after the background thread has stopped.
+        :param records: Optional. Records to commit after the queued records.
+        """
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is not None:
+                batch.append(item)
+        self.write_batch(self.db, self.unwritten + batch + (records or []))
+        self.unwritten = []
+
+    def run(self):
+        """
+        Write the queued records until the writer is closed.
+        """
+        batch = []
+        started = 0
+        try:
+            while True:
+                timeout = None
+                if len(batch) > 0:
+                    timeout = max(0.0, self.flush_interval - (time.monotonic() - started))
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    batch = self.write_batch(self.db, batch)
+                    continue
+                if item is None:
+                    self.write_batch(self.db, batch)
+                    break
+                if isinstance(item, threading.Event):
+                    batch = self.write_batch(self.db, batch)
+                    item.set()
+                    continue
+                if len(batch) == 0:
+                    started = time.monotonic()
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    batch = self.write_batch(self.db, batch)
+        except Exception as ex:
+            self.db.set_error(ex)
+            self.error = self.db.error
+            print(f"Error in the log writer, the log is written without the background thread: {self.error}")
+            self.unwritten = batch
+
+    def write_batch(self, db: any, batch: list) -> list:
+        """
+        Commit a batch of records.
+        :param db: The SQL object to write with.
+        :param batch: The records to write.
+        :return: An empty list for the next batch.
+        """
+        if len(batch) > 0:
+            try:
+                started = time.perf_counter()
+                db.run_many_sql(self.sql, batch)
+                tracer = self.tracer
+                if tracer is not None:
+                    tracer.add_span("Log write", "db", started, time.perf_counter(), {"records": len(batch)})
+            except Exception as ex:
+                db.set_error(ex)
+                self.error = db.error
+                print(f"Error in writing the log to the orchestrator database: {self.error}")
+        return []
+
+
 class Visio:
 
     def __init__(self):
@@ -1698,6 +3851,7 @@ class Visio:
         Open the VSDX file and store its cointents into memory.
         :param file: The filename to read.
         """
+        import xmltodict
         with zipfile.ZipFile(file, "r") as docs:
             self.root = {}
             for d in docs.filelist:
@@ -1816,7 +3970,7 @@ class Visio:
         if "@Name" in shape:
             properties.update({"name": shape["@Name"]})
         properties.update({"IsStart": False})
-        retn = self.dynamic_object()
+        retn = Step()
         if "type" in shape:
             if str(shape["type"]).lower().__contains__("connector"):
                 properties.pop("IsStart")
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from BPMN_RPA.Benchmarks import flows
+from BPMN_RPA.WorkflowEngine import WorkflowEngine
+
+repository_folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def install_dir(tmp_path, monkeypatch):
+    """
+    A temporary installation directory. The environment variables take precedence over the settings and aren't saved,
+    so the settings of the installation aren't changed.
+    """
+    folder = tmp_path / "install"
+    folder.mkdir()
+    monkeypatch.setenv("BPMN_RPA_DBPATH", str(folder) + os.sep)
+    monkeypatch.setenv("BPMN_RPA_PYTHONPATH", repository_folder)
+    return folder
+
+
+@pytest.fixture
+def make_engine(install_dir):
+    """
+    Create WorkflowEngines in the temporary installation directory. The log writers are closed after the test.
+    """
+    engines = []
+
+    def make(**kwargs) -> WorkflowEngine:
+        kwargs.setdefault("log_level", "quiet")
+        engine = WorkflowEngine(**kwargs)
+        engines.append(engine)
+        return engine
+
+    yield make
+    for engine in engines:
+        if getattr(engine, "log_writer", None) is not None:
+            engine.log_writer.close()
+
+
+@pytest.fixture
+def save_flow(tmp_path):
+    """
+    Save the steps of a flow as .flw file in the temporary folder.
+    """
+    def save(steps: list, name: str = "flow") -> str:
+        filepath = str(tmp_path / f"{name}.flw")
+        flows.save_flw(steps, filepath)
+        return filepath
+
+    return save
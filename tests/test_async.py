@@ -0,0 +1,33 @@
+import asyncio
+
+from BPMN_RPA.Benchmarks import flows
+
+step_module = '''
+import time
+
+from BPMN_RPA.WorkflowEngine import FlowTracer
+
+
+def busy():
+    end = time.thread_time() + 0.05
+    while time.thread_time() < end:
+        pass
+    return FlowTracer.get_active() is not None
+'''
+
+
+def test_steps_in_executor_are_traced_and_profiled(make_engine, save_flow, tmp_path):
+    module = tmp_path / "busy_step.py"
+    module.write_text(step_module)
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    busy = flow.add_shape("busy", str(module), "busy", output_variable="%traced%")
+    end = flow.add_shape("End")
+    flow.connect(start, busy)
+    flow.connect(busy, end)
+    engine = make_engine(profile=True, profile_folder=str(tmp_path), trace=True, trace_folder=str(tmp_path),
+                         free_variables=False)
+    asyncio.run(engine.run_flow_async(save_flow(flow.steps)))
+    assert engine.variables["%traced%"] is True
+    metrics = next(x for x in engine.profiler.get_metrics() if x.step_id == busy)
+    assert metrics.cpu_time >= 0.04
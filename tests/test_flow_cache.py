@@ -0,0 +1,54 @@
+import json
+import os
+
+from BPMN_RPA.Benchmarks import flows
+from BPMN_RPA.WorkflowEngine import WorkflowEngine
+
+
+def create_flow(value: str = "a") -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    step = flow.add_value("value", value, "%value%")
+    end = flow.add_shape("End")
+    flow.connect(start, step)
+    flow.connect(step, end)
+    return flow.steps
+
+
+def test_flow_cache_is_opt_in(install_dir):
+    engine = WorkflowEngine(log_level="quiet")
+    engine.log_writer.close()
+    assert engine.flow_cache is None
+
+
+def test_open_flow_uses_the_cache(make_engine, save_flow, tmp_path, monkeypatch):
+    folder = tmp_path / "cache"
+    filepath = save_flow(create_flow())
+    engine = make_engine(flow_cache=True, flow_cache_folder=str(folder))
+    steps = engine.open_flow(filepath)
+    assert len(os.listdir(folder)) == 1
+    engine = make_engine(flow_cache=True, flow_cache_folder=str(folder), free_variables=False)
+    monkeypatch.setattr(engine, "build_flow", None)  # The cached steps aren't built again
+    assert [x.id for x in engine.open_flow(filepath)] == [x.id for x in steps]
+    engine.run_flow(filepath)
+    assert engine.variables["%value%"] == "a"
+
+
+def test_changed_flow_is_opened_again(make_engine, save_flow, tmp_path):
+    folder = str(tmp_path / "cache")
+    filepath = save_flow(create_flow("a"))
+    make_engine(flow_cache=True, flow_cache_folder=folder).run_flow(filepath)
+    save_flow(create_flow("changed"))
+    engine = make_engine(flow_cache=True, flow_cache_folder=folder, free_variables=False)
+    engine.run_flow(filepath)
+    assert engine.variables["%value%"] == "changed"
+
+
+def test_open_returns_the_flow_file_content(make_engine, save_flow, tmp_path):
+    filepath = save_flow(create_flow())
+    engine = make_engine(flow_cache=True, flow_cache_folder=str(tmp_path / "cache"))
+    engine.open_flow(filepath)
+    assert engine.open(filepath) == create_flow()
+    # Converting the flow needs the content of the file, also when the flow is in the cache
+    engine.convert_binary_flow_to_default_file_format(filepath)
+    assert engine.open(filepath) == json.loads(json.dumps(create_flow()))
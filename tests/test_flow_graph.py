@@ -0,0 +1,35 @@
+from BPMN_RPA.Benchmarks import flows
+
+
+def test_only_the_start_shape_is_marked(make_engine, tmp_path):
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    value = flow.add_value("value", "a", "%a%")
+    note = flow.add_value("note", "b", "%b%")  # Another shape without incoming sequence flow arrows
+    end = flow.add_shape("End")
+    flow.connect(start, value)
+    flow.connect(note, value)
+    flow.connect(value, end)
+    filepath = str(tmp_path / "flow.xml")
+    flows.save_drawio(flow.steps, filepath)
+    engine = make_engine()
+    steps = engine.get_flow(engine.open(filepath))
+    assert [x.id for x in steps if getattr(x, "IsStart", False)] == [start]
+    assert engine.get_flow_graph(steps).start.id == start
+
+
+def test_next_step_follows_gateway_value(make_engine, tmp_path):
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    gateway = flow.add_gateway()
+    yes = flow.add_value("yes", "yes", "%result%")
+    no = flow.add_value("no", "no", "%result%")
+    flow.connect(start, gateway)
+    flow.connect(gateway, yes, "True")
+    flow.connect(gateway, no, "False")
+    filepath = str(tmp_path / "flow.xml")
+    flows.save_drawio(flow.steps, filepath)
+    engine = make_engine()
+    graph = engine.get_flow_graph(engine.get_flow(engine.open(filepath)))
+    assert graph.get_next_step(graph.step_by_id[gateway], True).id == yes
+    assert graph.get_next_step(graph.step_by_id[gateway], False).id == no
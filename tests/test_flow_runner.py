@@ -0,0 +1,68 @@
+import os
+import socket
+import stat
+import threading
+
+from BPMN_RPA.Benchmarks import flows
+from BPMN_RPA.FlowRunner import FlowRunner
+from BPMN_RPA.WorkflowEngine import SQL
+
+
+def create_flow(value: str, output_variable: str, information: str = None) -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    step = flow.add_value("value", value, output_variable)
+    end = flow.add_shape("End")
+    flow.connect(start, step)
+    flow.connect(step, end)
+    if information is not None:
+        flow.steps.append({"type": "information", "id": "information", "description": information})
+    return flow.steps
+
+
+def test_flows_run_back_to_back_in_one_engine(install_dir, save_flow):
+    runner = FlowRunner(log_level="quiet")
+    first = save_flow(create_flow("first", "%first%", "The first flow"), "first")
+    second = save_flow(create_flow("[%first%]", "%second%"), "second")
+    try:
+        assert runner.run_flow({"flow": first})["status"] == "ended"
+        engine = runner.get_engine()
+        own_db = engine.db
+        assert engine.information == "The first flow"
+        # Like a flow with 'use_sql_server' in its information, which switches the database of the engine
+        engine.db = SQL(dbfolder=engine.db_folder)
+        engine.use_sql_server = True
+        assert runner.run_flow({"flow": second, "input": "input"})["result"] == "[%first%]"
+        assert runner.get_engine() is engine
+        assert engine.db is own_db and not engine.use_sql_server
+        assert engine.information == ""
+        assert engine.get_input_parameter() == "input"
+    finally:
+        runner.get_engine().log_writer.close()
+
+
+def test_request_requires_the_token(install_dir, save_flow, tmp_path):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    token_file = str(tmp_path / "runner.token")
+    runner = FlowRunner(port=port, max_workers=1, log_level="quiet", token_file=token_file)
+    thread = threading.Thread(target=runner.serve, daemon=True)
+    thread.start()
+    try:
+        while runner.token is None or not os.path.exists(token_file):
+            thread.join(0.01)
+        if os.name != "nt":
+            assert stat.S_IMODE(os.stat(token_file).st_mode) == 0o600
+        flow = save_flow(create_flow("value", "%value%"))
+        response = FlowRunner.send_request(flow, port=port, token_file=token_file)
+        assert response["status"] == "ended"
+        other_file = tmp_path / "other.token"
+        other_file.write_text("not the token")
+        response = FlowRunner.send_request(flow, port=port, token_file=str(other_file))
+        assert response["status"] == "error" and "token" in response["error"]
+        assert FlowRunner.send_request(flow, port=port, token_file=str(tmp_path / "missing.token")) is None
+    finally:
+        runner.shutdown()
+        thread.join()
+    assert not os.path.exists(token_file)
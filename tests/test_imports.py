@@ -0,0 +1,38 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from conftest import repository_folder
+
+# Packages that take long to import, or need a display, and must only be imported by the functions that use them
+heavy_packages = ["bs4", "jira", "matplotlib", "pandas", "psycopg2", "pyautogui", "pyodbc", "requests", "selenium",
+                  "spacy", "tensorflow", "werkzeug", "xmltodict"]
+
+# The budget in seconds for importing the WorkflowEngine in a new interpreter, it takes about 0.05 seconds
+import_budget = 1.0
+
+script = """
+import importlib, json, sys
+importlib.import_module(sys.argv[1])
+print(json.dumps(sorted({name.split(".")[0] for name in sys.modules} & set(sys.argv[2:]))))
+"""
+
+
+@pytest.mark.parametrize("module", ["BPMN_RPA.WorkflowEngine", "BPMN_RPA.Scripts.Jira", "BPMN_RPA.Scripts.RiskMatrix",
+                                    "BPMN_RPA.Scripts.System", "BPMN_RPA.Scripts.TextMining",
+                                    "BPMN_RPA.Scripts.Web"])
+def test_import_does_not_load_heavy_packages(module):
+    # A new interpreter, so the packages that other tests have imported don't count
+    output = subprocess.run([sys.executable, "-c", script, module] + heavy_packages, cwd=repository_folder,
+                            capture_output=True, text=True, check=True).stdout
+    assert json.loads(output) == []
+
+
+def test_import_time_of_the_workflow_engine():
+    timing = "import time; started = time.perf_counter(); import BPMN_RPA.WorkflowEngine; print(time.perf_counter() - started)"
+    # The best of a few runs, so a busy machine doesn't fail the test
+    durations = [float(subprocess.run([sys.executable, "-c", timing], cwd=repository_folder, capture_output=True,
+                                      text=True, check=True).stdout) for _ in range(3)]
+    assert min(durations) < import_budget
@@ -0,0 +1,102 @@
+import gc
+import sqlite3
+import threading
+
+import pytest
+
+from BPMN_RPA.Benchmarks import flows
+from BPMN_RPA.WorkflowEngine import LogWriter, WorkflowEngine
+
+
+def read_steps(install_dir, run: int) -> list:
+    connection = sqlite3.connect(str(install_dir / "orchestrator.db"))
+    try:
+        return connection.execute("SELECT step, status FROM Steps WHERE run=? ORDER BY id", [run]).fetchall()
+    finally:
+        connection.close()
+
+
+def create_flow(function: str = "value_to_variable") -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    value = flow.add_shape("value", "Set_Value.py", function, value="a", output_variable="%a%")
+    end = flow.add_shape("End")
+    flow.connect(start, value)
+    flow.connect(value, end)
+    return flow.steps
+
+
+def test_log_is_written_when_the_flow_ends(make_engine, save_flow, install_dir):
+    engine = make_engine(log_level="step")
+    engine.run_flow(save_flow(create_flow()))
+    assert engine.log_writer.thread.is_alive()
+    steps = read_steps(install_dir, engine.id)
+    assert ("value", "Running") in steps
+    assert steps[-1] == ("End", "Ended")
+
+
+def test_log_is_written_when_a_step_fails(make_engine, save_flow, install_dir):
+    engine = make_engine(log_level="step")
+    with pytest.raises(Exception, match="no_such_function"):
+        engine.run_flow(save_flow(create_flow("no_such_function")))
+    assert ("value", "Running") in read_steps(install_dir, engine.id)
+
+
+def test_close_writes_the_queued_records_first(make_engine, save_flow, install_dir):
+    engine = make_engine()
+    engine.run_flow(save_flow(create_flow()))
+    writer = LogWriter(dbfolder=str(install_dir) + "/", batch_size=1000, flush_interval=60)
+    for nr in range(250):
+        writer.write([engine.id, "flow", f"step {nr}", "Running", "result"])
+    writer.close()
+    assert not writer.thread.is_alive()
+    assert len(read_steps(install_dir, engine.id)) == 251
+    writer.close()  # Closing or flushing a stopped writer returns at once
+    writer.flush()
+
+
+def test_log_writer_is_closed_with_the_engine(save_flow, install_dir):
+    engine = WorkflowEngine(log_level="quiet")
+    engine.run_flow(save_flow(create_flow()))
+    run, writer = engine.id, engine.log_writer
+    engine.write_step_log([run, "flow", "step", "Running", "result"])
+    del engine
+    gc.collect()
+    assert not writer.thread.is_alive()
+    assert read_steps(install_dir, run)[-1] == ("step", "Running")
+
+
+def test_connection_error_is_raised_to_the_caller(monkeypatch):
+    def no_connection(**kwargs):
+        raise Exception("no connection")
+    monkeypatch.setattr("BPMN_RPA.WorkflowEngine.SQL", no_connection)
+    with pytest.raises(Exception, match="no connection"):
+        LogWriter()
+
+
+def test_log_is_written_when_the_log_writer_stops(make_engine, save_flow, install_dir, monkeypatch):
+    engine = make_engine()
+    engine.run_flow(save_flow(create_flow()))
+    write_batch = LogWriter.write_batch
+
+    def fail_in_thread(self, db, batch):
+        if threading.current_thread() is self.thread:
+            raise Exception("log writer failed")
+        return write_batch(self, db, batch)
+    monkeypatch.setattr(LogWriter, "write_batch", fail_in_thread)
+    writer = LogWriter(dbfolder=str(install_dir) + "/", batch_size=1, max_queue_size=2)
+    for nr in range(5):  # Doesn't wait for the full queue of the stopped writer
+        writer.write([engine.id, "flow", f"step {nr}", "Running", "result"])
+    writer.flush()
+    assert not writer.thread.is_alive()
+    assert "log writer failed" in str(writer.error)
+    assert read_steps(install_dir, engine.id)[1:] == [(f"step {nr}", "Running") for nr in range(5)]
+    writer.close()
+
+
+def test_restarted_log_writer_replaces_the_finalizer(make_engine):
+    engine = make_engine()
+    finalizer = engine.log_writer_finalizer
+    engine.start_log_writer()
+    assert not finalizer.alive
+    assert engine.log_writer_finalizer.alive
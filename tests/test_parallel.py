@@ -0,0 +1,71 @@
+from BPMN_RPA.Benchmarks import flows
+
+
+def create_nested_loop_flow(multi_instance: str = "parallel") -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    outer_list = flow.add_value("outer list", "a,b,c,d,e,f,g,h", "%outer_list%", convert_to_list=True)
+    inner_list = flow.add_value("inner list", "1,2,3", "%inner_list%", convert_to_list=True)
+    outer_loop = flow.add_value("outer loop", "%outer_list%", "%outer%", loopcounter=0, multi_instance=multi_instance,
+                                max_instances=4)
+    inner_loop = flow.add_value("inner loop", "%inner_list%", "%inner%", loopcounter=0)
+    pair = flow.add_value("pair", "%outer%-%inner%", "%pair%")
+    inner_check, inner_gateway = flow.add_loop_check("%inner%")
+    last = flow.add_value("last pair", "%pair%", "%last%")
+    outer_check, outer_gateway = flow.add_loop_check("%outer%")
+    end = flow.add_shape("End")
+    flow.connect(start, outer_list)
+    flow.connect(outer_list, inner_list)
+    flow.connect(inner_list, outer_loop)
+    flow.connect(outer_loop, inner_loop)
+    flow.connect(inner_loop, pair)
+    flow.connect(pair, inner_check)
+    flow.connect(inner_gateway, inner_loop, "True")
+    flow.connect(inner_gateway, last, "False")
+    flow.connect(last, outer_check)
+    flow.connect(outer_gateway, outer_loop, "True")
+    flow.connect(outer_gateway, end, "False")
+    return flow.steps
+
+
+def test_nested_loop_in_parallel_loop(make_engine, save_flow):
+    engine = make_engine(free_variables=False)
+    engine.run_flow(save_flow(create_nested_loop_flow()))
+    assert engine.variables["%outer%"] == [f"{item}-3" for item in "abcdefgh"]
+
+
+def test_loop_in_parallel_branch(make_engine, save_flow):
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    outer_list = flow.add_value("outer list", "x,y", "%outer_list%", convert_to_list=True)
+    inner_list = flow.add_value("inner list", "1,2,3", "%inner_list%", convert_to_list=True)
+    outer_loop = flow.add_value("outer loop", "%outer_list%", "%outer%", loopcounter=0)
+    fork = flow.add_gateway()
+    flow.steps[-1]["type"] = "parallel gateway"
+    inner_loop = flow.add_value("inner loop", "%inner_list%", "%inner%", loopcounter=0)
+    pair = flow.add_value("pair", "%outer%-%inner%", "%pair%")
+    inner_check, inner_gateway = flow.add_loop_check("%inner%")
+    other = flow.add_value("other", "B", "%b%")
+    join = flow.add_gateway()
+    flow.steps[-1]["type"] = "parallel gateway"
+    result = flow.add_value("result", "%b%-%pair%", "%result%")
+    outer_check, outer_gateway = flow.add_loop_check("%outer%")
+    end = flow.add_shape("End")
+    flow.connect(start, outer_list)
+    flow.connect(outer_list, inner_list)
+    flow.connect(inner_list, outer_loop)
+    flow.connect(outer_loop, fork)
+    flow.connect(fork, inner_loop)
+    flow.connect(fork, other)
+    flow.connect(inner_loop, pair)
+    flow.connect(pair, inner_check)
+    flow.connect(inner_gateway, inner_loop, "True")
+    flow.connect(inner_gateway, join, "False")
+    flow.connect(other, join)
+    flow.connect(join, result)
+    flow.connect(result, outer_check)
+    flow.connect(outer_gateway, outer_loop, "True")
+    flow.connect(outer_gateway, end, "False")
+    engine = make_engine(free_variables=False)
+    engine.run_flow(save_flow(flow.steps))
+    assert engine.variables["%result%"] == "B-y-3"
@@ -0,0 +1,69 @@
+from BPMN_RPA.Benchmarks import flows
+
+
+def create_loop_flow() -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    prefix = flow.add_value("prefix", "p", "%prefix%")
+    joined = flow.add_value("joined", "", "%joined%")
+    items = flow.add_value("items", "a,b,c", "%items%", convert_to_list=True)
+    loop = flow.add_value("loop", "%items%", "%item%", loopcounter=0)
+    body = flow.add_value("body", "%joined%,%prefix%-%item%", "%joined%")
+    check, gateway = flow.add_loop_check("%item%")
+    result = flow.add_value("result", "%joined%", "%result%")
+    end = flow.add_shape("End")
+    flow.connect(start, prefix)
+    flow.connect(prefix, joined)
+    flow.connect(joined, items)
+    flow.connect(items, loop)
+    flow.connect(loop, body)
+    flow.connect(body, check)
+    flow.connect(gateway, loop, "True")
+    flow.connect(gateway, result, "False")
+    flow.connect(result, end)
+    return flow.steps
+
+
+def test_variable_read_again_in_loop_is_kept(make_engine, save_flow):
+    engine = make_engine()
+    assert engine.run_flow(save_flow(create_loop_flow())) == ",p-a,p-b,p-c"
+    # The variables are released after the last step that reads them
+    assert "%prefix%" not in engine.variables and "%items%" not in engine.variables
+
+
+def test_keep_variables_are_not_released(make_engine, save_flow):
+    engine = make_engine(keep_variables=["%prefix%"])
+    engine.run_flow(save_flow(create_loop_flow()))
+    assert engine.variables["%prefix%"] == "p"
+
+
+def test_variable_read_after_subflow_is_kept(make_engine, save_flow):
+    subflow = flows.FlowBuilder()
+    start = subflow.add_shape("Start")
+    value = subflow.add_value("value", "sub", "%value%")
+    loop = subflow.add_value("loop", "x,y", "%item%", convert_to_list=True, loopcounter=0)
+    body = subflow.add_value("body", "%value%-%item%", "%last%")
+    check, gateway = subflow.add_loop_check("%item%")
+    result = subflow.add_value("result", "%last%", "%result%")
+    end = subflow.add_shape("End")
+    subflow.connect(start, value)
+    subflow.connect(value, loop)
+    subflow.connect(loop, body)
+    subflow.connect(body, check)
+    subflow.connect(gateway, loop, "True")
+    subflow.connect(gateway, result, "False")
+    subflow.connect(result, end)
+    subflow_path = save_flow(subflow.steps, "subflow")
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    keep = flow.add_value("keep", "kept", "%keep%")
+    run = flow.add_shape("run subflow", "System.py", "run_other_flow", full_path_to_flow=subflow_path,
+                         output_variable="%sub%")
+    result = flow.add_value("result", "%keep% %sub%", "%result%")
+    end = flow.add_shape("End")
+    flow.connect(start, keep)
+    flow.connect(keep, run)
+    flow.connect(run, result)
+    flow.connect(result, end)
+    engine = make_engine()
+    assert engine.run_flow(save_flow(flow.steps)) == "kept sub-y"
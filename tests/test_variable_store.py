@@ -0,0 +1,106 @@
+import functools
+import gc
+import os
+
+from BPMN_RPA.Benchmarks import flows
+from BPMN_RPA.WorkflowEngine import SpillFile, SpilledItems, SpilledValue, VariableStore, WorkflowEngine
+
+items = [f"item {nr}" for nr in range(1000)]
+
+
+def count_rows(store: VariableStore) -> int:
+    return store.spill_file.connection.execute("SELECT COUNT(*) FROM Spill").fetchone()[0]
+
+
+def test_large_value_is_spilled_and_read_back(tmp_path):
+    store = VariableStore(str(tmp_path), 1000)
+    store["%small%"] = "small"
+    store["%items%"] = items
+    store["%text%"] = "x" * 2000
+    assert store.entries["%small%"] == "small"
+    assert isinstance(store.entries["%items%"], SpilledValue) and isinstance(store.entries["%text%"], SpilledValue)
+    assert store["%items%"] == items and store["%text%"] == "x" * 2000
+    assert store["%items%"] is not store["%items%"]  # Each read is a new copy
+    assert len(os.listdir(tmp_path)) == 1
+
+
+def test_spill_file_is_removed(tmp_path):
+    store = VariableStore(str(tmp_path), 1000)
+    store["%items%"] = items
+    rows = count_rows(store)
+    store["%items%"] = "small"
+    gc.collect()
+    assert count_rows(store) == 0 < rows  # The pages of a replaced value are removed
+    del store
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+def test_loop_reads_the_pages_of_a_spilled_variable(tmp_path):
+    store = VariableStore(str(tmp_path), 1000)
+    store.page_bytes = 1024
+    store["%items%"] = items
+    rows = count_rows(store)
+    loop_items = store.get_spilled_items({"%items%"}, store["%items%"])
+    assert isinstance(loop_items, SpilledItems)
+    assert loop_items[999] == items[999] and len(loop_items.page) < len(items)
+    assert count_rows(store) == rows  # The list isn't written again
+    in_memory = list(reversed(items))
+    assert store.get_spilled_items({"%items%"}, in_memory) is in_memory
+
+
+def create_loop_flow(loop_value: str) -> list:
+    flow = flows.FlowBuilder()
+    start = flow.add_shape("Start")
+    items_step = flow.add_value("items", ",".join(items), "%items%", convert_to_list=True)
+    loop = flow.add_value("loop", loop_value, "%item%", convert_to_list=True, loopcounter=0)
+    body = flow.add_value("body", "%item%", "%last%")
+    check, gateway = flow.add_loop_check("%item%")
+    result = flow.add_value("result", "%last%", "%result%")
+    end = flow.add_shape("End")
+    flow.connect(start, items_step)
+    flow.connect(items_step, loop)
+    flow.connect(loop, body)
+    flow.connect(body, check)
+    flow.connect(gateway, loop, "True")
+    flow.connect(gateway, result, "False")
+    flow.connect(result, end)
+    return flow.steps
+
+
+def test_flow_loops_over_spilled_variable(make_engine, save_flow, tmp_path):
+    engine = make_engine(spill_threshold=1000, spill_folder=str(tmp_path / "spill"))
+    assert engine.run_flow(save_flow(create_loop_flow("%items%"))) == "item 999"
+
+
+class CountingSpillFile(SpillFile):
+    writes = 0
+
+    def write(self, data: bytes) -> int:
+        CountingSpillFile.writes += 1
+        return super().write(data)
+
+
+class CountingVariableStore(VariableStore):
+    spill_file_class = CountingSpillFile
+
+
+def test_list_in_memory_is_not_spilled_for_a_loop(make_engine, save_flow, tmp_path):
+    engine = make_engine(variable_store=functools.partial(CountingVariableStore, str(tmp_path / "spill"), 1000),
+                         keep_variables=["%items%"])
+    CountingSpillFile.writes = 0
+    assert engine.run_flow(save_flow(create_loop_flow(",".join(reversed(items))))) == "item 0"
+    # Only the %items% variable is written to the spill file, not the list of the loop step
+    assert CountingSpillFile.writes == len(engine.variables.entries["%items%"].row_ids)
+
+
+def test_spill_files_are_removed_with_the_engine(install_dir, save_flow, tmp_path):
+    folder = tmp_path / "spill"
+    engine = WorkflowEngine(log_level="quiet", spill_threshold=1000, spill_folder=str(folder))
+    assert engine.run_flow(save_flow(create_loop_flow("%items%"))) == "item 999"
+    assert len(os.listdir(folder)) == 1
+    writer = engine.log_writer
+    del engine
+    gc.collect()
+    assert os.listdir(folder) == []
+    writer.close()